@@ -0,0 +1,107 @@
+"""Compare model startup time from a joblib pickle and a memory-mapped artifact.
+
+Cold start runs each loader in a fresh interpreter, so it includes the
+imports a new worker process pays for. Warm load repeats the load inside
+this process for several model sizes; both figures include scoring a
+first row, so faulting in the mapped weights is counted.
+
+Usage:
+    python -m benchmarks.bench_artifact_load
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+
+import joblib
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+
+from src.artifact import load_artifact, save_artifact
+
+FEATURE_COUNTS = [4, 1_000, 100_000]
+COLD_RUNS = 3
+
+PICKLE_SNIPPET = """
+import warnings, joblib, numpy as np
+warnings.simplefilter("ignore")
+model = joblib.load({path!r})
+model.predict_proba(np.zeros((1, model.coef_.shape[1])))
+"""
+
+ARTIFACT_SNIPPET = """
+import numpy as np
+from src.artifact import load_artifact
+model = load_artifact({path!r})
+model.predict_proba(np.zeros((1, model.n_features_in_)))
+"""
+
+
+def synthetic_model(n_features, rng):
+    """A binary LogisticRegression with random weights, without the cost of fitting"""
+    model = LogisticRegression()
+    model.coef_ = rng.normal(0, 0.01, (1, n_features))
+    model.intercept_ = np.array([0.1])
+    model.classes_ = np.array([0, 1])
+    model.n_features_in_ = n_features
+    return model
+
+
+def median_time(fn, repeats=7):
+    """Return the median wall time of ``fn()`` over ``repeats`` runs"""
+    times = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return float(np.median(times))
+
+
+def cold_start(snippet, path):
+    """Median wall time of a fresh interpreter that loads ``path`` and scores one row"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=root)
+    command = [sys.executable, '-c', snippet.format(path=path)]
+    return median_time(lambda: subprocess.run(command, env=env, check=True), COLD_RUNS)
+
+
+def main():
+    rng = np.random.default_rng(42)
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {}
+        for n_features in FEATURE_COUNTS:
+            model = synthetic_model(n_features, rng)
+            pkl_path = os.path.join(tmp, f"model_{n_features}.pkl")
+            artifact_path = os.path.join(tmp, f"model_{n_features}")
+            joblib.dump(model, pkl_path)
+            save_artifact(artifact_path, model, [f"f{i}" for i in range(n_features)])
+            paths[n_features] = pkl_path, artifact_path
+
+        pkl_path, artifact_path = paths[FEATURE_COUNTS[0]]
+        slow = cold_start(PICKLE_SNIPPET, pkl_path)
+        fast = cold_start(ARTIFACT_SNIPPET, artifact_path)
+        print(f"Cold start ({FEATURE_COUNTS[0]} features, new interpreter): "
+              f"pickle {slow * 1e3:.0f} ms, artifact {fast * 1e3:.0f} ms ({slow / fast:.1f}x)")
+
+        print(f"{'features':>10} {'pickle (ms)':>12} {'artifact (ms)':>14} {'speedup':>9}")
+        for n_features, (pkl_path, artifact_path) in paths.items():
+            X = rng.uniform(0, 1, (1, n_features))
+
+            def from_pickle():
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore")
+                    joblib.load(pkl_path).predict_proba(X)
+
+            def from_artifact():
+                load_artifact(artifact_path).predict_proba(X)
+
+            slow = median_time(from_pickle)
+            fast = median_time(from_artifact)
+            print(f"{n_features:>10} {slow * 1e3:>12.2f} {fast * 1e3:>14.2f} {slow / fast:>8.1f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
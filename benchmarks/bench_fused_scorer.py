@@ -0,0 +1,65 @@
+"""Compare the sklearn scaler + predict_proba path with the fused NumPy scorer.
+
+Usage:
+    python -m benchmarks.bench_fused_scorer
+"""
+import time
+
+import numpy as np
+from sklearn.preprocessing import MinMaxScaler
+
+from src.fused import compile_linear_model
+from src.model_loader import load_model
+from src.utils import IMPORTANT_FEATURES
+
+BATCH_SIZES = [1, 16, 256, 4096, 65536]
+
+
+def synthetic_features(n, rng):
+    """Feature rows shaped like process_packets output: protocol, sbytes, dbytes, rate"""
+    return np.column_stack([
+        rng.choice([1, 6, 17], n),
+        rng.integers(40, 1500, n),
+        rng.integers(0, 1500, n),
+        rng.exponential(50, n),
+    ]).astype(np.float32)
+
+
+def best_time(fn, X, min_seconds=0.2):
+    """Return the best per-call time over repeated runs"""
+    best = float('inf')
+    deadline = time.perf_counter() + min_seconds
+    runs = 0
+    while runs < 5 or time.perf_counter() < deadline:
+        started = time.perf_counter()
+        fn(X)
+        best = min(best, time.perf_counter() - started)
+        runs += 1
+    return best
+
+
+def main():
+    rng = np.random.default_rng(42)
+    model = load_model()
+    scaler = MinMaxScaler().fit(synthetic_features(10000, rng))
+    fused = compile_linear_model(model, scaler)
+    if fused is None:
+        print("Model does not compile to a fused linear scorer")
+        return 1
+
+    def sklearn_path(X):
+        return model.predict_proba(scaler.transform(X))[:, 1]
+
+    print(f"Features: {IMPORTANT_FEATURES}")
+    print(f"{'batch':>8} {'sklearn (us)':>14} {'fused (us)':>12} {'speedup':>9} {'max |diff|':>12}")
+    for size in BATCH_SIZES:
+        X = synthetic_features(size, rng)
+        diff = float(np.max(np.abs(sklearn_path(X) - fused.scores(X))))
+        slow = best_time(sklearn_path, X)
+        fast = best_time(fused.scores, X)
+        print(f"{size:>8} {slow * 1e6:>14.1f} {fast * 1e6:>12.1f} {slow / fast:>8.1f}x {diff:>12.2e}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,265 @@
+"""Measure every detection stage on its own and the whole pipeline end to end.
+
+Inputs are deterministic: a synthetic capture written from
+``src.traffic_gen`` with a fixed seed, replayed in batches of several
+sizes. Each stage runs in a fresh process, so its memory is its own:
+results record packets/s, the per-call latency percentiles (how long a
+packet waits for its batch to clear the stage), the peak RSS of the
+stage's process and how far the stage raised it above the level left by
+loading the model and capture. ``--output`` writes them as JSON;
+``--baseline`` compares against such a file and exits with status 1 when
+a stage's throughput fell by more than ``--tolerance``.
+
+Usage:
+    python -m benchmarks.bench_pipeline [--output results.json] [--baseline baseline.json] [--tolerance 0.15]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import psutil
+from scapy.layers.l2 import Ether
+
+from src.decoder import decode_frames
+from src.flows import FlowTable
+from src.fused import build_scorer
+from src.model_loader import load_meta_model
+from src.pcap_reader import iter_chunks
+from src.ring_buffer import PACKET_DTYPE, RingBuffer, packet_records
+from src.traffic_gen import TrafficGenerator, write_pcap
+from src.utils import IMPORTANT_FEATURES, load_scalers, preprocess_data, process_packet, process_packets
+
+BATCH_SIZES = [1, 64, 1024, 16384]
+STAGES = ('decode', 'process_packet', 'process_packets', 'preprocess_data', 'predict',
+          'score', 'alerts', 'end_to_end')
+# Per-packet stages are only run at small batch sizes; they are linear in the batch anyway
+PER_PACKET_STAGES = ('process_packet',)
+PER_PACKET_MAX_BATCH = 1024
+THRESHOLD = 0.8
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MiB"""
+    try:
+        import resource
+    except ImportError:
+        # Windows reports the peak working set instead
+        return psutil.Process().memory_info().peak_wset / 2**20
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+
+def synthetic_capture(path, packets, seed):
+    """Write the benchmark capture and return its frames, timestamps and link type"""
+    generator = TrafficGenerator(rate=100000, attack_fraction=0.05, seed=seed, start=1_700_000_000.0)
+    headers, _ = generator.batch(packets)
+    write_pcap(path, headers)
+    with open(path, 'rb') as stream:
+        frames, timestamps, linktype = next(iter_chunks(stream, packets))
+    return frames, timestamps, linktype
+
+
+def batches(items, size, count):
+    """``count`` consecutive slices of ``size`` items, wrapping around ``items``"""
+    total = len(items)
+    return [items[(i * size) % total:(i * size) % total + size] for i in range(count)]
+
+
+def time_calls(fn, inputs, min_seconds):
+    """Call ``fn`` on each input, cycling until ``min_seconds`` pass; return per-call durations"""
+    fn(inputs[0])
+    times = []
+    started = time.perf_counter()
+    while True:
+        for item in inputs:
+            t0 = time.perf_counter()
+            fn(item)
+            times.append(time.perf_counter() - t0)
+        if time.perf_counter() - started >= min_seconds:
+            return np.array(times)
+
+
+def stage_functions(frames, timestamps, linktype, capture_path, minmax_scaler, standard_scaler):
+    """Return ``{stage: (prepare, run)}``; ``prepare(rows)`` builds a stage input from frame rows"""
+    model = load_meta_model()
+    score = build_scorer(model, minmax_scaler, standard_scaler)
+    packet_history = RingBuffer(PACKET_DTYPE, 65536)
+    threat_history = RingBuffer(PACKET_DTYPE, 16384)
+    all_headers = decode_frames(frames, timestamps, linktype)
+    all_features = process_packets(all_headers)
+    all_scores = score(all_features)
+
+    def alerts(batch):
+        headers, scores = batch
+        records = packet_records(headers, scores)
+        packet_history.extend(records)
+        threat_history.extend(records[records['score'] > THRESHOLD])
+
+    def frame(rows):
+        return pd.DataFrame(all_features[rows], columns=IMPORTANT_FEATURES)
+
+    def end_to_end(chunk_size):
+        """Replay the capture from disk; return how long each chunk took from read to alert"""
+        flow_table = FlowTable(max_flows=262144)
+        times = []
+        with open(capture_path, 'rb') as stream:
+            chunks = iter_chunks(stream, chunk_size)
+            while True:
+                t0 = time.perf_counter()
+                chunk = next(chunks, None)
+                if chunk is None:
+                    return times
+                headers = decode_frames(*chunk)
+                headers = headers[headers['ip_version'] != 0]
+                alerts((headers, score(process_packets(headers, flow_table=flow_table))))
+                times.append(time.perf_counter() - t0)
+
+    def preprocessed(rows):
+        return preprocess_data(frame(rows), minmax_scaler, standard_scaler)
+
+    flow_table = FlowTable(max_flows=262144)
+    return {
+        'decode': (lambda rows: ([frames[i] for i in rows], [timestamps[i] for i in rows]),
+                   lambda batch: decode_frames(batch[0], batch[1], linktype)),
+        'process_packet': (lambda rows: [Ether(frames[i]) for i in rows],
+                           lambda packets: [process_packet(packet) for packet in packets]),
+        'process_packets': (lambda rows: all_headers[rows],
+                            lambda headers: process_packets(headers, flow_table=flow_table)),
+        'preprocess_data': (frame, lambda data: preprocess_data(data, minmax_scaler, standard_scaler)),
+        'predict': (preprocessed, model.predict),
+        'score': (lambda rows: all_features[rows], score),
+        'alerts': (lambda rows: (all_headers[rows], all_scores[rows]), alerts),
+        'end_to_end': (None, end_to_end),
+    }
+
+
+def run_suite(stages, batch_sizes, packets, seed, min_seconds):
+    """Measure each stage in its own spawned process; ``ru_maxrss`` never goes down within one"""
+    results = []
+    context = multiprocessing.get_context('spawn')
+    for stage in stages:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            results += pool.submit(run_stage, stage, batch_sizes, packets, seed, min_seconds).result()
+    return results
+
+
+def run_stage(stage, batch_sizes, packets, seed, min_seconds):
+    """Measure one stage at each batch size, in the order given"""
+    minmax_scaler, standard_scaler = load_scalers()
+    with tempfile.TemporaryDirectory() as tmp:
+        capture_path = os.path.join(tmp, 'synthetic.pcap')
+        frames, timestamps, linktype = synthetic_capture(capture_path, packets, seed)
+        functions = stage_functions(frames, timestamps, linktype, capture_path, minmax_scaler, standard_scaler)
+        prepare, run = functions[stage]
+        # Everything the stages share is loaded; growth past this is the stage's own
+        baseline_mb = peak_rss_mb()
+        results = []
+        for size in batch_sizes:
+            if stage in PER_PACKET_STAGES and size > PER_PACKET_MAX_BATCH:
+                continue
+            if stage == 'end_to_end':
+                # Whole replays of the capture in chunks of this size, timed per chunk
+                times, replays = [], 0
+                while not replays or sum(times) < min_seconds:
+                    times += run(size)
+                    replays += 1
+                times = np.array(times)
+                packets_per_sec = packets * replays / times.sum()
+            else:
+                rows = np.arange(packets)
+                count = max(1, min(packets // size, 64))
+                times = time_calls(run, [prepare(chunk) for chunk in batches(rows, size, count)], min_seconds)
+                packets_per_sec = size * len(times) / times.sum()
+            peak_mb = peak_rss_mb()
+            results.append({
+                'stage': stage,
+                'batch': size,
+                'calls': len(times),
+                'packets_per_sec': packets_per_sec,
+                'latency_us': {f'p{q}': float(np.percentile(times, q) * 1e6) for q in (50, 90, 99)},
+                'peak_rss_mb': peak_mb,
+                'rss_growth_mb': peak_mb - baseline_mb,
+            })
+            print_result(results[-1])
+    return results
+
+
+def print_result(result):
+    latency = result['latency_us']
+    print(f"{result['stage']:>16} {result['batch']:>6} {result['packets_per_sec']:>14,.0f} "
+          f"{latency['p50']:>12.1f} {latency['p99']:>12.1f} {result['peak_rss_mb']:>9.1f} "
+          f"{result['rss_growth_mb']:>+10.1f}", flush=True)
+
+
+def compare(results, baseline, tolerance):
+    """Print the change against ``baseline`` results; return the regressed ``(stage, batch)`` pairs"""
+    previous = {(result['stage'], result['batch']): result for result in baseline['results']}
+    regressions = []
+    print(f"\n{'stage':>16} {'batch':>6} {'packets/s':>10} {'p99':>8} {'peak RSS':>9}")
+    for result in results:
+        key = (result['stage'], result['batch'])
+        old = previous.get(key)
+        if old is None:
+            continue
+        throughput = result['packets_per_sec'] / old['packets_per_sec'] - 1
+        p99 = result['latency_us']['p99'] / old['latency_us']['p99'] - 1
+        rss = result['peak_rss_mb'] / old['peak_rss_mb'] - 1
+        regressed = throughput < -tolerance
+        if regressed:
+            regressions.append(key)
+        print(f"{key[0]:>16} {key[1]:>6} {throughput:>+10.1%} {p99:>+8.1%} {rss:>+9.1%}"
+              + ("  REGRESSION" if regressed else ""))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=list(STAGES), help="Stages to measure")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=BATCH_SIZES, help="Packets per call")
+    parser.add_argument('--packets', type=int, default=65536, help="Packets in the synthetic capture")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the synthetic capture")
+    parser.add_argument('--min-seconds', type=float, default=0.5, help="Minimum measuring time per result")
+    parser.add_argument('--output', default=None, help="Write results to this JSON file")
+    parser.add_argument('--baseline', default=None, help="JSON results to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help="Throughput drop against the baseline reported as a regression")
+    args = parser.parse_args(argv)
+
+    print(f"{'stage':>16} {'batch':>6} {'packets/s':>14} {'p50 (us)':>12} {'p99 (us)':>12} {'RSS (MB)':>9} "
+          f"{'stage (MB)':>10}")
+    results = run_suite(args.stages, args.batch_sizes, args.packets, args.seed, args.min_seconds)
+    report = {
+        'meta': {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'packets': args.packets,
+            'seed': args.seed,
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as stream:
+            json.dump(report, stream, indent=2)
+    if args.baseline:
+        with open(args.baseline) as stream:
+            regressions = compare(results, json.load(stream), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,93 @@
+"""Replay a capture through the inline pipeline and the flow-sharded worker pipeline.
+
+Usage:
+    python -m benchmarks.bench_sharded capture.pcap [--workers 1 2 4 8] [--repeat 3]
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from src.decoder import decode_frames
+from src.flows import FlowTable
+from src.fused import build_scorer
+from src.model_loader import load_meta_model
+from src.pcap_reader import iter_chunks
+from src.ring_buffer import PACKET_DTYPE, RingBuffer
+from src.sharded import ShardedPipeline
+from src.utils import load_scalers, process_packets
+
+
+def load_chunks(path, chunk_size, repeat):
+    """Read the capture into memory so disk speed does not enter the measurement"""
+    with open(path, 'rb') as stream:
+        chunks = list(iter_chunks(stream, chunk_size))
+    return chunks * repeat
+
+
+def run_inline(chunks, minmax_scaler, standard_scaler):
+    """Decode, flow features and scoring on one core, as the in-process Detector does"""
+    score = build_scorer(load_meta_model(), minmax_scaler, standard_scaler)
+    flow_table = FlowTable(max_flows=262144)
+    packets = 0
+    started = time.perf_counter()
+    for frames, timestamps, linktype in chunks:
+        headers = decode_frames(frames, timestamps, linktype)
+        headers = headers[headers['ip_version'] != 0]
+        score(process_packets(headers, flow_table=flow_table))
+        packets += len(headers)
+    return packets, time.perf_counter() - started
+
+
+def run_sharded(chunks, minmax_scaler, standard_scaler, workers):
+    pipeline = ShardedPipeline(minmax_scaler, standard_scaler, workers=workers,
+                               packet_history=RingBuffer(PACKET_DTYPE, 65536))
+    pipeline.start()
+    try:
+        # Workers import and load the model on their first slot; keep that out of the timing
+        frames, timestamps, linktype = chunks[0]
+        for _ in range(workers * 4):
+            pipeline.submit(frames[:64], timestamps[:64], linktype)
+        pipeline.flush()
+        inspected = pipeline.inspected
+
+        started = time.perf_counter()
+        for frames, timestamps, linktype in chunks:
+            pipeline.submit(frames, timestamps, linktype)
+        pipeline.flush()
+        seconds = time.perf_counter() - started
+        stats = pipeline.stats()
+    finally:
+        pipeline.stop()
+    return stats['inspected'] - inspected, seconds, stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('capture', help="pcap or pcapng file to replay")
+    parser.add_argument('--workers', type=int, nargs='+', default=sorted({1, 2, 4, os.cpu_count()}),
+                        help="Worker counts to measure")
+    parser.add_argument('--chunk-size', type=int, default=4096, help="Frames per dispatched batch")
+    parser.add_argument('--repeat', type=int, default=1, help="Replay the capture this many times")
+    args = parser.parse_args(argv)
+
+    minmax_scaler, standard_scaler = load_scalers()
+    chunks = load_chunks(args.capture, args.chunk_size, args.repeat)
+    print(f"{sum(len(frames) for frames, _, _ in chunks):,} frames, {os.cpu_count()} CPUs")
+
+    packets, seconds = run_inline(chunks, minmax_scaler, standard_scaler)
+    baseline = packets / seconds
+    print(f"{'pipeline':>12} {'packets':>10} {'seconds':>8} {'packets/s':>12} {'speedup':>8}  per-worker share")
+    print(f"{'inline':>12} {packets:>10,} {seconds:>8.2f} {baseline:>12,.0f} {1.0:>7.2f}x")
+    for workers in args.workers:
+        packets, seconds, stats = run_sharded(chunks, minmax_scaler, standard_scaler, workers)
+        shares = np.array([worker['packets'] for worker in stats['per_worker']], dtype=float)
+        shares = " ".join(f"{share:.0%}" for share in shares / max(shares.sum(), 1))
+        print(f"{f'{workers} workers':>12} {packets:>10,} {seconds:>8.2f} {packets / seconds:>12,.0f} "
+              f"{packets / seconds / baseline:>7.2f}x  {shares}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
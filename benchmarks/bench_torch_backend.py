@@ -0,0 +1,70 @@
+"""Compare eager torch scoring with the batched CPU backend, fp32 and int8.
+
+Usage:
+    python -m benchmarks.bench_torch_backend [--threads N] [--hidden 256]
+"""
+import argparse
+import time
+
+import numpy as np
+import torch
+
+from src.model_loader import predict_scores
+from src.torch_backend import TorchScorer
+
+BATCH_SIZES = [1, 64, 1024, 8192]
+
+
+def mlp(n_features, hidden):
+    """A second-stage sized MLP emitting one logit per row"""
+    torch.manual_seed(0)
+    return torch.nn.Sequential(
+        torch.nn.Linear(n_features, hidden), torch.nn.ReLU(),
+        torch.nn.Linear(hidden, hidden), torch.nn.ReLU(),
+        torch.nn.Linear(hidden, 1),
+    ).eval()
+
+
+def latencies(fn, X, min_seconds=0.3):
+    """Per-call wall times over repeated runs, after one warm-up call"""
+    fn(X)
+    times = []
+    deadline = time.perf_counter() + min_seconds
+    while len(times) < 5 or time.perf_counter() < deadline:
+        started = time.perf_counter()
+        fn(X)
+        times.append(time.perf_counter() - started)
+    return np.array(times)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=None, help="torch intra-op threads")
+    parser.add_argument('--hidden', type=int, default=256, help="Hidden layer width")
+    parser.add_argument('--features', type=int, default=4, help="Input features")
+    args = parser.parse_args(argv)
+
+    model = mlp(args.features, args.hidden)
+    variants = {
+        'eager': lambda X: predict_scores(model, X),
+        'fp32 traced': TorchScorer(model, num_threads=args.threads, jit='trace'),
+        'int8 traced': TorchScorer(model, jit='trace', quantize=True),
+    }
+
+    rng = np.random.default_rng(42)
+    print(f"torch {torch.__version__}, {torch.get_num_threads()} threads, "
+          f"quantized engine {torch.backends.quantized.engine}")
+    print(f"{'batch':>6} {'variant':>12} {'rows/s':>12} {'p50 (us)':>10} {'p99 (us)':>10} {'max |diff|':>11}")
+    for size in BATCH_SIZES:
+        X = rng.uniform(0, 1, (size, args.features)).astype(np.float32)
+        reference = predict_scores(model, X)
+        for name, fn in variants.items():
+            times = latencies(fn, X)
+            diff = float(np.max(np.abs(fn(X) - reference)))
+            print(f"{size:>6} {name:>12} {size / np.median(times):>12,.0f} "
+                  f"{np.percentile(times, 50) * 1e6:>10.1f} {np.percentile(times, 99) * 1e6:>10.1f} {diff:>11.2e}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
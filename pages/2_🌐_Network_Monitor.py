@@ -1,32 +1,61 @@
 import streamlit as st
-import time
 import numpy as np
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from scapy.all import sniff, IP, TCP, UDP, conf
+from scapy.all import conf
 from scapy.arch import get_windows_if_list
-from src.utils import process_packet, preprocess_data, load_scalers
-from src.model_loader import load_model
-from threading import Thread
-from datetime import datetime, timedelta
+from src.utils import load_scalers
+from src.model_loader import MODELS_DIR, available_models
+from src.engine import get_engine
+from src.metrics import stage_histogram
+from src.shared_state import MAX_INTERFACES, DetectorUnavailable, SharedDetectorState
+from src.ring_buffer import PACKET_DTYPE, local_times, records_frame
+from src.capture_queue import OVERFLOW_POLICIES
+from src.capture import PcapReplaySource
+from src.pcap_reader import CAPTURES_DIR, resolve_capture
+from src.capture_filter import CaptureFilterError, build_capture_filter
+from src.components.charts import time_series_chart
+from src.components.fragments import fragment
 import psutil
+import os
+import uuid
 
-# Initialize model and scalers
-model = load_model()
+# Initialize scalers; the model comes from the shared registry
 if 'minmax_scaler' not in st.session_state or 'standard_scaler' not in st.session_state:
     st.session_state.minmax_scaler, st.session_state.standard_scaler = load_scalers()
 
-# Initialize session state for monitoring
-if 'packet_history' not in st.session_state:
-    st.session_state.packet_history = []
-if 'threat_history' not in st.session_state:
-    st.session_state.threat_history = []
+# History memory ceiling; flagged packets get a fixed share of it
+HISTORY_MEMORY_MB = [8, 32, 128, 512]
+THREAT_HISTORY_SHARE = 0.2
+# Replay speed choices; None replays as fast as the pipeline accepts frames
+REPLAY_SPEEDS = {"Original timing": 1.0, "10×": 10.0, "100×": 100.0, "As fast as possible": None}
+# Packets behind the traffic chart; it draws a downsampled line, not every packet
+CHART_PACKETS = 16384
+CHART_LAYOUT = dict(xaxis_title="Time", yaxis_title="Packet Size (bytes)", height=400, showlegend=True)
+# Refresh period of each live region in update intervals; the threat table is
+# the most expensive to redraw and changes least often
+REFRESH_EVERY = {'stats': 1, 'chart': 1, 'threats': 2}
+
+def history_capacities(limit_mb):
+    """Return the packet and threat ring capacities that fit in ``limit_mb``"""
+    record_bytes = 2 * PACKET_DTYPE.itemsize
+    budget = limit_mb * 1024 * 1024
+    threats = max(1, int(budget * THREAT_HISTORY_SHARE) // record_bytes)
+    packets = max(1, (budget - threats * record_bytes) // record_bytes)
+    return packets, threats
+
+# Initialize session state for monitoring; capture itself is shared through the engine
+if 'engine_session' not in st.session_state:
+    st.session_state.engine_session = uuid.uuid4().hex
 if 'total_packets' not in st.session_state:
     st.session_state.total_packets = 0
 if 'threats_detected' not in st.session_state:
     st.session_state.threats_detected = 0
 
+OVERFLOW_LABELS = {
+    'drop_newest': "Drop newest",
+    'drop_oldest': "Drop oldest",
+    'adaptive': "Adaptive 1-in-N sampling",
+}
+
 def get_available_interfaces():
     """Get list of available network interfaces"""
     interfaces = []
@@ -56,83 +85,170 @@ def get_available_interfaces():
     
     return interfaces
 
-def create_network_chart(data, title="Network Traffic"):
-    """Create a network traffic visualization"""
-    if not data:
-        return None
+def attach_daemon():
+    """Return this session's read-only view of the detector daemon, attaching on first use"""
+    if 'rt_daemon_state' not in st.session_state:
+        st.session_state.rt_daemon_state = SharedDetectorState.attach()
+    return st.session_state.rt_daemon_state
 
-    df = pd.DataFrame(data[-100:])  # Keep last 100 packets for visualization
-    
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(
-        x=df['timestamp'],
-        y=df['size'],
-        name='Packet Size',
-        line=dict(color='#1E88E5', width=2),
-        fill='tozeroy',
-        fillcolor='rgba(30,136,229,0.1)'
-    ))
-    
-    fig.update_layout(
-        title=title,
-        xaxis_title="Time",
-        yaxis_title="Packet Size (bytes)",
-        height=400,
-        margin=dict(l=20, r=20, t=50, b=20),
-        template="plotly_white",
-        showlegend=True,
-        legend=dict(
-            orientation="h",
-            yanchor="bottom",
-            y=1.02,
-            xanchor="right",
-            x=1
-        )
-    )
+def detach_daemon():
+    state = st.session_state.pop('rt_daemon_state', None)
+    if state is not None:
+        state.close()
+
+def create_network_chart(window, title="Network Traffic", interfaces=None):
+    """Create a network traffic visualization from the most recent packet records
+
+    With more than one interface, each gets its own trace. Traces are
+    downsampled to a fixed number of points and the figure is reused
+    across renders, so drawing cost does not grow with the window.
+    """
+    if not len(window):
+        return None
     
-    return fig
+    if interfaces and len(interfaces) > 1:
+        x, series = {}, {}
+        for index, name in enumerate(interfaces):
+            packets = window[window['iface'] == index]
+            x[name] = local_times(packets['ts_ns'])
+            series[name] = packets['size']
+        return time_series_chart("network_monitor", x, series, title, fill=False, **CHART_LAYOUT)
+    
+    return time_series_chart("network_monitor", local_times(window['ts_ns']), {'Packet Size': window['size']},
+                             title, **CHART_LAYOUT)
 
 def show_real_time():
     st.title("🌐 Network Monitor")
+    render_latency = stage_histogram('render')
     
-    # Network interface selection
-    interfaces = get_available_interfaces()
+    source = st.radio(
+        "📡 Source",
+        ["This dashboard", "Detector daemon", "PCAP replay"],
+        horizontal=True,
+        key="rt_source",
+        help="Attach read-only to a detector started with `python -m src.detector`, so capture keeps running between page reruns, "
+             "or replay a capture file through the same pipeline for reproducible load without root."
+    )
+    daemon_mode = source == "Detector daemon"
+    replay_mode = source == "PCAP replay"
     
-    col1, col2, col3 = st.columns([2,1,1])
-    with col1:
-        selected_interface = st.selectbox(
-            "🔌 Select Network Interface", 
-            interfaces,
-            help="Choose the network interface to monitor. You may need to run with administrator privileges."
-        )
-    with col2:
-        threshold = st.slider("🎯 Detection Threshold", 0.0, 1.0, 0.8, key="rt_threshold")
-    with col3:
+    if daemon_mode:
         interval = st.slider("⏱️ Update Interval (s)", 0.5, 5.0, 1.0, key="rt_interval")
+    else:
+        col1, col2, col3 = st.columns([2,1,1])
+        with col1:
+            if replay_mode:
+                replay_path = st.text_input(
+                    "📼 Capture File",
+                    key="rt_replay_path",
+                    placeholder=f"e.g. {CAPTURES_DIR}/sample.pcap",
+                    help=f"pcap or pcapng file under the `{CAPTURES_DIR}/` directory, replayed into the "
+                         "capture queue exactly as live frames would be."
+                )
+            else:
+                # Network interface selection
+                interfaces = get_available_interfaces()
+                selected_interfaces = st.multiselect(
+                    "🔌 Select Network Interfaces", 
+                    interfaces,
+                    default=interfaces[:1],
+                    max_selections=MAX_INTERFACES,
+                    key="rt_interfaces",
+                    help="Choose the network interfaces to monitor; each is captured by its own thread. "
+                         "You may need to run with administrator privileges."
+                )
+        with col2:
+            threshold = st.slider("🎯 Detection Threshold", 0.0, 1.0, 0.8, key="rt_threshold")
+        with col3:
+            interval = st.slider("⏱️ Update Interval (s)", 0.5, 5.0, 1.0, key="rt_interval")
+        
+        if replay_mode:
+            with st.expander("📼 Replay", expanded=True):
+                replay_speed = st.selectbox(
+                    "Speed", list(REPLAY_SPEEDS), key="rt_replay_speed",
+                    help="Replay with the recorded gaps, scaled up, or as fast as the pipeline accepts frames "
+                         "to find its maximum sustainable packets/s."
+                )
+                replay_loops = st.number_input(
+                    "Passes (0 = until stopped)", min_value=0, value=1, step=1, key="rt_replay_loops"
+                )
+                replay_seed = st.number_input(
+                    "Seed", min_value=0, value=0, step=1, key="rt_replay_seed",
+                    help="Repeated passes remap IPv4 addresses from this seed, so they form new flows "
+                         "and every run with the same seed sends identical traffic."
+                )
+        
+        with st.expander("🧹 Capture Filter"):
+            bpf_expression = st.text_input(
+                "BPF filter",
+                key="rt_bpf",
+                placeholder="e.g. tcp or udp and not port 53",
+                help="Attached to the capture socket, so non-matching frames are dropped in the kernel."
+            )
+            dashboard_port = st.get_option("server.port")
+            exclude_dashboard = st.checkbox(
+                f"Exclude dashboard traffic (TCP port {dashboard_port})", value=True, key="rt_exclude_dashboard"
+            )
+            sample_percent = st.slider(
+                "Flow sampling (%)", 1, 100, 100, key="rt_flow_sampling",
+                help="Keep this share of IPv4 flows. Both directions of a flow are kept or dropped together."
+            )
+            capture_filter = build_capture_filter(
+                bpf_expression,
+                exclude_ports=(dashboard_port,) if exclude_dashboard else (),
+                sample_fraction=sample_percent / 100
+            )
+        
+        with st.expander("📥 Capture Queue"):
+            overflow = st.selectbox(
+                "Overflow policy",
+                OVERFLOW_POLICIES,
+                format_func=lambda policy: OVERFLOW_LABELS[policy],
+                key="rt_overflow",
+                help="What happens to new packets when analysis falls behind capture."
+            )
+            queue_capacity = st.select_slider(
+                "Queue capacity (packets)", [4096, 16384, 65536, 262144], value=65536, key="rt_queue_capacity"
+            )
+            workers = st.slider(
+                "Analysis processes", 1, max(os.cpu_count() or 1, 2), 1, key="rt_workers",
+                help="More than one shards flows across worker processes so analysis is not limited to one core."
+            )
+        
+        with st.expander("🗄️ History"):
+            history_mb = st.select_slider(
+                "History memory limit (MB)", HISTORY_MEMORY_MB, value=32, key="rt_history_mb",
+                help="Packet and threat history live in fixed-size ring buffers; the oldest entries are overwritten."
+            )
+            packet_capacity, threat_capacity = history_capacities(history_mb)
+            st.caption(
+                f"Keeping the last {packet_capacity:,} packets and {threat_capacity:,} threats "
+                f"({(packet_capacity + threat_capacity) * 2 * PACKET_DTYPE.itemsize / 2**20:.0f} MB)"
+            )
+        
+        with st.expander("🧠 Cascade Scoring"):
+            second_stage_path = st.selectbox(
+                "Second-stage model",
+                [None] + available_models(),
+                format_func=lambda path: "None (meta model only)" if path is None else path,
+                key="rt_second_stage",
+                help=f"A heavier model (.pkl, .pt or artifact directory) from the `{MODELS_DIR}/` directory."
+            )
+            band = st.slider(
+                "Escalation band", 0.0, 1.0, (0.5, 0.95), key="rt_band",
+                help="Packets whose meta-model score falls in this range are re-scored by the second-stage model."
+            )
     
     # Main layout
     chart_col, stats_col = st.columns([3, 1])
     
     with stats_col:
         st.markdown("### 📊 Network Stats")
-        monitoring = st.toggle("🚀 Start Monitoring", key="rt_monitor")
-        
-        # Stats metrics
-        st.metric("Total Packets", f"{st.session_state.total_packets:,}", 
-                 delta="Active" if monitoring else "Inactive")
-        st.metric("Threats Detected", f"{st.session_state.threats_detected:,}",
-                 delta="Scanning" if monitoring else None,
-                 delta_color="inverse")
-        
-        # Health indicator
-        health_score = 100 - (st.session_state.threats_detected / max(st.session_state.total_packets, 1) * 100)
-        st.progress(health_score/100, text=f"Network Health: {health_score:.1f}%")
+        monitoring = st.toggle("👁️ Attach to Detector" if daemon_mode else "🚀 Start Monitoring", key="rt_monitor")
+        stats_container = st.container()
     
     with chart_col:
         chart_container = st.container()
-        with chart_container:
-            chart_placeholder = st.empty()
-            alert_placeholder = st.empty()
     
     # Threats Table
     st.markdown("""
@@ -142,102 +258,228 @@ def show_real_time():
     </div>
     """, unsafe_allow_html=True)
     
-    threats_table = st.empty()
+    threats_container = st.container()
     
-    if monitoring:
+    def render_stats(total_packets, threats_detected):
+        st.metric("Total Packets", f"{total_packets:,}", 
+                  delta="Active" if monitoring else "Inactive")
+        st.metric("Threats Detected", f"{threats_detected:,}",
+                  delta="Scanning" if monitoring else None,
+                  delta_color="inverse")
+        
+        # Health indicator
+        health_score = 100 - (threats_detected / max(total_packets, 1) * 100)
+        st.progress(health_score/100, text=f"Network Health: {health_score:.1f}%")
+    
+    def render_pipeline_stats(stats):
+        st.caption(
+            f"Batches: {stats['batches']:,} · avg size {stats['mean_batch_size']:.0f} · "
+            f"latency p50 {stats['latency_p50_ms']:.1f} ms / p99 {stats['latency_p99_ms']:.1f} ms"
+        )
+        st.caption(
+            f"Captured {stats['captured']:,} · queued {stats['depth']:,}/{stats['capacity']:,} · "
+            f"not inspected {stats['not_inspected']:,} "
+            f"(dropped new {stats['dropped_newest']:,}, dropped old {stats['dropped_oldest']:,}, "
+            f"sampled out {stats['sampled_out']:,}, scoring failed {stats['failed']:,}"
+            + (f", sampling 1 in {stats['sample_rate']}" if stats['sample_rate'] > 1 else "") + ")"
+        )
+        stage_latencies = " · ".join(
+            f"{stage['name']} p50 {stage['latency_p50_ms']:.2f} ms / p99 {stage['latency_p99_ms']:.2f} ms"
+            for stage in stats['stages']
+        )
+        viewers = stats.get('viewers', 1)
+        st.caption(
+            f"Escalated {stats['escalation_fraction']:.1%} · {stage_latencies}"
+            + (f" · shared with {viewers - 1} other session(s)" if viewers > 1 else "")
+        )
+        if len(stats['interfaces']) > 1:
+            st.caption("  \n".join(
+                f"**{interface['name']}**: {interface['packets']:,} packets · "
+                f"{interface['bytes'] / 2**20:,.1f} MB · {interface['dropped']:,} not inspected"
+                for interface in stats['interfaces']
+            ))
+    
+    def render_threats(threats, interfaces):
+        if not len(threats):
+            return
+        df = records_frame(threats, interfaces)
+        df = df.sort_values('timestamp', ascending=False)
+        
+        # Format the dataframe
+        df['threat_score'] = df['threat_score'].apply(lambda x: f"{x:.2%}")
+        df['timestamp'] = df['timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S')
+        
+        st.dataframe(
+            df,
+            column_config={
+                "timestamp": "Time",
+                "interface": "Interface",
+                "source_ip": "Source IP",
+                "source_port": "Source Port",
+                "dest_ip": "Destination IP",
+                "dest_port": "Destination Port",
+                "protocol": "Protocol",
+                "size": "Size (bytes)",
+                "flags": "Flags",
+                "threat_score": "Threat Score"
+            },
+            hide_index=True,
+            use_container_width=True
+        )
+    
+    if not monitoring or daemon_mode:
+        # Leave the shared capture; it stops once no session uses it
+        get_engine().release(st.session_state.engine_session)
+    if not monitoring or not daemon_mode:
+        detach_daemon()
+    
+    if not monitoring:
+        if not daemon_mode:
+            with stats_container:
+                render_stats(st.session_state.total_packets, st.session_state.threats_detected)
+        return
+    
+    if daemon_mode:
         try:
-            def packet_callback(packet):
-                if IP in packet:
-                    # Extract packet information
-                    packet_info = {
-                        'timestamp': datetime.now(),
-                        'source_ip': packet[IP].src,
-                        'dest_ip': packet[IP].dst,
-                        'protocol': packet[IP].proto,
-                        'size': len(packet),
-                        'source_port': packet[TCP].sport if TCP in packet else packet[UDP].sport if UDP in packet else 0,
-                        'dest_port': packet[TCP].dport if TCP in packet else packet[UDP].dport if UDP in packet else 0,
-                        'flags': str(packet[TCP].flags) if TCP in packet else 'N/A'
-                    }
-                    
-                    st.session_state.packet_history.append(packet_info)
-                    st.session_state.total_packets += 1
-                    
-                    # Process for threat detection
-                    features = process_packet(packet)
-                    processed = preprocess_data(features,
-                                           st.session_state.minmax_scaler,
-                                           st.session_state.standard_scaler)
-                    
-                    try:
-                        prediction = model.predict(processed)
-                        if prediction > threshold:
-                            st.session_state.threats_detected += 1
-                            packet_info['threat_score'] = float(prediction)
-                            st.session_state.threat_history.append(packet_info)
-                    except Exception as e:
-                        st.error(f"Prediction error: {str(e)}")
-
-            # Start packet capture in a separate thread
+            state = attach_daemon()
+        except DetectorUnavailable:
+            st.error("❌ No detector daemon is running. Start one with:")
+            st.code("python -m src.detector --interface <interface> --exclude-port "
+                    f"{st.get_option('server.port')}", language="bash")
+            return
+        
+        status = state.read_status()
+        st.success(f"✅ Attached to detector (PID {status['pid']}) on interface: {status['interface']}")
+        st.caption(f"Threshold {status['threshold']:.2f}"
+                   + (f" · kernel filter: `{status['capture_filter']}`" if status['capture_filter'] else ""))
+        
+        # Counters and history are read straight from the daemon's shared memory
+        def read_stats():
+            return state.read_status()
+        
+        def read_packets():
+            return state.packet_history.snapshot(CHART_PACKETS)
+        
+        def read_threats():
+            return state.threat_history.snapshot(50)
+        
+        def interface_names(stats):
+            return [interface['name'] for interface in stats['interfaces']]
+    
+    else:
+        if replay_mode:
             try:
-                # Disable unnecessary features
-                conf.use_pcap = False
-                conf.use_bpf = False
-                
-                # Try to start sniffing
-                st.info("Starting packet capture... This may take a few moments.")
-                sniff_thread = Thread(target=lambda: sniff(
-                    iface=selected_interface,
-                    prn=packet_callback,
-                    store=False
-                ))
-                sniff_thread.daemon = True
-                sniff_thread.start()
-                st.success(f"✅ Successfully started monitoring on interface: {selected_interface}")
-            except Exception as e:
-                st.error(f"❌ Error starting packet capture: {str(e)}\n\nTry running with administrator privileges.")
-                monitoring = False
+                replay_path = resolve_capture(replay_path) if replay_path else None
+            except PermissionError as e:
+                st.error(f"❌ {str(e)}")
+                return
+            if not replay_path or not os.path.isfile(replay_path):
+                st.warning(f"Enter the path of a pcap or pcapng file under `{CAPTURES_DIR}/` to replay.")
                 return
+            capture_sources = (PcapReplaySource(replay_path, REPLAY_SPEEDS[replay_speed],
+                                                int(replay_loops), int(replay_seed)),)
+        elif not selected_interfaces:
+            st.warning("Select at least one network interface to monitor.")
+            return
+        else:
+            capture_sources = tuple(selected_interfaces)
+        source_names = [getattr(capture_source, 'name', capture_source) for capture_source in capture_sources]
+        # Sessions with the same settings share one capture and scoring pipeline
+        engine = get_engine()
+        session_id = st.session_state.engine_session
+        try:
+            # Disable unnecessary features
+            conf.use_pcap = False
+            conf.use_bpf = False
             
-            while monitoring:
-                # Update traffic chart
-                if st.session_state.packet_history:
-                    fig = create_network_chart(st.session_state.packet_history)
-                    if fig:
-                        chart_placeholder.plotly_chart(fig, use_container_width=True)
-                
-                # Update threat table
-                if st.session_state.threat_history:
-                    df = pd.DataFrame(st.session_state.threat_history[-50:])  # Show last 50 threats
-                    df['timestamp'] = pd.to_datetime(df['timestamp'])
-                    df = df.sort_values('timestamp', ascending=False)
-                    
-                    # Format the dataframe
-                    df['threat_score'] = df['threat_score'].apply(lambda x: f"{x:.2%}")
-                    df['timestamp'] = df['timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S')
-                    
-                    threats_table.dataframe(
-                        df,
-                        column_config={
-                            "timestamp": "Time",
-                            "source_ip": "Source IP",
-                            "source_port": "Source Port",
-                            "dest_ip": "Destination IP",
-                            "dest_port": "Destination Port",
-                            "protocol": "Protocol",
-                            "size": "Size (bytes)",
-                            "flags": "Flags",
-                            "threat_score": "Threat Score"
-                        },
-                        hide_index=True,
-                        use_container_width=True
-                    )
-                
-                time.sleep(interval)
-                
+            started = engine.acquire(
+                session_id,
+                capture_sources,
+                st.session_state.minmax_scaler,
+                st.session_state.standard_scaler,
+                packet_capacity=packet_capacity,
+                threat_capacity=threat_capacity,
+                threshold=threshold,
+                capture_filter=capture_filter,
+                overflow=overflow,
+                queue_capacity=queue_capacity,
+                workers=workers,
+                second_stage_path=second_stage_path,
+                band=band
+            )
+            if started:
+                st.success(f"✅ Successfully started monitoring on: {', '.join(source_names)}")
+            else:
+                st.success(f"✅ Joined the running capture on: {', '.join(source_names)}")
+            if capture_filter:
+                st.caption(f"Kernel filter: `{capture_filter}`")
+        except CaptureFilterError as e:
+            st.error(f"❌ Invalid capture filter: {str(e)}")
+            return
         except Exception as e:
-            st.error(f"Error monitoring network: {str(e)}\n\nTry running with administrator privileges.")
-            monitoring = False
+            st.error(f"❌ Error starting packet capture: {str(e)}\n\nTry running with administrator privileges.")
+            return
+        
+        # Every viewer reads the same periodically refreshed snapshot; None once the capture is gone
+        def read_stats():
+            snapshot = engine.snapshot(session_id)
+            return snapshot.stats if snapshot is not None else None
+        
+        def read_packets():
+            snapshot = engine.snapshot(session_id)
+            return snapshot.packets if snapshot is not None else np.zeros(0, dtype=PACKET_DTYPE)
+        
+        def read_threats():
+            snapshot = engine.snapshot(session_id)
+            return snapshot.threats if snapshot is not None else np.zeros(0, dtype=PACKET_DTYPE)
+        
+        def interface_names(stats):
+            return source_names
+    
+    # Each region reruns on its own schedule without rerunning the page
+    @fragment(run_every=interval * REFRESH_EVERY['stats'])
+    def live_stats():
+        with render_latency.time():
+            stats = read_stats()
+            if stats is None:
+                render_stats(st.session_state.total_packets, st.session_state.threats_detected)
+                return
+            if not daemon_mode:
+                st.session_state.total_packets = stats['inspected']
+                st.session_state.threats_detected = stats['threats']
+            render_stats(stats['inspected'], stats['threats'])
+            render_pipeline_stats(stats)
+    
+    @fragment(run_every=interval * REFRESH_EVERY['chart'])
+    def live_chart():
+        with render_latency.time():
+            stats = read_stats()
+            if stats is None:
+                st.warning("Capture was stopped; toggle monitoring to restart it.")
+                return
+            fig = create_network_chart(read_packets(), interfaces=interface_names(stats))
+            if fig:
+                st.plotly_chart(fig, use_container_width=True)
+            if stats['last_error']:
+                st.error(f"Detector error: {stats['last_error']}")
+            if daemon_mode and not state.alive():
+                st.warning("Detector daemon stopped publishing; showing its last state.")
+            if replay_mode and not stats['running']:
+                st.info("📼 Replay finished; toggle monitoring to replay again.")
+    
+    @fragment(run_every=interval * REFRESH_EVERY['threats'])
+    def live_threats():
+        with render_latency.time():
+            stats = read_stats()
+            if stats is not None:
+                render_threats(read_threats(), interface_names(stats))
+    
+    with chart_container:
+        live_chart()
+    with stats_container:
+        live_stats()
+    with threats_container:
+        live_threats()
 
 # Show the network monitoring page
 show_real_time()
\ No newline at end of file
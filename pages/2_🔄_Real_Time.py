@@ -2,16 +2,17 @@ import streamlit as st
 import time
 import numpy as np
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from scapy.all import sniff, get_if_list, IP
-from src.utils import process_packet, preprocess_data, load_scalers
-from src.model_loader import load_model
-from threading import Thread
-from datetime import datetime, timedelta
+from scapy.all import get_if_list
+from src.utils import IMPORTANT_FEATURES, load_scalers, process_packets
+from src.flows import FlowTable
+from src.fused import RegistryScorer
+from src.traffic_gen import ATTACK_PROFILES, LABELS, TrafficGenerator
+from src.ring_buffer import local_times, records_frame
+from src.components.charts import time_series_chart
+from src.components.fragments import fragment
+from src.shared_state import DetectorUnavailable, SharedDetectorState
 
-# Initialize model and scalers
-model = load_model()
+# Initialize scalers; the model comes from the shared registry
 if 'minmax_scaler' not in st.session_state or 'standard_scaler' not in st.session_state:
     st.session_state.minmax_scaler, st.session_state.standard_scaler = load_scalers()
 
@@ -25,69 +26,86 @@ if 'total_packets' not in st.session_state:
 if 'threats_detected' not in st.session_state:
     st.session_state.threats_detected = 0
 
+DAEMON_SOURCE = "Detector Daemon"
+# Packets behind the live chart; it draws a downsampled line, not every packet
+CHART_PACKETS = 16384
+# Refresh period of each live region in update intervals; tables change least often
+REFRESH_EVERY = {'stats': 1, 'chart': 1, 'alerts': 2}
+
+def detector_daemon_available():
+    """Check whether a live detector daemon (``python -m src.detector``) can be attached"""
+    try:
+        state = SharedDetectorState.attach()
+    except DetectorUnavailable:
+        return False
+    alive = state.alive()
+    state.close()
+    return alive
+
 def get_available_interfaces():
     """Get list of available network interfaces with error handling"""
+    daemon = [DAEMON_SOURCE] if detector_daemon_available() else []
     try:
         interfaces = get_if_list()
         if not interfaces:
-            return ["Simulation Mode"]
-        return interfaces
-    except Exception as e:
+            return daemon + ["Simulation Mode"]
+        return daemon + interfaces
+    except Exception:
         st.info("Running in simulation mode due to limited network access")
-        return ["Simulation Mode"]
+        return daemon + ["Simulation Mode"]
 
-def generate_simulated_packet():
-    """Generate a simulated network packet for testing"""
-    packet_data = pd.DataFrame({
-        'protocol': [np.random.choice([6, 17])],  # TCP or UDP
-        'sbytes': [np.random.randint(40, 1500)],
-        'dbytes': [np.random.randint(40, 1500)],
-        'rate': [np.random.uniform(1, 100)]
-    })
-    return packet_data
+def attach_daemon():
+    """Return this session's read-only view of the detector daemon, attaching on first use"""
+    if 'rt_daemon_state' not in st.session_state:
+        st.session_state.rt_daemon_state = SharedDetectorState.attach()
+    return st.session_state.rt_daemon_state
 
-def create_network_chart(data, title="Network Traffic"):
-    fig = go.Figure()
-    
-    fig.add_trace(go.Scatter(
-        y=data['sbytes'],
-        name='Source Bytes',
-        line=dict(color='#1E88E5', width=2),
-        fill='tozeroy',
-        fillcolor='rgba(30,136,229,0.1)'
-    ))
-    
-    fig.add_trace(go.Scatter(
-        y=data['dbytes'],
-        name='Destination Bytes',
-        line=dict(color='#64B5F6', width=2),
-        fill='tozeroy',
-        fillcolor='rgba(100,181,246,0.1)'
-    ))
-    
-    fig.update_layout(
-        title={
-            'text': title,
-            'y':0.95,
-            'x':0.5,
-            'xanchor': 'center',
-            'yanchor': 'top'
-        },
-        showlegend=True,
-        legend=dict(
-            orientation="h",
-            yanchor="bottom",
-            y=1.02,
-            xanchor="right",
-            x=1
-        ),
-        margin=dict(l=20, r=20, t=50, b=20),
+def detach_daemon():
+    state = st.session_state.pop('rt_daemon_state', None)
+    if state is not None:
+        state.close()
+
+def simulation_state(rate, attack_fraction, attacks):
+    """This session's synthetic traffic source and per-profile counts, restarted when its settings change"""
+    settings = (rate, attack_fraction, tuple(attacks))
+    simulation = st.session_state.get('rt_simulation')
+    if simulation is None or simulation['settings'] != settings:
+        simulation = st.session_state.rt_simulation = {
+            'settings': settings,
+            'generator': TrafficGenerator(rate=rate, attack_fraction=attack_fraction,
+                                          attacks=attacks, start=time.time()),
+            'flow_table': FlowTable(max_flows=262144),
+            'score': RegistryScorer(st.session_state.minmax_scaler, st.session_state.standard_scaler),
+            'seen': np.zeros(len(LABELS), dtype=np.int64),
+            'flagged': np.zeros(len(LABELS), dtype=np.int64),
+        }
+    return simulation
+
+# Synthetic traffic rates offered in Simulation Mode, in packets per second
+SIMULATION_RATES = [1000, 10000, 100000]
+PROFILE_NAMES = {
+    'benign': "Benign",
+    'syn_flood': "SYN Flood",
+    'port_scan': "Port Scan",
+    'udp_amplification': "UDP Amplification",
+    'slow_exfiltration': "Slow Exfiltration",
+}
+
+def create_network_chart(data, title="Network Traffic", x=None):
+    """Source and destination bytes per packet, downsampled and drawn into this session's reused figure"""
+    return time_series_chart(
+        "real_time_traffic",
+        x,
+        {'Source Bytes': data['sbytes'], 'Destination Bytes': data['dbytes']},
+        title,
         height=400,
-        template="plotly_white",
-        hovermode='x unified'
+        showlegend=True,
+        hovermode='x unified',
+        title_x=0.5,
+        title_y=0.95,
+        title_xanchor='center',
+        title_yanchor='top'
     )
-    
-    return fig
 
 def show_real_time():
     st.title("🌐 Real-Time Network Monitoring")
@@ -104,6 +122,21 @@ def show_real_time():
     
     if selected_interface == "Simulation Mode":
         st.info("🔄 Running in simulation mode - generating synthetic network traffic")
+        sim_col1, sim_col2, sim_col3 = st.columns([1,1,2])
+        with sim_col1:
+            sim_rate = st.select_slider("📈 Packets/s", SIMULATION_RATES, value=10000, key="rt_sim_rate")
+        with sim_col2:
+            attack_percent = st.slider("☠️ Attack Traffic (%)", 0, 50, 5, key="rt_sim_attack")
+        with sim_col3:
+            attack_profiles = st.multiselect(
+                "🎭 Attack Profiles",
+                ATTACK_PROFILES,
+                default=list(ATTACK_PROFILES),
+                format_func=PROFILE_NAMES.get,
+                key="rt_sim_profiles"
+            )
+    elif selected_interface == DAEMON_SOURCE:
+        st.info("👁️ Read-only view of the detector daemon; its own threshold applies")
     
     # Create main layout
     chart_col, stats_col = st.columns([3, 1])
@@ -111,65 +144,146 @@ def show_real_time():
     with stats_col:
         st.markdown("### 📊 Network Stats")
         monitoring = st.toggle("🚀 Start Monitoring", key="rt_monitor")
-        
-        # Stats metrics
-        st.metric("Total Packets", f"{st.session_state.total_packets:,}", 
+        stats_container = st.container()
+    
+    with chart_col:
+        chart_container = st.container()
+        alert_container = st.container()
+    
+    daemon_mode = selected_interface == DAEMON_SOURCE
+    simulation_mode = selected_interface == "Simulation Mode"
+    
+    def render_stats(total_packets, threats_detected):
+        st.metric("Total Packets", f"{total_packets:,}", 
                  delta="Active" if monitoring else "Inactive")
-        st.metric("Threats Detected", f"{st.session_state.threats_detected:,}",
+        st.metric("Threats Detected", f"{threats_detected:,}",
                  delta="Scanning" if monitoring else None,
                  delta_color="inverse")
         
         # Health indicator
-        health_score = 100 - (st.session_state.threats_detected / max(st.session_state.total_packets, 1) * 100)
+        health_score = 100 - (threats_detected / max(total_packets, 1) * 100)
         st.progress(health_score/100, text=f"Network Health: {health_score:.1f}%")
     
-    with chart_col:
-        chart_container = st.container()
-        with chart_container:
-            chart_placeholder = st.empty()
-            alert_placeholder = st.empty()
+    if not monitoring or not daemon_mode:
+        detach_daemon()
+    if not monitoring or not simulation_mode:
+        st.session_state.pop('rt_simulation', None)
+    
+    if not monitoring or not (daemon_mode or simulation_mode):
+        with stats_container:
+            render_stats(st.session_state.total_packets, st.session_state.threats_detected)
+        return
     
-    if monitoring:
-        packet_buffer = []
+    if daemon_mode:
+        try:
+            state = attach_daemon()
+        except DetectorUnavailable:
+            st.error("❌ The detector daemon is no longer running")
+            return
         
-        if selected_interface == "Simulation Mode":
-            while monitoring:
-                packet_data = generate_simulated_packet()
-                packet_buffer.append(packet_data)
-                
-                if len(packet_buffer) >= 10:
-                    live_data = pd.concat(packet_buffer, ignore_index=True)
-                    packet_buffer = []
-                    
-                    # Update session state
-                    st.session_state.total_packets += len(live_data)
-                    
-                    # Process and predict
-                    processed = preprocess_data(live_data,
-                                           st.session_state.minmax_scaler,
-                                           st.session_state.standard_scaler)
-                    prediction = model.predict(processed)
-                    
-                    # Update threat count
-                    threats = sum(prediction > threshold)
-                    st.session_state.threats_detected += threats
-                    
-                    # Update visualizations
-                    fig = create_network_chart(live_data, "Live Traffic (Simulation)")
-                    chart_placeholder.plotly_chart(fig, use_container_width=True)
-                    
-                    if threats > 0:
-                        alert_placeholder.error(f"⚠️ {threats} potential threats detected!")
-                        alerts = live_data[prediction > threshold]
-                        alert_placeholder.dataframe(
-                            alerts.style
-                            .background_gradient(cmap='Reds')
-                            .format({col: '{:.2f}' for col in alerts.select_dtypes('float').columns})
-                        )
-                    else:
-                        alert_placeholder.success("✅ No threats detected")
-                
-                time.sleep(interval)
+        # Read the daemon's counters and history in place; nothing is captured here
+        @fragment(run_every=interval * REFRESH_EVERY['stats'])
+        def live_stats():
+            status = state.read_status()
+            render_stats(status['inspected'], status['threats'])
+        
+        @fragment(run_every=interval * REFRESH_EVERY['chart'])
+        def live_chart():
+            status = state.read_status()
+            window = state.packet_history.snapshot(CHART_PACKETS)
+            fig = time_series_chart(
+                "real_time_daemon",
+                local_times(window['ts_ns']),
+                {'Packet Size': window['size']},
+                f"Live Traffic ({status['interface']}) · {status['inspected']:,} packets, "
+                f"{status['threats']:,} threats",
+                height=400
+            )
+            st.plotly_chart(fig, use_container_width=True)
+        
+        @fragment(run_every=interval * REFRESH_EVERY['alerts'])
+        def live_alerts():
+            if len(state.threat_history):
+                status = state.read_status()
+                alerts = records_frame(state.threat_history.snapshot(20),
+                                       [interface['name'] for interface in status['interfaces']])
+                st.dataframe(
+                    alerts.sort_values('timestamp', ascending=False)
+                    .style
+                    .background_gradient(cmap='Reds', subset=['threat_score'])
+                    .format({'threat_score': '{:.2%}'}),
+                    hide_index=True
+                )
+            else:
+                st.success("✅ No threats detected")
+    
+    else:
+        # Whole batches of labelled synthetic headers go through the same
+        # feature extraction and scoring as captured packets
+        simulation = simulation_state(sim_rate, attack_percent / 100, attack_profiles)
+        
+        @fragment(run_every=interval * REFRESH_EVERY['stats'])
+        def live_stats():
+            render_stats(st.session_state.total_packets, st.session_state.threats_detected)
+        
+        @fragment(run_every=interval * REFRESH_EVERY['chart'])
+        def live_chart():
+            # One batch per interval, so the generated rate matches the selected one
+            started = time.perf_counter()
+            headers, labels = simulation['generator'].batch(max(1, int(sim_rate * interval)))
+            features = process_packets(headers, flow_table=simulation['flow_table'])
+            prediction = simulation['score'](features)
+            elapsed = time.perf_counter() - started
+            
+            # Update session state
+            threat = prediction > threshold
+            threats = int(threat.sum())
+            st.session_state.total_packets += len(headers)
+            st.session_state.threats_detected += threats
+            simulation['seen'] += np.bincount(labels, minlength=len(LABELS))
+            simulation['flagged'] += np.bincount(labels[threat], minlength=len(LABELS))
+            
+            # Update visualizations
+            live_data = {name: features[:, IMPORTANT_FEATURES.index(name)] for name in ('sbytes', 'dbytes')}
+            fig = create_network_chart(live_data, "Live Traffic (Simulation)",
+                                       local_times((headers['ts'] * 1e9).astype(np.int64)))
+            st.plotly_chart(fig, use_container_width=True)
+            
+            if threats > 0:
+                st.error(f"⚠️ {threats} potential threats detected!")
+            else:
+                st.success("✅ No threats detected")
+            st.caption(f"Analyzed {len(headers):,} packets in {elapsed * 1000:.0f} ms "
+                       f"({len(headers) / max(elapsed, 1e-9):,.0f} packets/s)")
+        
+        @fragment(run_every=interval * REFRESH_EVERY['alerts'])
+        def live_alerts():
+            # Detection rate per profile doubles as an accuracy check against the labels
+            seen, flagged = simulation['seen'], simulation['flagged']
+            detection = pd.DataFrame({
+                'Profile': [PROFILE_NAMES[name] for name in LABELS],
+                'Packets': seen,
+                'Flagged': flagged,
+                'Flagged (%)': flagged / np.maximum(seen, 1) * 100,
+            })
+            st.dataframe(
+                detection[detection['Packets'] > 0],
+                column_config={
+                    'Flagged (%)': st.column_config.ProgressColumn(
+                        'Flagged (%)', format='%.1f%%', min_value=0, max_value=100
+                    )
+                },
+                hide_index=True,
+                use_container_width=True
+            )
+    
+    # Each region reruns on its own schedule without rerunning the page
+    with chart_container:
+        live_chart()
+    with stats_container:
+        live_stats()
+    with alert_container:
+        live_alerts()
 
 # Initialize and show the page
 show_real_time()
\ No newline at end of file
@@ -1,18 +1,25 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
 import plotly.graph_objects as go
-from scapy.all import rdpcap
-import io
-import numpy as np
-from datetime import datetime
+import os
+from src.analysis import analyze_pcap, THREAT_TYPES
+from src.pcap_reader import CAPTURES_DIR, PcapFormatError, resolve_capture
+from src.model_loader import get_model
+from src.utils import load_scalers
 
-def create_packet_summary(data):
+# Initialize model and scalers
+model = get_model()
+if 'minmax_scaler' not in st.session_state or 'standard_scaler' not in st.session_state:
+    st.session_state.minmax_scaler, st.session_state.standard_scaler = load_scalers()
+
+SEVERITY_ICONS = {'High': '🔴', 'Medium': '🟡', 'Low': '🟢'}
+
+def create_packet_summary(protocol_counts):
     """Create a summary visualization for packet analysis"""
     fig = go.Figure()
     
     # Add protocol distribution
-    protocols = data['protocol'].value_counts()
+    protocols = pd.Series(protocol_counts).sort_values(ascending=False)
     fig.add_trace(go.Bar(
         x=protocols.index,
         y=protocols.values,
@@ -31,17 +38,51 @@ def create_packet_summary(data):
     
     return fig
 
-def analyze_packets(data):
-    """Analyze packet data and return insights"""
-    total_packets = len(data)
-    avg_size = data['size'].mean()
-    protocols = data['protocol'].value_counts()
+def analyze_capture(stream, total_bytes, threshold):
+    """Stream a capture through the detection pipeline with a progress bar"""
+    progress_bar = st.progress(0.0, text="Analyzing capture...")
     
-    return {
-        'total': total_packets,
-        'avg_size': avg_size,
-        'protocols': protocols
-    }
+    def report(packets):
+        position = stream.tell() if hasattr(stream, 'tell') else 0
+        fraction = min(position / total_bytes, 1.0) if total_bytes else 0.0
+        progress_bar.progress(fraction, text=f"Analyzed {packets:,} packets ({fraction:.0%})")
+    
+    summary = analyze_pcap(stream, model,
+                           st.session_state.minmax_scaler,
+                           st.session_state.standard_scaler,
+                           threshold=threshold,
+                           progress=report)
+    progress_bar.empty()
+    return summary
+
+def metric_card(title, value, caption):
+    st.markdown(f"""
+    <div class="metrics-container">
+        <h3 style='color: #1E88E5; margin: 0;'>{title}</h3>
+        <h2 style='margin: 10px 0;'>{value}</h2>
+        <p style='color: #666; margin: 0;'>{caption}</p>
+    </div>
+    """, unsafe_allow_html=True)
+
+def list_card(title, items):
+    entries = "".join(f"<li>{item}</li>" for item in items) or "<li>No IP traffic</li>"
+    st.markdown(f"""
+    <div class="metrics-container">
+        <h3>{title}</h3>
+        <ul>
+            {entries}
+        </ul>
+    </div>
+    """, unsafe_allow_html=True)
+
+def risk_rating(summary):
+    """Rate overall risk from the share of flagged packets"""
+    ratio = summary.threats / max(summary.ip_packets, 1)
+    if ratio >= 0.05:
+        return "High"
+    if ratio >= 0.01:
+        return "Medium"
+    return "Low"
 
 def show_security_analysis():
     st.title("🛡️ Security Analysis")
@@ -55,18 +96,37 @@ def show_security_analysis():
     """, unsafe_allow_html=True)
     
     uploaded_file = st.file_uploader("Choose a PCAP file for analysis", type=['pcap', 'pcapng'])
+    capture_path = st.text_input(
+        "…or a capture path on this server",
+        placeholder=f"e.g. {CAPTURES_DIR}/sample.pcap",
+        help=f"Large captures under the `{CAPTURES_DIR}/` directory can be read directly from disk "
+             "instead of uploaded through the browser."
+    )
+    threshold = st.slider("🎯 Detection Threshold", 0.0, 1.0, 0.8, key="sa_threshold")
     
+    source = None
     if uploaded_file:
-        # Create sample data (replace with actual PCAP parsing in production)
-        num_packets = 1000
-        sample_data = pd.DataFrame({
-            'timestamp': [datetime.now() for _ in range(num_packets)],
-            'protocol': np.random.choice(['TCP', 'UDP', 'ICMP'], num_packets),
-            'source': [f'192.168.1.{np.random.randint(1, 255)}' for _ in range(num_packets)],
-            'destination': [f'10.0.0.{np.random.randint(1, 255)}' for _ in range(num_packets)],
-            'size': np.random.randint(64, 1500, num_packets),
-            'flags': np.random.choice(['SYN', 'ACK', 'PSH', 'FIN'], num_packets)
-        })
+        source = (uploaded_file.file_id, threshold)
+    elif capture_path:
+        source = (capture_path, threshold)
+    
+    if source and st.session_state.get('sa_source') != source:
+        try:
+            if uploaded_file:
+                uploaded_file.seek(0)
+                summary = analyze_capture(uploaded_file, uploaded_file.size, threshold)
+            else:
+                path = resolve_capture(capture_path)
+                with open(path, 'rb') as stream:
+                    summary = analyze_capture(stream, os.path.getsize(path), threshold)
+        except (PcapFormatError, OSError) as e:
+            st.error(f"❌ Could not read capture: {str(e)}")
+            return
+        st.session_state.sa_source = source
+        st.session_state.sa_summary = summary
+    
+    if source:
+        summary = st.session_state.sa_summary
         
         # Security Overview
         st.markdown("""
@@ -77,39 +137,16 @@ def show_security_analysis():
         """, unsafe_allow_html=True)
         
         # Key metrics
+        coverage = summary.ip_packets / max(summary.packets, 1)
         col1, col2, col3, col4 = st.columns(4)
         with col1:
-            st.markdown("""
-            <div class="metrics-container">
-                <h3 style='color: #1E88E5; margin: 0;'>📦 Packets</h3>
-                <h2 style='margin: 10px 0;'>1,000</h2>
-                <p style='color: #666; margin: 0;'>Total analyzed</p>
-            </div>
-            """, unsafe_allow_html=True)
+            metric_card("📦 Packets", f"{summary.packets:,}", "Total analyzed")
         with col2:
-            st.markdown("""
-            <div class="metrics-container">
-                <h3 style='color: #1E88E5; margin: 0;'>⚠️ Threats</h3>
-                <h2 style='margin: 10px 0;'>15</h2>
-                <p style='color: #666; margin: 0;'>Detected</p>
-            </div>
-            """, unsafe_allow_html=True)
+            metric_card("⚠️ Threats", f"{summary.threats:,}", "Detected")
         with col3:
-            st.markdown("""
-            <div class="metrics-container">
-                <h3 style='color: #1E88E5; margin: 0;'>🔍 Analysis</h3>
-                <h2 style='margin: 10px 0;'>98%</h2>
-                <p style='color: #666; margin: 0;'>Coverage</p>
-            </div>
-            """, unsafe_allow_html=True)
+            metric_card("🔍 Analysis", f"{coverage:.0%}", "Coverage")
         with col4:
-            st.markdown("""
-            <div class="metrics-container">
-                <h3 style='color: #1E88E5; margin: 0;'>📊 Risk Score</h3>
-                <h2 style='margin: 10px 0;'>Low</h2>
-                <p style='color: #666; margin: 0;'>Overall rating</p>
-            </div>
-            """, unsafe_allow_html=True)
+            metric_card("📊 Risk Score", risk_rating(summary), "Overall rating")
         
         # Detailed Analysis Tabs
         st.markdown("""
@@ -123,35 +160,25 @@ def show_security_analysis():
         
         with tab1:
             # Protocol distribution
-            st.plotly_chart(create_packet_summary(sample_data), use_container_width=True)
+            protocol_counts = summary.protocol_counts()
+            if protocol_counts:
+                st.plotly_chart(create_packet_summary(protocol_counts), use_container_width=True)
             
             # Traffic patterns
             col1, col2 = st.columns(2)
             with col1:
-                st.markdown("""
-                <div class="metrics-container">
-                    <h3>Top Sources</h3>
-                    <ul>
-                        <li>192.168.1.100 (25%)</li>
-                        <li>192.168.1.150 (18%)</li>
-                        <li>192.168.1.200 (15%)</li>
-                    </ul>
-                </div>
-                """, unsafe_allow_html=True)
+                list_card("Top Sources", [f"{ip} ({share:.0%})" for ip, share in summary.top_sources()])
             with col2:
-                st.markdown("""
-                <div class="metrics-container">
-                    <h3>Top Destinations</h3>
-                    <ul>
-                        <li>10.0.0.50 (30%)</li>
-                        <li>10.0.0.25 (22%)</li>
-                        <li>10.0.0.75 (12%)</li>
-                    </ul>
-                </div>
-                """, unsafe_allow_html=True)
+                list_card("Top Destinations", [f"{ip} ({share:.0%})" for ip, share in summary.top_destinations()])
         
         with tab2:
-            st.markdown("""
+            rows = "".join(f"""
+                    <tr>
+                        <td>{threat_type}</td>
+                        <td>{summary.threat_types.get(threat_type, 0):,}</td>
+                        <td>{SEVERITY_ICONS[severity]} {severity}</td>
+                    </tr>""" for threat_type, severity in THREAT_TYPES.items())
+            st.markdown(f"""
             <div class="metrics-container">
                 <h3>Detected Threats</h3>
                 <table style="width:100%">
@@ -159,66 +186,48 @@ def show_security_analysis():
                         <th>Type</th>
                         <th>Count</th>
                         <th>Severity</th>
-                    </tr>
-                    <tr>
-                        <td>Port Scan</td>
-                        <td>5</td>
-                        <td>🟡 Medium</td>
-                    </tr>
-                    <tr>
-                        <td>DDoS Attempt</td>
-                        <td>2</td>
-                        <td>🔴 High</td>
-                    </tr>
-                    <tr>
-                        <td>Suspicious Traffic</td>
-                        <td>8</td>
-                        <td>🟡 Medium</td>
-                    </tr>
+                    </tr>{rows}
                 </table>
             </div>
             """, unsafe_allow_html=True)
             
-            # Show threat details in a dataframe
-            threats = sample_data.sample(15)  # Simulate threat data
-            threats['threat_type'] = np.random.choice(['Port Scan', 'DDoS', 'Suspicious'], 15)
-            threats['severity'] = np.random.choice(['High', 'Medium', 'Low'], 15)
-            st.dataframe(
-                threats,
-                column_config={
-                    "timestamp": "Time",
-                    "source": "Source IP",
-                    "destination": "Destination IP",
-                    "threat_type": "Threat Type",
-                    "severity": "Severity"
-                },
-                use_container_width=True
-            )
+            # Show the highest-scoring threats in a dataframe
+            threats = pd.DataFrame(summary.top_threats())
+            if threats.empty:
+                st.success("✅ No threats detected")
+            else:
+                threats['threat_score'] = threats['threat_score'].apply(lambda x: f"{x:.2%}")
+                st.dataframe(
+                    threats,
+                    column_config={
+                        "timestamp": "Time",
+                        "source_ip": "Source IP",
+                        "source_port": "Source Port",
+                        "dest_ip": "Destination IP",
+                        "dest_port": "Destination Port",
+                        "protocol": "Protocol",
+                        "size": "Size (bytes)",
+                        "flags": "Flags",
+                        "threat_type": "Threat Type",
+                        "severity": "Severity",
+                        "threat_score": "Threat Score"
+                    },
+                    hide_index=True,
+                    use_container_width=True
+                )
         
         with tab3:
             col1, col2 = st.columns(2)
             with col1:
-                st.markdown("""
-                <div class="metrics-container">
-                    <h3>Protocol Statistics</h3>
-                    <ul>
-                        <li>TCP: 65%</li>
-                        <li>UDP: 30%</li>
-                        <li>ICMP: 5%</li>
-                    </ul>
-                </div>
-                """, unsafe_allow_html=True)
+                total = max(summary.ip_packets, 1)
+                list_card("Protocol Statistics",
+                          [f"{name}: {count / total:.0%}" for name, count in protocol_counts.most_common()])
             with col2:
-                st.markdown("""
-                <div class="metrics-container">
-                    <h3>Packet Sizes</h3>
-                    <ul>
-                        <li>Average: 782 bytes</li>
-                        <li>Maximum: 1,500 bytes</li>
-                        <li>Minimum: 64 bytes</li>
-                    </ul>
-                </div>
-                """, unsafe_allow_html=True)
+                list_card("Packet Sizes", [
+                    f"Average: {summary.bytes / max(summary.packets, 1):,.0f} bytes",
+                    f"Maximum: {summary.max_size:,} bytes",
+                    f"Minimum: {summary.min_size or 0:,} bytes",
+                ])
     else:
         st.info("📤 Upload a PCAP file to begin security analysis")
 
@@ -5,6 +5,7 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 from src.utils import IMPORTANT_FEATURES
+from src.components.charts import time_series_chart
 
 def generate_sample_data(n_samples=1000):
     """Generate sample network traffic data for visualization"""
@@ -26,33 +27,14 @@ def generate_sample_data(n_samples=1000):
     return pd.DataFrame(data)
 
 def create_time_series(data, title="Network Traffic Over Time"):
-    fig = go.Figure()
-    
-    fig.add_trace(go.Scatter(
-        x=data['timestamp'],
-        y=data['total_bytes'],
-        name='Traffic Volume',
-        line=dict(color='#1E88E5', width=2),
-        fill='tozeroy',
-        fillcolor='rgba(30,136,229,0.1)'
-    ))
-    
-    fig.update_layout(
-        title=title,
-        template="plotly_white",
+    return time_series_chart(
+        "analytics_traffic",
+        data['timestamp'],
+        {'Traffic Volume': data['total_bytes']},
+        title,
         height=400,
-        showlegend=True,
-        legend=dict(
-            orientation="h",
-            yanchor="bottom",
-            y=1.02,
-            xanchor="right",
-            x=1
-        ),
-        margin=dict(l=20, r=20, t=50, b=20)
+        showlegend=True
     )
-    
-    return fig
 
 def create_protocol_pie(data):
     counts = data['protocol'].value_counts()
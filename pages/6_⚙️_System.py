@@ -1,9 +1,29 @@
 import streamlit as st
 import psutil
 import platform
-import plotly.graph_objects as go
+import time
 from datetime import datetime, timedelta
 import numpy as np
+import pandas as pd
+from src.metrics import (DEFAULT_EXPORTER_PORT, Counter, exporter_address, get_metrics,
+                         start_exporter, stop_exporter)
+from src.ring_buffer import local_times
+from src.components.charts import gauge_chart, time_series_chart
+from src.system_sampler import counter_rates, get_sampler
+
+# Pipeline stages in the order a packet passes through them
+STAGES = [
+    ("capture", "Kernel timestamp → capture queue (sampled)"),
+    ("queue", "Waiting in the capture queue"),
+    ("decode", "Header decoding"),
+    ("features", "Feature extraction"),
+    ("scale", "Feature scaling"),
+    ("inference", "Model inference"),
+    ("worker", "Analysis process, per slot"),
+    ("render", "Dashboard render"),
+]
+
+HISTORY_LAYOUT = dict(height=200, margin=dict(l=20, r=20, t=40, b=20), showlegend=False)
 
 def get_system_info():
     """Get detailed system information"""
@@ -16,58 +36,60 @@ def get_system_info():
         "Total Disk": f"{psutil.disk_usage('/').total / (1024**3):.1f} GB"
     }
 
-def create_gauge_chart(value, title, max_value=100):
-    """Create a gauge chart for system metrics"""
-    fig = go.Figure(go.Indicator(
-        mode="gauge+number",
-        value=value,
-        title={'text': title, 'font': {'size': 24}},
-        gauge={
-            'axis': {'range': [0, max_value]},
-            'bar': {'color': "rgba(30,136,229,0.8)"},
-            'bgcolor': "white",
-            'steps': [
-                {'range': [0, max_value/3], 'color': "#E8F5E9"},
-                {'range': [max_value/3, max_value*2/3], 'color': "#FFF3E0"},
-                {'range': [max_value*2/3, max_value], 'color': "#FFEBEE"}
-            ],
-            'threshold': {
-                'line': {'color': "red", 'width': 4},
-                'thickness': 0.75,
-                'value': max_value*0.8
-            }
-        }
-    ))
-    
-    fig.update_layout(
-        height=200,
-        margin=dict(l=20, r=20, t=20, b=20)
-    )
-    
-    return fig
+def sample_times(ts):
+    """Sample timestamps (epoch seconds) as local datetimes for chart axes"""
+    return local_times((ts * 1e9).astype(np.int64))
 
-def create_line_chart(data, title):
-    """Create a line chart for time series data"""
-    fig = go.Figure()
-    
-    fig.add_trace(go.Scatter(
-        y=data,
-        mode='lines',
-        name=title,
-        line=dict(color='#1E88E5', width=2),
-        fill='tozeroy',
-        fillcolor='rgba(30,136,229,0.1)'
-    ))
-    
-    fig.update_layout(
-        title=title,
-        height=200,
-        margin=dict(l=20, r=20, t=40, b=20),
-        showlegend=False,
-        template="plotly_white"
-    )
-    
-    return fig
+def show_pipeline_metrics():
+    """Per-stage latency percentiles and counters recorded by this process"""
+    st.markdown("### ⏱️ Pipeline Latency")
+    
+    registry = get_metrics()
+    histograms = {metric.labels.get('stage'): metric.snapshot() for metric in registry.metrics()
+                  if metric.name == 'nids_stage_latency_seconds'}
+    rows = []
+    for stage, description in STAGES:
+        snapshot = histograms.get(stage)
+        if snapshot is None or not snapshot.count:
+            continue
+        rows.append({
+            'Stage': description,
+            'Calls': snapshot.count,
+            'Mean (ms)': snapshot.mean * 1000,
+            'p50 (ms)': snapshot.percentile(50) * 1000,
+            'p90 (ms)': snapshot.percentile(90) * 1000,
+            'p99 (ms)': snapshot.percentile(99) * 1000,
+            'Max (ms)': snapshot.max * 1000,
+        })
+    if rows:
+        st.dataframe(
+            pd.DataFrame(rows).style.format({col: '{:.3f}' for col in rows[0] if col.endswith('(ms)')}),
+            hide_index=True,
+            use_container_width=True
+        )
+    else:
+        st.info("No pipeline activity yet. Start monitoring on the Network Monitor page to record stage latencies.")
+    
+    counters = [metric for metric in registry.metrics() if isinstance(metric, Counter)]
+    if counters:
+        cols = st.columns(len(counters))
+        for col, metric in zip(cols, counters):
+            col.metric(metric.help, f"{metric.value:,}")
+    
+    with st.expander("📤 Prometheus Export"):
+        address = exporter_address()
+        port = st.number_input("Port", 1024, 65535, address[1] if address else DEFAULT_EXPORTER_PORT,
+                               key="system_metrics_port")
+        export = st.toggle("Serve /metrics on localhost", value=address is not None, key="system_metrics_export")
+        if export:
+            try:
+                address = start_exporter(int(port)).server_address
+                st.success(f"Scrape `http://{address[0]}:{address[1]}/metrics`")
+            except OSError as e:
+                st.error(f"❌ Could not listen on port {port}: {str(e)}")
+        elif address is not None:
+            stop_exporter()
+        st.caption("The detector daemon serves its own metrics with `python -m src.detector --metrics-port <port>`.")
 
 def show_system():
     st.title("⚙️ System Monitor")
@@ -81,45 +103,57 @@ def show_system():
         with cols[i % 3]:
             st.info(f"**{key}**: {value}")
     
-    # Resource Usage
+    # Resource Usage; samples are taken at a fixed interval by a background thread
     st.markdown("### 📊 Resource Usage")
     
-    # Initialize history in session state if not exists
-    if 'cpu_history' not in st.session_state:
-        st.session_state.cpu_history = []
-    if 'memory_history' not in st.session_state:
-        st.session_state.memory_history = []
-    
-    # Current Usage
-    cpu_percent = psutil.cpu_percent()
-    memory = psutil.virtual_memory()
-    disk = psutil.disk_usage('/')
-    
-    # Update history
-    st.session_state.cpu_history.append(cpu_percent)
-    st.session_state.memory_history.append(memory.percent)
-    
-    # Keep last 60 readings
-    st.session_state.cpu_history = st.session_state.cpu_history[-60:]
-    st.session_state.memory_history = st.session_state.memory_history[-60:]
+    sampler = get_sampler()
+    history = sampler.history()
+    if not len(history):
+        # The sampler has just started; take the first sample now
+        sampler.sample()
+        history = sampler.history()
+    latest = history[-1]
+    times = sample_times(history['ts'])
     
     # Display gauges
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        st.plotly_chart(create_gauge_chart(cpu_percent, "CPU Usage %"), use_container_width=True)
+        st.plotly_chart(gauge_chart("system_cpu", float(latest['cpu_percent']), "CPU Usage %"), use_container_width=True)
     with col2:
-        st.plotly_chart(create_gauge_chart(memory.percent, "Memory Usage %"), use_container_width=True)
+        st.plotly_chart(gauge_chart("system_memory", float(latest['memory_percent']), "Memory Usage %"), use_container_width=True)
     with col3:
-        st.plotly_chart(create_gauge_chart(disk.percent, "Disk Usage %"), use_container_width=True)
+        st.plotly_chart(gauge_chart("system_disk", float(latest['disk_percent']), "Disk Usage %"), use_container_width=True)
     
-    # Display history charts
+    # Display history charts; the whole sampler history, downsampled for drawing
+    st.caption(f"Last {len(history)} samples, one every {sampler.interval:g}s")
     col1, col2 = st.columns(2)
     
     with col1:
-        st.plotly_chart(create_line_chart(st.session_state.cpu_history, "CPU History"), use_container_width=True)
+        st.plotly_chart(time_series_chart("system_cpu_history", times, {"CPU History": history['cpu_percent']},
+                                          "CPU History", **HISTORY_LAYOUT), use_container_width=True)
     with col2:
-        st.plotly_chart(create_line_chart(st.session_state.memory_history, "Memory History"), use_container_width=True)
+        st.plotly_chart(time_series_chart("system_memory_history", times, {"Memory History": history['memory_percent']},
+                                          "Memory History", **HISTORY_LAYOUT), use_container_width=True)
+    
+    # The NIDS process itself
+    st.markdown("### 🛡️ NIDS Process")
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Process CPU", f"{latest['process_cpu_percent']:.1f}%")
+    col2.metric("Resident Memory", f"{latest['process_rss'] / 2**20:,.0f} MB")
+    col3.metric("Threads", int(latest['process_threads']))
+    
+    with st.expander("🧵 Per-thread CPU"):
+        threads = pd.DataFrame(sampler.threads)
+        if len(threads):
+            st.dataframe(
+                threads.rename(columns={'name': 'Thread', 'id': 'Native ID',
+                                        'cpu_percent': 'CPU (%)', 'cpu_seconds': 'CPU time (s)'}),
+                hide_index=True,
+                use_container_width=True
+            )
+    
+    show_pipeline_metrics()
     
     # Network Interfaces
     st.markdown("### 🌐 Network Interfaces")
@@ -127,12 +161,45 @@ def show_system():
     net_if_addrs = psutil.net_if_addrs()
     net_if_stats = psutil.net_if_stats()
     
+    # NIC receive rates next to what the NIDS actually inspected
+    inspected_ts, inspected = counter_rates(history, ['inspected', 'daemon_inspected'])
+    nic_rates = {}
+    for interface in sampler.nics:
+        _, rates = counter_rates(sampler.nic_history(interface, len(history)),
+                                 ['packets_recv', 'packets_sent', 'bytes_recv', 'bytes_sent', 'dropin'])
+        nic_rates[interface] = rates
+    received = sum((rates['packets_recv'] for rates in nic_rates.values()
+                    if len(rates['packets_recv']) == len(inspected_ts)), np.zeros(len(inspected_ts)))
+    if len(inspected_ts):
+        st.plotly_chart(time_series_chart(
+            "system_rates",
+            sample_times(inspected_ts),
+            {
+                "NIC rx packets/s (all interfaces)": received,
+                "Inspected packets/s (dashboard)": inspected['inspected'],
+                "Inspected packets/s (daemon)": inspected['daemon_inspected'],
+            },
+            "Received vs. Inspected",
+            fill=False,
+            height=250,
+            margin=dict(l=20, r=20, t=40, b=20),
+            hovermode='x unified'
+        ), use_container_width=True)
+    
     for interface, addresses in net_if_addrs.items():
         if interface in net_if_stats:
             stats = net_if_stats[interface]
             with st.expander(f"Interface: {interface}"):
                 st.write(f"Status: {'🟢 Up' if stats.isup else '🔴 Down'}")
                 st.write(f"Speed: {stats.speed} Mbps")
+                rates = nic_rates.get(interface)
+                if rates is not None and len(rates['packets_recv']):
+                    col1, col2, col3 = st.columns(3)
+                    col1.metric("RX", f"{rates['packets_recv'][-1]:,.0f} pkt/s",
+                                f"{rates['bytes_recv'][-1] * 8 / 1e6:,.2f} Mbit/s", delta_color="off")
+                    col2.metric("TX", f"{rates['packets_sent'][-1]:,.0f} pkt/s",
+                                f"{rates['bytes_sent'][-1] * 8 / 1e6:,.2f} Mbit/s", delta_color="off")
+                    col3.metric("RX dropped", f"{rates['dropin'][-1]:,.0f} pkt/s")
                 st.write("Addresses:")
                 for addr in addresses:
                     if addr.family == 2:  # IPv4
@@ -142,7 +209,8 @@ def show_system():
     
     # Auto-refresh
     if st.toggle("🔄 Auto Refresh", value=False, key="system_auto_refresh"):
-        st.empty()
+        # Refresh once per sample; rerunning sooner would only redraw the same data
+        time.sleep(sampler.interval)
         st.rerun()
 
 # Initialize and show the page
@@ -0,0 +1,180 @@
+import heapq
+from collections import Counter
+
+import numpy as np
+
+from src.decoder import PROTO_ICMP, PROTO_TCP, PROTO_UDP, decode_frames, format_ip, packet_info
+from src.flows import FlowTable
+from src.fused import build_scorer
+from src.pcap_reader import iter_chunks
+from src.utils import process_packets
+
+PROTOCOL_NAMES = {PROTO_ICMP: 'ICMP', PROTO_TCP: 'TCP', PROTO_UDP: 'UDP', 58: 'ICMPv6'}
+
+TCP_SYN = 0x02
+TCP_ACK = 0x10
+
+# Heuristic label for a flagged packet and the severity it is reported with
+THREAT_TYPES = {
+    'Port Scan': 'Medium',
+    'DDoS Attempt': 'High',
+    'Suspicious Traffic': 'Medium',
+}
+
+
+def protocol_name(proto):
+    """Return a display name for an IP protocol number"""
+    return PROTOCOL_NAMES.get(int(proto), str(int(proto)))
+
+
+def classify_threats(headers):
+    """Label flagged packets: bare SYNs as scans, UDP/ICMP as floods, the rest as suspicious"""
+    syn_only = (headers['protocol'] == PROTO_TCP) & \
+        ((headers['tcp_flags'] & (TCP_SYN | TCP_ACK)) == TCP_SYN)
+    flood = np.isin(headers['protocol'], (PROTO_UDP, PROTO_ICMP, 58))
+    return np.where(syn_only, 'Port Scan', np.where(flood, 'DDoS Attempt', 'Suspicious Traffic'))
+
+
+class TopCounter:
+    """Approximate heavy-hitter counts held in bounded memory.
+
+    Keeps at most ``2 * capacity`` keys; when that is exceeded the smallest
+    counts are discarded, so memory does not grow with the number of
+    distinct keys seen.
+    """
+
+    def __init__(self, capacity=1000):
+        self.capacity = capacity
+        self.counts = Counter()
+
+    def update(self, keys, counts):
+        self.counts.update(dict(zip(keys, counts)))
+        if len(self.counts) > 2 * self.capacity:
+            self.counts = Counter(dict(self.counts.most_common(self.capacity)))
+
+    def most_common(self, n):
+        return self.counts.most_common(n)
+
+
+class TrafficSummary:
+    """Running aggregates over scored packets, independent of capture size"""
+
+    def __init__(self, threshold=0.8, max_threats=500, top_capacity=1000):
+        self.threshold = threshold
+        self.max_threats = max_threats
+
+        self.packets = 0
+        self.ip_packets = 0
+        self.bytes = 0
+        self.min_size = None
+        self.max_size = 0
+        self.first_ts = None
+        self.last_ts = None
+        self.protocols = Counter()
+        self.sources = TopCounter(top_capacity)
+        self.destinations = TopCounter(top_capacity)
+        self.threats = 0
+        self.threat_types = Counter()
+        # Min-heap of (score, sequence, packet_info) keeping the highest scores
+        self._top_threats = []
+        self._sequence = 0
+
+    def update(self, headers, scores):
+        """Fold one decoded and scored chunk into the summary"""
+        if len(headers) == 0:
+            return
+        sizes = headers['size']
+        self.packets += len(headers)
+        self.bytes += int(sizes.sum())
+        chunk_min = int(sizes.min())
+        self.min_size = chunk_min if self.min_size is None else min(self.min_size, chunk_min)
+        self.max_size = max(self.max_size, int(sizes.max()))
+        stamped = headers['ts'][headers['ts'] > 0]
+        if stamped.size:
+            self.first_ts = float(stamped.min()) if self.first_ts is None else min(self.first_ts, float(stamped.min()))
+            self.last_ts = float(stamped.max()) if self.last_ts is None else max(self.last_ts, float(stamped.max()))
+
+        ip = headers[headers['ip_version'] != 0]
+        scores = np.asarray(scores)[headers['ip_version'] != 0]
+        self.ip_packets += len(ip)
+        if len(ip) == 0:
+            return
+
+        protocols, counts = np.unique(ip['protocol'], return_counts=True)
+        self.protocols.update(dict(zip(protocols.tolist(), counts.tolist())))
+        for side, counter in (('src', self.sources), ('dst', self.destinations)):
+            addresses, counts = np.unique(
+                np.stack([ip[f'{side}_hi'], ip[f'{side}_lo']], axis=1), axis=0, return_counts=True)
+            counter.update([tuple(a) for a in addresses.tolist()], counts.tolist())
+
+        flagged = scores >= self.threshold
+        if not flagged.any():
+            return
+        threats = ip[flagged]
+        threat_scores = scores[flagged]
+        labels = classify_threats(threats)
+        self.threats += len(threats)
+        self.threat_types.update(labels.tolist())
+
+        # Only build packet_info dicts for packets that make it into the top list
+        heap = self._top_threats
+        for i in np.argsort(threat_scores)[::-1]:
+            score = float(threat_scores[i])
+            if len(heap) >= self.max_threats and score <= heap[0][0]:
+                break
+            info = packet_info(threats[i])
+            info['threat_type'] = str(labels[i])
+            info['severity'] = THREAT_TYPES[info['threat_type']]
+            info['threat_score'] = score
+            self._sequence += 1
+            entry = (score, self._sequence, info)
+            if len(heap) < self.max_threats:
+                heapq.heappush(heap, entry)
+            else:
+                heapq.heapreplace(heap, entry)
+
+    def top_threats(self):
+        """Return the retained threats, highest score first"""
+        return [info for _, _, info in sorted(self._top_threats, reverse=True)]
+
+    def top_sources(self, n=3):
+        """Return ``(address, share)`` for the busiest sources"""
+        return [(format_ip(*key), count / self.ip_packets)
+                for key, count in self.sources.most_common(n)]
+
+    def top_destinations(self, n=3):
+        """Return ``(address, share)`` for the busiest destinations"""
+        return [(format_ip(*key), count / self.ip_packets)
+                for key, count in self.destinations.most_common(n)]
+
+    def protocol_counts(self):
+        """Return packet counts keyed by protocol display name"""
+        counts = Counter()
+        for proto, count in self.protocols.items():
+            counts[protocol_name(proto)] += count
+        return counts
+
+
+def score_chunk(headers, score, flow_table=None):
+    """Extract features from decoded headers and return threat scores from ``score``"""
+    return score(process_packets(headers, flow_table=flow_table))
+
+
+def analyze_pcap(stream, model, minmax_scaler, standard_scaler, threshold=0.8,
+                 chunk_size=4096, max_flows=262144, progress=None):
+    """Decode, score and summarize a pcap/pcapng stream chunk by chunk
+
+    Memory is bounded by ``chunk_size``, ``max_flows`` and the summary's
+    fixed-size top lists rather than by the size of the capture.
+    ``progress`` is called with the number of packets processed so far.
+    """
+    summary = TrafficSummary(threshold=threshold)
+    flow_table = FlowTable(max_flows=max_flows)
+    score = build_scorer(model, minmax_scaler, standard_scaler)
+    for frames, timestamps, linktype in iter_chunks(stream, chunk_size):
+        headers = decode_frames(frames, timestamps, linktype)
+        scores = score_chunk(headers, score, flow_table)
+        summary.update(headers, scores)
+        if progress is not None:
+            progress(summary.packets)
+    return summary
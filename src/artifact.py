@@ -0,0 +1,265 @@
+"""Versioned, memory-mappable model artifacts.
+
+An artifact is a directory holding ``artifact.json`` (format version,
+model type, feature order, scaler parameters and a SHA-256 per blob) and
+one ``.npy`` file per array. Arrays are opened with ``mmap_mode='r'`` so
+every process that loads the artifact shares one page-cached copy.
+Loading needs only NumPy, so a worker that scores from an artifact never
+pays for importing sklearn.
+
+Usage:
+    python -m src.artifact convert models/logistic_regression_meta_model.pkl models/logistic_regression_meta_model
+"""
+import argparse
+import hashlib
+import json
+import os
+import warnings
+from datetime import datetime, timezone
+
+import numpy as np
+
+FORMAT_NAME = 'nids-model'
+FORMAT_VERSION = 1
+METADATA_FILE = 'artifact.json'
+MINMAX_SCALER_PATH = 'models/minmax_scaler.pkl'
+
+# Clamp logits so exp() stays finite
+MAX_LOGIT = 80.0
+
+
+class ArtifactError(ValueError):
+    """Raised for artifacts that are missing, corrupt or of an unknown version"""
+
+
+class ArtifactScaler:
+    """MinMax scaling parameters read from an artifact"""
+
+    clip = False
+
+    def __init__(self, scale, offset, data_min, data_max):
+        self.scale_ = scale
+        self.min_ = offset
+        self.data_min_ = data_min
+        self.data_max_ = data_max
+
+    def transform(self, X):
+        return np.asarray(X, dtype=np.float64) * self.scale_ + self.min_
+
+
+class LinearArtifactModel:
+    """Binary logistic model backed by memory-mapped weights.
+
+    Exposes the parts of the sklearn estimator API the pipeline uses
+    (``coef_``, ``intercept_``, ``classes_``, ``predict_proba``,
+    ``predict``), plus the artifact's own ``minmax_scaler`` and
+    ``features``.
+    """
+
+    def __init__(self, metadata, coef, intercept, minmax_scaler):
+        self.metadata = metadata
+        self.features = metadata['features']
+        self.classes_ = np.asarray(metadata['classes'])
+        self.coef_ = coef
+        self.intercept_ = intercept
+        self.logit_scale = metadata.get('logit_scale', 1.0)
+        self.minmax_scaler = minmax_scaler
+
+    @property
+    def n_features_in_(self):
+        return self.coef_.shape[1]
+
+    def decision_function(self, X):
+        return np.asarray(X) @ self.coef_[0] + self.intercept_[0]
+
+    def predict_proba(self, X):
+        z = np.clip(self.decision_function(X) * self.logit_scale, -MAX_LOGIT, MAX_LOGIT)
+        positive = 1.0 / (1.0 + np.exp(-z))
+        return np.column_stack([1.0 - positive, positive])
+
+    def predict(self, X):
+        return self.classes_[(self.decision_function(X) > 0).astype(int)]
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def is_artifact(path):
+    """Return whether ``path`` is an artifact directory"""
+    return os.path.isfile(os.path.join(path, METADATA_FILE))
+
+
+def metadata_path(path):
+    """Return the metadata file whose replacement marks a new artifact version"""
+    return os.path.join(path, METADATA_FILE)
+
+
+def read_metadata(path):
+    """Read and validate an artifact's metadata"""
+    try:
+        with open(metadata_path(path)) as f:
+            metadata = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        raise ArtifactError(f"cannot read {metadata_path(path)}: {str(e)}")
+    if metadata.get('format') != FORMAT_NAME:
+        raise ArtifactError(f"{path} is not a {FORMAT_NAME} artifact")
+    if metadata.get('format_version') != FORMAT_VERSION:
+        raise ArtifactError(f"unsupported artifact format version {metadata.get('format_version')}")
+    return metadata
+
+
+def _load_array(path, metadata, name, verify):
+    filename = metadata['arrays'][name]
+    full_path = os.path.join(path, filename)
+    if verify and _sha256(full_path) != metadata['sha256'][filename]:
+        raise ArtifactError(f"checksum mismatch for {full_path}")
+    return np.load(full_path, mmap_mode='r', allow_pickle=False)
+
+
+def load_artifact(path, verify=False):
+    """Load an artifact directory with its weights memory-mapped
+
+    Pass ``verify=True`` to check every blob against its recorded SHA-256.
+    """
+    metadata = read_metadata(path)
+    if metadata['model_type'] != 'logistic_regression':
+        raise ArtifactError(f"unsupported model type {metadata['model_type']}")
+
+    scaler = None
+    if metadata.get('scaler') == 'minmax':
+        scaler = ArtifactScaler(*(_load_array(path, metadata, name, verify) for name in
+                                  ('scaler_scale', 'scaler_min', 'scaler_data_min', 'scaler_data_max')))
+    return LinearArtifactModel(metadata,
+                               _load_array(path, metadata, 'coef', verify),
+                               _load_array(path, metadata, 'intercept', verify),
+                               scaler)
+
+
+def _write_array(path, name, array, tag):
+    filename = f"{name}.{tag}.npy"
+    np.save(os.path.join(path, filename), np.ascontiguousarray(array))
+    return filename
+
+
+def save_artifact(path, model, features, minmax_scaler=None, source=None):
+    """Write a binary logistic model (and optional MinMax scaler) as an artifact
+
+    Blobs are written under names unique to this save and the metadata is
+    swapped in last with an atomic rename, so readers never see a mix of
+    old and new files. Blobs of the previous version are removed afterwards.
+    """
+    coef = np.asarray(model.coef_, dtype=np.float64)
+    intercept = np.asarray(model.intercept_, dtype=np.float64)
+    if coef.shape[0] != 1 or len(model.classes_) != 2:
+        raise ArtifactError("only binary linear models can be converted")
+    if len(features) != coef.shape[1]:
+        raise ArtifactError(f"model has {coef.shape[1]} inputs but {len(features)} features were given")
+
+    os.makedirs(path, exist_ok=True)
+    previous = read_metadata(path) if is_artifact(path) else None
+    tag = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%f')
+
+    arrays = {'coef': coef, 'intercept': intercept}
+    if minmax_scaler is not None:
+        # A scaler fit on constant data (e.g. load_scalers' fallback) is an identity
+        # transform that would override the real scaler at scoring time
+        if not np.any(np.asarray(minmax_scaler.data_max_) != np.asarray(minmax_scaler.data_min_)):
+            raise ArtifactError("MinMax scaler has a zero range for every feature; it was not fit on real data")
+        arrays.update(scaler_scale=minmax_scaler.scale_, scaler_min=minmax_scaler.min_,
+                      scaler_data_min=minmax_scaler.data_min_, scaler_data_max=minmax_scaler.data_max_)
+    files = {name: _write_array(path, name, np.asarray(array, dtype=np.float64), tag)
+             for name, array in arrays.items()}
+
+    metadata = {
+        'format': FORMAT_NAME,
+        'format_version': FORMAT_VERSION,
+        'model_type': 'logistic_regression',
+        'features': list(features),
+        'classes': np.asarray(model.classes_).tolist(),
+        'scaler': 'minmax' if minmax_scaler is not None else None,
+        'logit_scale': 1.0,
+        'arrays': files,
+        'sha256': {filename: _sha256(os.path.join(path, filename)) for filename in files.values()},
+        'created': datetime.now(timezone.utc).isoformat(),
+        'source': source,
+    }
+
+    # Some sklearn versions score binary multinomial models as sigmoid(2z)
+    probe = np.random.default_rng(0).uniform(-1, 2, (16, coef.shape[1]))
+    expected = model.predict_proba(probe)[:, 1]
+    for logit_scale in (1.0, 2.0):
+        metadata['logit_scale'] = logit_scale
+        candidate = LinearArtifactModel(metadata, coef, intercept, None)
+        if np.allclose(candidate.predict_proba(probe)[:, 1], expected, atol=1e-6):
+            break
+    else:
+        raise ArtifactError("converted model does not reproduce the source probabilities")
+
+    staging = metadata_path(path) + '.tmp'
+    with open(staging, 'w') as f:
+        json.dump(metadata, f, indent=2)
+    os.replace(staging, metadata_path(path))
+
+    if previous is not None:
+        for filename in previous['arrays'].values():
+            if filename not in files.values():
+                try:
+                    os.remove(os.path.join(path, filename))
+                except OSError:
+                    pass
+    return metadata
+
+
+def convert_pickle(pkl_path, path, features, minmax_scaler=None):
+    """Convert a joblib-pickled model into an artifact directory
+
+    Library version warnings are ignored here: a linear model's
+    coefficients survive across sklearn versions even when the pickle
+    format does not.
+    """
+    # Imported here to keep loading artifacts free of the sklearn import
+    import joblib
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        model = joblib.load(pkl_path)
+    return save_artifact(path, model, features, minmax_scaler, source=os.path.basename(pkl_path))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage NIDS model artifacts")
+    commands = parser.add_subparsers(dest='command', required=True)
+    convert = commands.add_parser('convert', help="Convert a joblib pickle into an artifact directory")
+    convert.add_argument('pickle', help="Path to the .pkl model")
+    convert.add_argument('output', help="Artifact directory to write")
+    convert.add_argument('--no-scaler', action='store_true', help=f"Do not embed the MinMax scaler from {MINMAX_SCALER_PATH}")
+    verify = commands.add_parser('verify', help="Check an artifact's metadata and checksums")
+    verify.add_argument('path', help="Artifact directory")
+    args = parser.parse_args(argv)
+
+    if args.command == 'convert':
+        from src.utils import IMPORTANT_FEATURES
+
+        minmax_scaler = None
+        if not args.no_scaler:
+            # Only a fitted scaler from disk; load_scalers' fallback is a placeholder
+            if os.path.isfile(MINMAX_SCALER_PATH):
+                import joblib
+                minmax_scaler = joblib.load(MINMAX_SCALER_PATH)
+            else:
+                print(f"{MINMAX_SCALER_PATH} not found; writing the artifact without a scaler")
+        metadata = convert_pickle(args.pickle, args.output, IMPORTANT_FEATURES, minmax_scaler)
+        print(f"Wrote {args.output} ({metadata['model_type']}, features: {', '.join(metadata['features'])})")
+    else:
+        model = load_artifact(args.path, verify=True)
+        print(f"{args.path}: OK ({model.metadata['model_type']}, {model.n_features_in_} features)")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
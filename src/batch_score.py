@@ -0,0 +1,301 @@
+"""Score pcap files offline across a process pool.
+
+Usage:
+    python -m src.batch_score captures/ incident.pcapng --workers 8 --output results/
+"""
+import argparse
+import csv
+import json
+import os
+import struct
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from src.capture_filter import BpfFilter, CaptureFilterError, flow_sample_mask
+from src.decoder import decode_frames, format_ip
+from src.flows import FlowTable
+from src.fused import build_scorer
+from src.model_loader import load_meta_model
+from src.pcap_reader import iter_chunks, iter_pcap_range, read_pcap_header, PcapFormatError
+from src.utils import load_scalers, process_packets
+
+CAPTURE_EXTENSIONS = ('.pcap', '.pcapng', '.cap')
+LOW_64 = (1 << 64) - 1
+
+FLOW_COLUMNS = [
+    'file', 'segment', 'protocol', 'src_ip', 'src_port', 'dst_ip', 'dst_port',
+    'first_seen', 'last_seen', 'duration', 'spkts', 'dpkts', 'sbytes', 'dbytes',
+    'rate', 'max_score', 'verdict'
+]
+
+# Per-process state set up once by the pool initializer
+_worker = {}
+
+
+def find_captures(paths):
+    """Expand files and directories into a sorted list of capture files"""
+    captures = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                captures.extend(os.path.join(root, name) for name in files
+                                if name.lower().endswith(CAPTURE_EXTENSIONS))
+        else:
+            captures.append(path)
+    return sorted(captures)
+
+
+def plan_work(captures, split_bytes):
+    """Split captures into ``(path, start, end)`` work units
+
+    Classic pcap files larger than ``split_bytes`` are divided into byte
+    ranges that workers resynchronize into; pcapng and small files are
+    scored whole (``end`` is None), as are files that cannot be read,
+    so the error is reported for their unit.
+    """
+    units, sizes = [], {}
+    for path in captures:
+        try:
+            size = sizes[path] = os.path.getsize(path)
+        except OSError:
+            size = sizes[path] = 0
+        splittable = False
+        if size > split_bytes:
+            try:
+                with open(path, 'rb') as stream:
+                    read_pcap_header(stream)
+                splittable = True
+            except (PcapFormatError, OSError):
+                pass
+        if splittable:
+            units.extend((path, start, min(start + split_bytes, size))
+                         for start in range(0, size, split_bytes))
+        else:
+            units.append((path, 0, None))
+    # Largest units first keeps the pool busy until the end
+    return sorted(units, key=lambda unit: -((unit[2] or sizes[unit[0]]) - unit[1]))
+
+
+def _init_worker(model, minmax_scaler, standard_scaler, options):
+    # Compiled filters are ctypes structures, so each worker compiles its own
+    bpf = BpfFilter(options['filter']) if options['filter'] else None
+    _worker.update(score=build_scorer(model, minmax_scaler, standard_scaler), options=options, bpf=bpf)
+
+
+def _flow_row(path, segment, key, record, threshold):
+    proto, low_ip, low_port, high_ip, high_port = key
+    if record['initiator_low']:
+        src, sport, dst, dport = low_ip, low_port, high_ip, high_port
+    else:
+        src, sport, dst, dport = high_ip, high_port, low_ip, low_port
+    return [
+        path, segment, proto, format_ip(src >> 64, src & LOW_64), sport,
+        format_ip(dst >> 64, dst & LOW_64), dport,
+        f"{record['first_seen']:.6f}", f"{record['last_seen']:.6f}",
+        f"{record['duration']:.6f}", int(record['spkts']), int(record['dpkts']),
+        int(record['sbytes']), int(record['dbytes']), f"{record['rate']:.3f}",
+        f"{record['max_score']:.4f}",
+        'threat' if record['max_score'] >= threshold else 'benign'
+    ]
+
+
+def score_unit(unit):
+    """Score one work unit and write its per-flow verdicts; returns throughput stats
+
+    A unit whose capture cannot be read or parsed is returned with
+    ``error`` set rather than raised, so it does not stop the other
+    units; flows from the packets read before the error are still written.
+    """
+    path, start, end = unit
+    options = _worker['options']
+    threshold = options['threshold']
+    segment = f"{start}-{end}" if end is not None else 'all'
+    part = os.path.join(options['output'], 'parts',
+                        f"{zlib.crc32(path.encode()):08x}-{os.path.basename(path)}.{start}.csv")
+
+    started = time.perf_counter()
+    packets = flows = threats = 0
+    error = None
+    with open(part, 'w', newline='') as out:
+        writer = csv.writer(out)
+
+        def write_flow(key, record):
+            nonlocal flows, threats
+            flows += 1
+            threats += record['max_score'] >= threshold
+            writer.writerow(_flow_row(path, segment, key, record, threshold))
+
+        flow_table = FlowTable(max_flows=options['max_flows'], on_expire=write_flow)
+        try:
+            with open(path, 'rb') as stream:
+                if end is None:
+                    chunks = iter_chunks(stream, options['chunk_size'])
+                else:
+                    chunks = _range_chunks(iter_pcap_range(stream, start, end), options['chunk_size'])
+                for frames, timestamps, linktype in chunks:
+                    if _worker['bpf'] is not None:
+                        keep = _worker['bpf'].mask(frames, linktype)
+                        frames = [frame for frame, kept in zip(frames, keep) if kept]
+                        timestamps = np.asarray(timestamps)[keep]
+                    headers = decode_frames(frames, timestamps, linktype)
+                    if options['sample'] < 1:
+                        headers = headers[flow_sample_mask(headers, options['sample'])]
+                    slots = np.empty(len(headers), dtype=np.int64)
+                    features = process_packets(headers, flow_table=flow_table, slots=slots)
+                    flow_table.record_scores(slots, _worker['score'](features))
+                    packets += len(headers)
+        except (PcapFormatError, OSError, struct.error) as e:
+            # Reading fails between batches, so the flow table is consistent
+            error = str(e) if isinstance(e, OSError) else f"malformed capture: {e}"
+        flow_table.flush()
+
+    return {
+        'file': path,
+        'segment': segment,
+        'worker': os.getpid(),
+        'packets': packets,
+        'flows': flows,
+        'threat_flows': int(threats),
+        'seconds': time.perf_counter() - started,
+        'error': error,
+        'part': part,
+    }
+
+
+def _range_chunks(frames, chunk_size):
+    batch, timestamps, linktype = [], [], None
+    for frame, ts, linktype in frames:
+        batch.append(frame)
+        timestamps.append(ts)
+        if len(batch) >= chunk_size:
+            yield batch, timestamps, linktype
+            batch, timestamps = [], []
+    if batch:
+        yield batch, timestamps, linktype
+
+
+def summarize(results, wall_seconds, workers):
+    """Aggregate unit results into per-worker and overall throughput, listing failed units"""
+    per_worker = {}
+    for result in results:
+        stats = per_worker.setdefault(result['worker'], {'packets': 0, 'flows': 0, 'seconds': 0.0, 'units': 0})
+        stats['packets'] += result['packets']
+        stats['flows'] += result['flows']
+        stats['seconds'] += result['seconds']
+        stats['units'] += 1
+    for stats in per_worker.values():
+        busy = max(stats['seconds'], 1e-9)
+        stats['packets_per_sec'] = stats['packets'] / busy
+        stats['flows_per_sec'] = stats['flows'] / busy
+
+    packets = sum(result['packets'] for result in results)
+    flows = sum(result['flows'] for result in results)
+    return {
+        'workers': workers,
+        'files': len({result['file'] for result in results}),
+        'units': len(results),
+        'packets': packets,
+        'flows': flows,
+        'threat_flows': sum(result['threat_flows'] for result in results),
+        'wall_seconds': wall_seconds,
+        'packets_per_sec': packets / max(wall_seconds, 1e-9),
+        'flows_per_sec': flows / max(wall_seconds, 1e-9),
+        'failed': [{'file': result['file'], 'segment': result['segment'], 'error': result['error']}
+                   for result in results if result['error'] is not None],
+        'per_worker': {str(pid): stats for pid, stats in per_worker.items()},
+        'units_detail': results,
+    }
+
+
+def merge_parts(results, output):
+    """Concatenate per-unit verdict files into one flows.csv
+
+    A flow that crosses a byte-range split point is reported once per
+    segment it appears in.
+    """
+    path = os.path.join(output, 'flows.csv')
+    with open(path, 'w', newline='') as out:
+        csv.writer(out).writerow(FLOW_COLUMNS)
+        for result in results:
+            part = result.pop('part')
+            with open(part) as stream:
+                for line in stream:
+                    out.write(line)
+            os.remove(part)
+    os.rmdir(os.path.join(output, 'parts'))
+    return path
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Score pcap/pcapng captures offline with the NIDS model")
+    parser.add_argument('paths', nargs='+', help="Capture files or directories to scan")
+    parser.add_argument('--output', '-o', default='nids_results', help="Directory for flows.csv and summary.json")
+    parser.add_argument('--workers', '-w', type=int, default=os.cpu_count(), help="Worker processes")
+    parser.add_argument('--threshold', type=float, default=0.8, help="Flow verdict threshold on the max packet score")
+    parser.add_argument('--split-mb', type=int, default=256, help="Split classic pcap files larger than this into byte ranges")
+    parser.add_argument('--chunk-size', type=int, default=4096, help="Packets decoded and scored per batch")
+    parser.add_argument('--max-flows', type=int, default=1_000_000, help="Flow table capacity per worker")
+    parser.add_argument('--filter', default=None, help="BPF expression applied as a live capture would (slow; pure Python)")
+    parser.add_argument('--sample', type=float, default=1.0, help="Fraction of IPv4 flows to keep, matching live flow sampling")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    captures = find_captures(args.paths)
+    if not captures:
+        print("No capture files found")
+        return 1
+
+    if args.filter:
+        try:
+            BpfFilter(args.filter)
+        except CaptureFilterError as e:
+            print(f"Invalid filter: {str(e)}")
+            return 1
+
+    os.makedirs(os.path.join(args.output, 'parts'), exist_ok=True)
+    units = plan_work(captures, args.split_mb * 1024 * 1024)
+    options = {
+        'threshold': args.threshold,
+        'output': args.output,
+        'chunk_size': args.chunk_size,
+        'max_flows': args.max_flows,
+        'filter': args.filter,
+        'sample': args.sample,
+    }
+    minmax_scaler, standard_scaler = load_scalers()
+    model = load_meta_model()
+
+    print(f"Scoring {len(captures)} files as {len(units)} work units on {args.workers} workers")
+    started = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                             initargs=(model, minmax_scaler, standard_scaler, options)) as pool:
+        for result in pool.map(score_unit, units):
+            results.append(result)
+            failed = f" (failed: {result['error']})" if result['error'] is not None else ""
+            print(f"  {result['file']} [{result['segment']}]: {result['packets']:,} packets, "
+                  f"{result['flows']:,} flows in {result['seconds']:.2f}s{failed}")
+    wall_seconds = time.perf_counter() - started
+
+    flows_path = merge_parts(results, args.output)
+    summary = summarize(results, wall_seconds, args.workers)
+    with open(os.path.join(args.output, 'summary.json'), 'w') as out:
+        json.dump(summary, out, indent=2)
+
+    print(f"{summary['packets']:,} packets, {summary['flows']:,} flows "
+          f"({summary['threat_flows']:,} threats) in {wall_seconds:.2f}s: "
+          f"{summary['packets_per_sec']:,.0f} packets/s, {summary['flows_per_sec']:,.0f} flows/s")
+    print(f"Verdicts: {flows_path}")
+    if summary['failed']:
+        print(f"{len(summary['failed'])} of {len(units)} work units failed; see summary.json")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
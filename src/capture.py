@@ -0,0 +1,169 @@
+import os
+import struct
+import time
+
+import numpy as np
+from scapy.all import conf
+
+from src.capture_filter import BpfFilter
+from src.decoder import LINKTYPE_ETHERNET
+from src.pcap_reader import iter_frames
+
+
+def sniff_raw(iface, callback, stop_event=None, bpf_filter=None, poll_interval=0.5):
+    """Capture raw frames from an interface without Scapy dissection
+
+    Calls ``callback(frame, ts, linktype)`` for every frame, where
+    ``linktype`` is the pcap link type to pass to ``src.decoder``. Runs
+    until ``stop_event`` is set.
+    """
+    sock = conf.L2listen(iface=iface, filter=bpf_filter)
+    try:
+        while stop_event is None or not stop_event.is_set():
+            if not sock.select([sock], poll_interval):
+                continue
+            cls, frame, ts = sock.recv_raw()
+            if not frame:
+                continue
+            linktype = conf.l2types.layer2num.get(cls, LINKTYPE_ETHERNET)
+            callback(frame, ts if ts is not None else time.time(), linktype)
+    finally:
+        sock.close()
+
+
+class LiveSource:
+    """Frames captured from a network interface with ``sniff_raw``"""
+
+    def __init__(self, interface):
+        self.interface = interface
+        self.name = interface
+
+    @property
+    def spec(self):
+        """Hashable description of the source, equal for sources that capture the same thing"""
+        return ('live', self.interface)
+
+    def run(self, callback, stop_event, bpf_filter=None):
+        """Call ``callback(frame, ts, linktype)`` per frame until ``stop_event`` is set"""
+        sniff_raw(self.interface, callback, stop_event, bpf_filter)
+
+
+class PcapReplaySource:
+    """Frames replayed from a pcap or pcapng file as if they were being captured.
+
+    ``speed`` 1 keeps the recorded inter-packet gaps, N replays N times
+    faster, and None (or 0) sends frames as fast as the callback accepts
+    them. Timed replays stamp frames with the wall-clock time they are
+    sent; unpaced replays keep the recorded timestamps, shifted forward
+    on each pass so time never runs backwards.
+
+    ``loops`` is the number of passes over the file (0 repeats until
+    stopped). Every pass after the first XORs the IPv4 addresses of
+    Ethernet frames with a key drawn from ``seed``, so repeated passes
+    create new flows instead of revisiting old ones, identically on
+    every run with the same seed.
+    """
+
+    def __init__(self, path, speed=1.0, loops=1, seed=0):
+        self.path = path
+        self.speed = speed or None
+        self.loops = loops
+        self.seed = seed
+        self.name = os.path.basename(path)
+
+        # Written by the replay thread
+        self.sent = 0
+        self.sent_bytes = 0
+        self.passes = 0
+        self.lag = 0.0
+        self.finished = False
+
+    @property
+    def spec(self):
+        """Hashable description of the source, equal for sources that replay the same thing"""
+        return ('pcap', os.path.abspath(self.path), self.speed, self.loops, self.seed)
+
+    def _pass_key(self, index):
+        if index == 0:
+            return None
+        key = np.random.default_rng([self.seed, index]).integers(1, 2**32, dtype=np.uint32)
+        return struct.pack('!I', int(key))
+
+    def _frames(self, stop_event):
+        """Yield ``(frame, recorded_ts, linktype, pass_offset)`` across all passes"""
+        offset = 0.0
+        index = 0
+        while self.loops == 0 or index < self.loops:
+            key = self._pass_key(index)
+            first = last = None
+            count = 0
+            with open(self.path, 'rb') as stream:
+                for frame, ts, linktype in iter_frames(stream):
+                    if stop_event is not None and stop_event.is_set():
+                        return
+                    if first is None:
+                        first = ts
+                    last = ts
+                    count += 1
+                    if key is not None and linktype == LINKTYPE_ETHERNET:
+                        frame = _remap_ipv4(frame, key)
+                    yield frame, ts, linktype, offset
+            if first is None:
+                return
+            # The next pass starts one mean packet gap after this one ended
+            offset += (last - first) * (1 + 1 / max(count - 1, 1))
+            index += 1
+            self.passes = index
+
+    def run(self, callback, stop_event, bpf_filter=None):
+        """Replay the file into ``callback(frame, ts, linktype)`` until done or ``stop_event`` is set
+
+        ``bpf_filter`` is applied in user space with ``BpfFilter``, exactly as
+        the kernel would have applied it to a live capture.
+        """
+        bpf = BpfFilter(bpf_filter) if bpf_filter else None
+        started = time.perf_counter()
+        wall_start = time.time()
+        origin = None
+        for frame, ts, linktype, offset in self._frames(stop_event):
+            if origin is None:
+                origin = ts
+            if bpf is not None and not bpf.matches(frame, linktype):
+                continue
+            if self.speed is not None:
+                due = (ts + offset - origin) / self.speed
+                ahead = due - (time.perf_counter() - started)
+                # Sleeping per packet would cap the rate; only wait once a millisecond ahead
+                if ahead > 0.001:
+                    if stop_event is not None and stop_event.wait(ahead):
+                        break
+                else:
+                    self.lag = max(0.0, -ahead)
+                callback(frame, wall_start + due, linktype)
+            else:
+                callback(frame, ts + offset, linktype)
+            self.sent += 1
+            self.sent_bytes += len(frame)
+        self.finished = True
+
+    def stats(self):
+        """Return replay progress counters"""
+        return {
+            'source': self.path,
+            'speed': self.speed,
+            'passes': self.passes,
+            'sent': self.sent,
+            'sent_bytes': self.sent_bytes,
+            'lag': self.lag,
+            'finished': self.finished,
+        }
+
+
+def _remap_ipv4(frame, key):
+    """XOR the source and destination of an untagged IPv4 Ethernet frame with ``key``"""
+    if len(frame) < 34 or frame[12:14] != b'\x08\x00':
+        return frame
+    frame = bytearray(frame)
+    for start in (26, 30):
+        frame[start:start + 4] = bytes(a ^ b for a, b in zip(frame[start:start + 4], key))
+    return bytes(frame)
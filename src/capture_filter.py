@@ -0,0 +1,216 @@
+"""Capture pre-filters: BPF expressions, dashboard exclusion and flow sampling.
+
+Live capture attaches the compiled expression to the socket so rejected
+frames never leave the kernel. ``BpfFilter`` runs the very same compiled
+program in Python, so a pcap replay sees exactly what a live capture with
+that filter would have delivered.
+
+Flow sampling hashes the IPv4 addresses and ports symmetrically, so both
+directions of a flow land in the same bucket and whole flows are kept or
+dropped together. ``flow_sample_mask`` computes the same buckets on
+decoded header arrays.
+"""
+import numpy as np
+from scapy.arch.common import compile_filter
+from scapy.error import Scapy_Exception
+
+from src.decoder import LINKTYPE_ETHERNET, PROTO_TCP, PROTO_UDP
+
+SAMPLE_BUCKETS = 100
+# Knuth's multiplicative hash constant; products wrap at 32 bits in BPF and here alike
+HASH_MULTIPLIER = 2654435761
+
+
+class CaptureFilterError(ValueError):
+    """Raised for filter expressions that do not compile"""
+
+
+def _bucket_expression(key, buckets):
+    return f"((({key}) * {HASH_MULTIPLIER}) >> 16) % {buckets}"
+
+
+def flow_sample_expression(fraction, buckets=SAMPLE_BUCKETS):
+    """BPF expression keeping ``fraction`` of IPv4 flows; other traffic passes
+
+    Non-first TCP and UDP fragments carry no ports and are dropped.
+    """
+    keep = int(round(fraction * buckets))
+    if keep >= buckets:
+        return None
+    addresses = "ip[12:4] ^ ip[16:4]"
+    # libpcap drops its fragment check on tcp[]/udp[] loads mixed with ip[] loads
+    # in arithmetic, which would hash payload bytes, so test the offset explicitly
+    first = "ip[6:2] & 0x1fff = 0"
+    clauses = [
+        f"(tcp and {first} and {_bucket_expression(f'{addresses} ^ tcp[0:2] ^ tcp[2:2]', buckets)} < {keep})",
+        f"(udp and {first} and {_bucket_expression(f'{addresses} ^ udp[0:2] ^ udp[2:2]', buckets)} < {keep})",
+        f"(not tcp and not udp and {_bucket_expression(addresses, buckets)} < {keep})",
+    ]
+    return f"(not ip or {' or '.join(clauses)})"
+
+
+def build_capture_filter(expression=None, exclude_ports=(), sample_fraction=1.0,
+                         buckets=SAMPLE_BUCKETS):
+    """Combine a user expression, excluded TCP ports and flow sampling into one BPF filter
+
+    Returns None when nothing needs filtering.
+    """
+    parts = []
+    if expression and expression.strip():
+        parts.append(f"({expression.strip()})")
+    parts.extend(f"not (tcp port {port})" for port in exclude_ports)
+    sample = flow_sample_expression(sample_fraction, buckets)
+    if sample:
+        parts.append(sample)
+    return ' and '.join(parts) or None
+
+
+def compile_capture_filter(expression, linktype=LINKTYPE_ETHERNET):
+    """Compile a BPF expression into ``(code, jt, jf, k)`` instructions"""
+    try:
+        program = compile_filter(expression, linktype=linktype)
+    except (Scapy_Exception, ImportError, OSError) as e:
+        raise CaptureFilterError(str(e))
+    return [(insn.code, insn.jt, insn.jf, insn.k)
+            for insn in (program.bf_insns[i] for i in range(program.bf_len))]
+
+
+_MASK32 = 0xFFFFFFFF
+_SIZES = {0x00: 4, 0x08: 2, 0x10: 1}
+
+
+def run_bpf(program, frame):
+    """Run classic BPF ``program`` over one frame; returns the accept length (0 rejects)"""
+    a = x = 0
+    mem = [0] * 16
+    length = len(frame)
+    pc = 0
+    while True:
+        code, jt, jf, k = program[pc]
+        pc += 1
+        cls = code & 0x07
+
+        if cls <= 0x01:  # LD / LDX
+            mode = code & 0xe0
+            if mode == 0x00:
+                value = k
+            elif mode == 0x80:
+                value = length
+            elif mode == 0x60:
+                value = mem[k]
+            elif mode == 0xa0:  # 4 * (P[k] & 0xf), the IP header length
+                if k >= length:
+                    return 0
+                value = (frame[k] & 0x0f) << 2
+            else:
+                offset = k + (x if mode == 0x40 else 0)
+                size = _SIZES[code & 0x18]
+                if offset + size > length:
+                    return 0
+                value = int.from_bytes(frame[offset:offset + size], 'big')
+            if cls == 0x00:
+                a = value
+            else:
+                x = value
+        elif cls == 0x02:
+            mem[k] = a
+        elif cls == 0x03:
+            mem[k] = x
+        elif cls == 0x04:  # ALU
+            op = code & 0xf0
+            operand = x if code & 0x08 else k
+            if op == 0x00:
+                a = (a + operand) & _MASK32
+            elif op == 0x10:
+                a = (a - operand) & _MASK32
+            elif op == 0x20:
+                a = (a * operand) & _MASK32
+            elif op == 0x30:
+                if not operand:
+                    return 0
+                a //= operand
+            elif op == 0x40:
+                a |= operand
+            elif op == 0x50:
+                a &= operand
+            elif op == 0x60:
+                a = (a << operand) & _MASK32 if operand < 32 else 0
+            elif op == 0x70:
+                a = a >> operand if operand < 32 else 0
+            elif op == 0x80:
+                a = -a & _MASK32
+            elif op == 0x90:
+                if not operand:
+                    return 0
+                a %= operand
+            elif op == 0xa0:
+                a ^= operand
+        elif cls == 0x05:  # JMP
+            op = code & 0xf0
+            if op == 0x00:
+                pc += k
+                continue
+            operand = x if code & 0x08 else k
+            if op == 0x10:
+                taken = a == operand
+            elif op == 0x20:
+                taken = a > operand
+            elif op == 0x30:
+                taken = a >= operand
+            else:
+                taken = bool(a & operand)
+            pc += jt if taken else jf
+        elif cls == 0x06:  # RET
+            rval = code & 0x18
+            return a if rval == 0x10 else x if rval == 0x08 else k
+        else:  # MISC
+            if code & 0xf8 == 0x00:
+                x = a
+            else:
+                a = x
+
+
+class BpfFilter:
+    """A BPF expression evaluated in user space, for pcap replay.
+
+    The expression is compiled by libpcap once per link type, exactly as
+    for a live capture, and run over each frame with ``run_bpf``.
+    """
+
+    def __init__(self, expression):
+        self.expression = expression
+        self._programs = {}
+        # Fail early on syntax errors
+        self.program(LINKTYPE_ETHERNET)
+
+    def program(self, linktype):
+        program = self._programs.get(linktype)
+        if program is None:
+            program = self._programs[linktype] = compile_capture_filter(self.expression, linktype)
+        return program
+
+    def matches(self, frame, linktype=LINKTYPE_ETHERNET):
+        return run_bpf(self.program(linktype), bytes(frame)) > 0
+
+    def mask(self, frames, linktype=LINKTYPE_ETHERNET):
+        """Return a boolean array marking the frames the filter accepts"""
+        program = self.program(linktype)
+        return np.fromiter((run_bpf(program, bytes(frame)) > 0 for frame in frames),
+                           dtype=bool, count=len(frames))
+
+
+def flow_sample_mask(headers, fraction, buckets=SAMPLE_BUCKETS):
+    """Flow sampling on ``HEADER_DTYPE`` rows, matching ``flow_sample_expression``
+
+    Rows other than IPv4 are kept; non-first TCP and UDP fragments are
+    dropped, as the BPF port loads reject them.
+    """
+    keep = int(round(fraction * buckets))
+    if keep >= buckets:
+        return np.ones(len(headers), dtype=bool)
+    key = (headers['src_lo'] ^ headers['dst_lo']) & np.uint64(_MASK32)
+    ports = np.isin(headers['protocol'], (PROTO_TCP, PROTO_UDP))
+    key ^= np.where(ports, headers['sport'] ^ headers['dport'], 0).astype(np.uint64)
+    bucket = (((key * np.uint64(HASH_MULTIPLIER)) & np.uint64(_MASK32)) >> np.uint64(16)) % np.uint64(buckets)
+    fragment = ports & (headers['frag_offset'] != 0)
+    return (headers['ip_version'] != 4) | ((bucket < keep) & ~fragment)
@@ -0,0 +1,176 @@
+from collections import deque
+
+DROP_NEWEST = 'drop_newest'
+DROP_OLDEST = 'drop_oldest'
+ADAPTIVE = 'adaptive'
+OVERFLOW_POLICIES = (DROP_NEWEST, DROP_OLDEST, ADAPTIVE)
+
+
+class CaptureQueue:
+    """Bounded, non-blocking queue between the capture thread and analysis.
+
+    ``put`` never waits. When the queue holds ``capacity`` items the
+    overflow policy decides what is lost: ``drop_newest`` rejects the
+    incoming item, ``drop_oldest`` discards the head to make room, and
+    ``adaptive`` keeps only 1 in N items once the queue is
+    ``sample_start`` full, with N rising linearly to ``max_sample_rate``
+    as it fills (and drops the newest if it fills anyway).
+
+    Meant for one producer and one consumer. It relies on ``deque``
+    appends and pops being atomic, and every counter is written by only
+    one side, so the counts are exact without a lock:
+    ``offered == accepted + dropped_newest + sampled_out`` and
+    ``accepted == consumed + dropped_oldest + len(queue)``.
+    """
+
+    def __init__(self, capacity=65536, policy=DROP_NEWEST, sample_start=0.5, max_sample_rate=64):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"policy must be one of {OVERFLOW_POLICIES}")
+        self.capacity = capacity
+        self.policy = policy
+        self.sample_start = sample_start
+        self.max_sample_rate = max_sample_rate
+        self._items = deque()
+
+        # Producer side
+        self.offered = 0
+        self.accepted = 0
+        self.dropped_newest = 0
+        self.dropped_oldest = 0
+        self.sampled_out = 0
+        self.sample_rate = 1
+        self._sample_tick = 0
+        # Consumer side
+        self.consumed = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def _rate_for(self, depth):
+        fill = depth / self.capacity
+        if fill < self.sample_start:
+            return 1
+        ramp = (fill - self.sample_start) / (1 - self.sample_start)
+        return min(self.max_sample_rate, 1 + int(ramp * (self.max_sample_rate - 1)))
+
+    def put(self, item):
+        """Offer an item; returns False if it was sampled out or dropped"""
+        self.offered += 1
+        depth = len(self._items)
+
+        if self.policy == ADAPTIVE:
+            self.sample_rate = self._rate_for(depth)
+            if self.sample_rate > 1:
+                self._sample_tick += 1
+                if self._sample_tick % self.sample_rate:
+                    self.sampled_out += 1
+                    return False
+
+        if depth >= self.capacity:
+            if self.policy != DROP_OLDEST:
+                self.dropped_newest += 1
+                return False
+            try:
+                self._items.popleft()
+                self.dropped_oldest += 1
+            except IndexError:
+                # The consumer emptied the queue in the meantime
+                pass
+
+        self._items.append(item)
+        self.accepted += 1
+        return True
+
+    def peek(self):
+        """Return the oldest item without removing it, or None when empty"""
+        try:
+            return self._items[0]
+        except IndexError:
+            return None
+
+    def get_batch(self, max_items):
+        """Remove and return up to ``max_items`` of the oldest items"""
+        items = []
+        popleft = self._items.popleft
+        try:
+            while len(items) < max_items:
+                items.append(popleft())
+        except IndexError:
+            pass
+        self.consumed += len(items)
+        return items
+
+    def stats(self):
+        """Return exact drop and sampling counters"""
+        return {
+            'policy': self.policy,
+            'capacity': self.capacity,
+            'depth': len(self._items),
+            'offered': self.offered,
+            'accepted': self.accepted,
+            'consumed': self.consumed,
+            'dropped_newest': self.dropped_newest,
+            'dropped_oldest': self.dropped_oldest,
+            'sampled_out': self.sampled_out,
+            'not_inspected': self.dropped_newest + self.dropped_oldest + self.sampled_out,
+            'sample_rate': self.sample_rate,
+        }
+
+
+class FairCaptureQueue:
+    """One ``CaptureQueue`` lane per producer, drained round-robin.
+
+    Each capture thread puts into its own lane, so every lane keeps the
+    single-producer guarantees of ``CaptureQueue`` and a flood on one
+    input only fills and drops in that lane. ``get_batch`` gives every
+    non-empty lane an equal share of the batch and hands unused share to
+    the others, so a busy lane cannot starve a quiet one. ``capacity`` is
+    split evenly between the lanes.
+    """
+
+    def __init__(self, lanes, capacity=65536, policy=DROP_NEWEST, sample_start=0.5, max_sample_rate=64):
+        self.capacity = capacity
+        self.policy = policy
+        self.lanes = [CaptureQueue(max(1, capacity // lanes), policy, sample_start, max_sample_rate)
+                      for _ in range(lanes)]
+        self._next = 0
+
+    def __len__(self):
+        return sum(len(lane) for lane in self.lanes)
+
+    def put(self, item, lane=0):
+        """Offer an item to ``lane``; returns False if it was sampled out or dropped"""
+        return self.lanes[lane].put(item)
+
+    def peek(self):
+        """Return the oldest lane head without removing it, or None when all lanes are empty
+
+        Heads are compared by their first element, the enqueue time ``BatchScorer`` puts there.
+        """
+        heads = [head for head in (lane.peek() for lane in self.lanes) if head is not None]
+        return min(heads, key=lambda head: head[0]) if heads else None
+
+    def get_batch(self, max_items):
+        """Remove up to ``max_items`` items, taking an equal share from each non-empty lane"""
+        items = []
+        count = len(self.lanes)
+        # Rotate the starting lane so rounding never favours the same one
+        order = self.lanes[self._next:] + self.lanes[:self._next]
+        self._next = (self._next + 1) % count
+        active = [lane for lane in order if len(lane)]
+        while active and len(items) < max_items:
+            share = max(1, (max_items - len(items)) // len(active))
+            for lane in active:
+                items.extend(lane.get_batch(min(share, max_items - len(items))))
+            active = [lane for lane in active if len(lane)]
+        return items
+
+    def stats(self):
+        """Return the summed counters of all lanes, plus each lane's own in ``lanes``"""
+        lanes = [lane.stats() for lane in self.lanes]
+        stats = {name: sum(lane[name] for lane in lanes)
+                 for name in ('depth', 'offered', 'accepted', 'consumed', 'dropped_newest',
+                              'dropped_oldest', 'sampled_out', 'not_inspected')}
+        stats.update(policy=self.policy, capacity=self.capacity,
+                     sample_rate=max(lane['sample_rate'] for lane in lanes), lanes=lanes)
+        return stats
@@ -0,0 +1,91 @@
+import time
+from collections import deque
+
+import numpy as np
+
+
+class CascadeScorer:
+    """Score batches with a cheap first stage and escalate only uncertain rows.
+
+    ``stages`` is a list of ``(name, score_fn)`` pairs ordered from cheapest
+    to heaviest, each mapping a feature matrix to scores in [0, 1]. Every
+    row is scored by the first stage; rows whose score lies inside
+    ``band`` are re-scored by the next stage, and so on. A row keeps the
+    score of the last stage that saw it. If a later stage fails, its rows
+    keep their earlier scores and the error is counted.
+    """
+
+    def __init__(self, stages, band=(0.5, 0.95), stats_window=1024):
+        if not stages:
+            raise ValueError("a cascade needs at least one stage")
+        self.stages = list(stages)
+        self.band = band
+
+        self.rows = 0
+        self.stage_rows = [0] * len(self.stages)
+        self.stage_calls = [0] * len(self.stages)
+        self.stage_errors = [0] * len(self.stages)
+        self.last_error = None
+        self._stage_times = [deque(maxlen=stats_window) for _ in self.stages]
+
+    def __call__(self, features):
+        features = np.asarray(features)
+        scores = None
+        rows = np.arange(len(features))
+        low, high = self.band
+
+        for stage, (name, score_fn) in enumerate(self.stages):
+            if stage > 0:
+                uncertain = (scores[rows] >= low) & (scores[rows] <= high)
+                rows = rows[uncertain]
+                if not rows.size:
+                    break
+
+            started = time.perf_counter()
+            try:
+                stage_scores = np.asarray(score_fn(features[rows]), dtype=np.float32).ravel()
+            except Exception as e:
+                if stage == 0:
+                    raise
+                self.stage_errors[stage] += 1
+                self.last_error = f"{name}: {str(e)}"
+                break
+            self._stage_times[stage].append(time.perf_counter() - started)
+            self.stage_calls[stage] += 1
+            self.stage_rows[stage] += len(rows)
+
+            if scores is None:
+                scores = stage_scores
+            else:
+                scores[rows] = stage_scores
+
+        self.rows += len(features)
+        return scores
+
+    def escalation_fraction(self):
+        """Fraction of all scored rows that went past the first stage"""
+        if len(self.stages) < 2 or not self.rows:
+            return 0.0
+        return self.stage_rows[1] / self.rows
+
+    def stats(self):
+        """Return the escalation fraction and per-stage call latencies"""
+        stages = []
+        for stage, (name, _) in enumerate(self.stages):
+            times = np.array(self._stage_times[stage], dtype=float) * 1000
+            stages.append({
+                'name': name,
+                'rows': self.stage_rows[stage],
+                'calls': self.stage_calls[stage],
+                'errors': self.stage_errors[stage],
+                'share': self.stage_rows[stage] / self.rows if self.rows else 0.0,
+                'latency_p50_ms': float(np.percentile(times, 50)) if times.size else 0.0,
+                'latency_p99_ms': float(np.percentile(times, 99)) if times.size else 0.0,
+            })
+        return {
+            'rows': self.rows,
+            'band': self.band,
+            'escalation_fraction': self.escalation_fraction(),
+            'last_error': self.last_error,
+            'stages': stages,
+        }
@@ -0,0 +1,191 @@
+"""Shared Plotly charts for the dashboard pages.
+
+Building a figure (trace validation, resolving the template) costs far
+more than drawing it, so each chart is built once per session from a
+cached skeleton and later renders only replace its trace data. Series
+are downsampled to at most ``MAX_POINTS`` points first, with LTTB
+(Largest-Triangle-Three-Buckets) or per-bucket min/max, so render time
+and the figure sent to the browser stay flat however much history lies
+behind a chart.
+"""
+import functools
+import json
+
+import numpy as np
+import plotly.graph_objects as go
+import streamlit as st
+
+MAX_POINTS = 1000
+DOWNSAMPLING = ('lttb', 'minmax')
+COLORS = ['#1E88E5', '#64B5F6', '#28A745', '#DC3545', '#FFB300', '#8E24AA']
+LEGEND = dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+
+
+def _numeric(x, n):
+    """``x`` as float64 for area computations; datetimes become epoch nanoseconds"""
+    if x is None:
+        return np.arange(n, dtype=np.float64)
+    x = np.asarray(x)
+    if x.dtype.kind == 'M':
+        x = x.astype('datetime64[ns]').view(np.int64)
+    return x.astype(np.float64)
+
+
+def lttb_indices(x, y, threshold):
+    """Indices of the ``threshold`` points Largest-Triangle-Three-Buckets keeps
+
+    The first and last points are always kept; every bucket in between
+    contributes the point forming the largest triangle with the previous
+    pick and the next bucket's mean, which preserves peaks and the shape
+    of the line. ``x`` may be None for evenly spaced points.
+    """
+    n = len(y)
+    if threshold >= n:
+        return np.arange(n)
+    if threshold < 3:
+        # No bucket fits between the end points
+        return np.array([0, n - 1][:max(threshold, 0)], dtype=np.int64)
+    x = _numeric(x, n)
+    y = np.asarray(y, dtype=np.float64)
+
+    # threshold - 2 buckets over the points between the first and the last
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    counts = np.diff(edges)
+    mean_x = np.append(np.add.reduceat(x[:n - 1], edges[:-1]) / counts, x[-1])
+    mean_y = np.append(np.add.reduceat(y[:n - 1], edges[:-1]) / counts, y[-1])
+
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    picked = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        px, py = x[picked], y[picked]
+        # Twice the triangle area; the constant factor does not change the argmax
+        area = np.abs((px - mean_x[bucket + 1]) * (y[start:end] - py)
+                      - (px - x[start:end]) * (mean_y[bucket + 1] - py))
+        picked = start + int(area.argmax())
+        indices[bucket + 1] = picked
+    return indices
+
+
+def minmax_indices(y, threshold):
+    """Indices of each bucket's minimum and maximum, plus the end points, in order
+
+    Cheaper than LTTB and keeps every spike, at the cost of drawing a
+    band where the data is noisy. Returns at most ``threshold`` indices.
+    """
+    n = len(y)
+    buckets = (threshold - 2) // 2
+    if threshold >= n:
+        return np.arange(n)
+    if buckets < 1:
+        # Too few points for a min and max per bucket; LTTB still honours the limit
+        return lttb_indices(None, y, threshold)
+    y = np.asarray(y, dtype=np.float64)
+    size = -(-n // buckets)
+    # Pad with the last value; picks in the padding are clipped back onto the last point
+    padded = np.concatenate([y, np.full(size * buckets - n, y[-1])]).reshape(buckets, size)
+    offsets = np.arange(buckets) * size
+    picks = np.concatenate([[0, n - 1], offsets + padded.argmin(axis=1), offsets + padded.argmax(axis=1)])
+    return np.unique(np.minimum(picks, n - 1))
+
+
+def downsample(x, y, max_points=MAX_POINTS, method='lttb'):
+    """Return ``(x, y)`` reduced to at most ``max_points`` points; ``x`` may be None"""
+    if method not in DOWNSAMPLING:
+        raise ValueError(f"unknown downsampling method {method!r}; expected one of {DOWNSAMPLING}")
+    if x is not None:
+        x = np.asarray(x)
+    if len(y) <= max_points:
+        return x, y
+    indices = lttb_indices(x, y, max_points) if method == 'lttb' else minmax_indices(y, max_points)
+    return (x[indices] if x is not None else indices), np.asarray(y)[indices]
+
+
+def _fill_color(color, alpha=0.1):
+    red, green, blue = (int(color[i:i + 2], 16) for i in (1, 3, 5))
+    return f"rgba({red},{green},{blue},{alpha})"
+
+
+@functools.lru_cache(maxsize=64)
+def _series_skeleton(names, fill, layout):
+    """Figure with styled, empty traces named ``names``; shared, so callers copy it"""
+    fig = go.Figure()
+    for name, color in zip(names, COLORS * (len(names) // len(COLORS) + 1)):
+        fig.add_trace(go.Scatter(
+            name=name,
+            mode='lines',
+            line=dict(color=color, width=2),
+            fill='tozeroy' if fill else None,
+            fillcolor=_fill_color(color) if fill else None
+        ))
+    fig.update_layout({
+        'template': "plotly_white",
+        'margin': dict(l=20, r=20, t=50, b=20),
+        'legend': LEGEND,
+        **json.loads(layout)
+    })
+    return fig
+
+
+@functools.lru_cache(maxsize=16)
+def _gauge_skeleton(max_value):
+    fig = go.Figure(go.Indicator(
+        mode="gauge+number",
+        title={'font': {'size': 24}},
+        gauge={
+            'axis': {'range': [0, max_value]},
+            'bar': {'color': "rgba(30,136,229,0.8)"},
+            'bgcolor': "white",
+            'steps': [
+                {'range': [0, max_value/3], 'color': "#E8F5E9"},
+                {'range': [max_value/3, max_value*2/3], 'color': "#FFF3E0"},
+                {'range': [max_value*2/3, max_value], 'color': "#FFEBEE"}
+            ],
+            'threshold': {
+                'line': {'color': "red", 'width': 4},
+                'thickness': 0.75,
+                'value': max_value*0.8
+            }
+        }
+    ))
+    fig.update_layout(height=200, margin=dict(l=20, r=20, t=20, b=20))
+    return fig
+
+
+def _session_figure(key, signature, skeleton):
+    """This session's figure for ``key``, copied from ``skeleton()`` when new or reshaped"""
+    figures = st.session_state.setdefault('_chart_figures', {})
+    entry = figures.get(key)
+    if entry is None or entry[0] != signature:
+        entry = figures[key] = (signature, go.Figure(skeleton()))
+    return entry[1]
+
+
+def time_series_chart(key, x, series, title="", fill=True, max_points=MAX_POINTS, method='lttb', **layout):
+    """Line chart of ``series`` (``{name: values}``) over ``x``, reusing this session's figure
+
+    ``x`` is one array shared by every series, a ``{name: x}`` dict, or
+    None for evenly spaced points. Each series is downsampled to at most
+    ``max_points``. ``layout`` (height, axis titles, ...) shapes the
+    skeleton built on the first call for ``key`` and for each new set of
+    series names; later calls only replace trace data and the title.
+    """
+    names = tuple(series)
+    # Layout goes into the cache key as JSON, since its values may be dicts
+    signature = (names, fill, json.dumps(layout, sort_keys=True))
+    fig = _session_figure(key, signature, lambda: _series_skeleton(*signature))
+    with fig.batch_update():
+        for trace, (name, values) in zip(fig.data, series.items()):
+            trace.x, trace.y = downsample(x[name] if isinstance(x, dict) else x, values, max_points, method)
+        fig.layout.title.text = title
+    return fig
+
+
+def gauge_chart(key, value, title, max_value=100):
+    """Gauge of ``value`` out of ``max_value``, reusing this session's figure"""
+    fig = _session_figure(key, max_value, lambda: _gauge_skeleton(max_value))
+    with fig.batch_update():
+        fig.data[0].value = value
+        fig.data[0].title.text = title
+    return fig
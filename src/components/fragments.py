@@ -0,0 +1,11 @@
+"""Streamlit fragments across the supported Streamlit versions.
+
+A fragment reruns on its own, optionally every ``run_every`` seconds,
+without rerunning the page script, so live views refresh only their own
+region and widgets stay responsive in between. ``st.fragment`` is
+stable from Streamlit 1.37; the pinned 1.35 provides the same API as
+``st.experimental_fragment``.
+"""
+import streamlit as st
+
+fragment = getattr(st, 'fragment', None) or st.experimental_fragment
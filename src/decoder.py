@@ -0,0 +1,352 @@
+import socket
+import struct
+from datetime import datetime
+
+import numpy as np
+
+# pcap link-layer types handled without Scapy
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_IPV6 = 0x86DD
+VLAN_TPIDS = (0x8100, 0x88A8, 0x9100)
+# Encapsulations Scapy can look through but the fast path does not decode
+SCAPY_ETHERTYPES = (0x8847, 0x8848, 0x8863, 0x8864)
+# IPv6 next-header values that are extension headers rather than a payload
+IPV6_EXTENSION_HEADERS = (0, 43, 44, 50, 51, 60, 135, 139, 140, 253, 254)
+
+PROTO_ICMP = 1
+PROTO_TCP = 6
+PROTO_UDP = 17
+
+# Bytes of each frame inspected by the bulk decoder; enough for
+# Ethernet + two VLAN tags + IPv4 with options + TCP
+SNAPLEN = 128
+
+# One decoded packet header. Addresses are 128-bit integers split into
+# high/low halves; IPv4 is stored IPv4-mapped (::ffff:a.b.c.d). Rows with
+# ip_version 0 are non-IP frames.
+HEADER_DTYPE = np.dtype([
+    ('ts', 'f8'),
+    ('size', 'u4'),
+    ('ip_version', 'u1'),
+    ('protocol', 'u1'),
+    ('ttl', 'u1'),
+    ('ip_len', 'u4'),
+    ('src_hi', 'u8'),
+    ('src_lo', 'u8'),
+    ('dst_hi', 'u8'),
+    ('dst_lo', 'u8'),
+    ('sport', 'u2'),
+    ('dport', 'u2'),
+    ('tcp_flags', 'u2'),
+    ('window', 'u2'),
+    # IPv4 fragment offset in 8-byte units; nonzero rows carry no transport header
+    ('frag_offset', 'u2'),
+])
+
+IPV4_MAPPED = 0xFFFF << 32
+TCP_FLAG_NAMES = 'FSRPAUECN'
+
+_U16 = struct.Struct('!H')
+_U32 = struct.Struct('!I')
+_U64X2 = struct.Struct('!QQ')
+_IPV4 = struct.Struct('!BxHxxHBBxxII')
+_IPV6 = struct.Struct('!4xHBB16s16s')
+_PORTS = struct.Struct('!HH')
+_TCP_TAIL = struct.Struct('!BBH')
+
+
+class UnusualPacket(Exception):
+    """Raised by the fast path for frames that need full Scapy dissection"""
+
+
+def _decode_ip(buf, off, size, ts):
+    """Decode an IPv4/IPv6 header and its transport ports from ``off``"""
+    version = buf[off] >> 4
+    sport = dport = flags = window = frag_offset = 0
+
+    if version == 4:
+        ver_ihl, total_len, frag, ttl, proto, src, dst = _IPV4.unpack_from(buf, off)
+        ihl = (ver_ihl & 0x0F) * 4
+        if ihl < 20:
+            raise UnusualPacket('bad IPv4 header length')
+        if off + ihl > len(buf):
+            raise UnusualPacket('truncated IPv4 header')
+        src_hi, src_lo = 0, IPV4_MAPPED | src
+        dst_hi, dst_lo = 0, IPV4_MAPPED | dst
+        ip_len = total_len
+        frag_offset = frag & 0x1FFF
+        # Non-first fragments carry no transport header
+        l4 = off + ihl if frag_offset == 0 else None
+    elif version == 6:
+        payload_len, proto, ttl, src, dst = _IPV6.unpack_from(buf, off)
+        if proto in IPV6_EXTENSION_HEADERS:
+            raise UnusualPacket('IPv6 extension header')
+        src_hi, src_lo = _U64X2.unpack(src)
+        dst_hi, dst_lo = _U64X2.unpack(dst)
+        ip_len = payload_len + 40
+        l4 = off + 40
+    else:
+        raise UnusualPacket('unknown IP version')
+
+    if l4 is not None:
+        if proto == PROTO_TCP:
+            if l4 + 20 > len(buf):
+                raise UnusualPacket('truncated TCP header')
+            sport, dport = _PORTS.unpack_from(buf, l4)
+            offset_ns, flag_bits, window = _TCP_TAIL.unpack_from(buf, l4 + 12)
+            flags = ((offset_ns & 1) << 8) | flag_bits
+        elif proto == PROTO_UDP:
+            if l4 + 8 > len(buf):
+                raise UnusualPacket('truncated UDP header')
+            sport, dport = _PORTS.unpack_from(buf, l4)
+
+    return (ts, size, version, proto, ttl, ip_len, src_hi, src_lo, dst_hi, dst_lo,
+            sport, dport, flags, window, frag_offset)
+
+
+def _decode_fast(frame, ts, linktype):
+    buf = memoryview(frame)
+    if linktype == LINKTYPE_ETHERNET:
+        off = 14
+        ethertype = _U16.unpack_from(buf, 12)[0]
+        for _ in range(2):
+            if ethertype not in VLAN_TPIDS:
+                break
+            ethertype = _U16.unpack_from(buf, off + 2)[0]
+            off += 4
+    elif linktype == LINKTYPE_LINUX_SLL:
+        off = 16
+        ethertype = _U16.unpack_from(buf, 14)[0]
+    elif linktype == LINKTYPE_RAW:
+        off = 0
+        ethertype = ETHERTYPE_IPV6 if buf[0] >> 4 == 6 else ETHERTYPE_IPV4
+    else:
+        raise UnusualPacket('unsupported link type')
+
+    if ethertype in (ETHERTYPE_IPV4, ETHERTYPE_IPV6):
+        return _decode_ip(buf, off, len(frame), ts)
+    if ethertype in VLAN_TPIDS or ethertype in SCAPY_ETHERTYPES:
+        raise UnusualPacket('unsupported encapsulation')
+    return None
+
+
+def _decode_with_scapy(frame, ts, linktype):
+    """Decode a frame through full Scapy dissection"""
+    from scapy.all import conf, IP, IPv6, TCP, UDP
+
+    try:
+        packet = conf.l2types.num2layer[linktype](bytes(frame))
+    except Exception:
+        return None
+
+    if IP in packet:
+        ip = packet[IP]
+        src_hi, src_lo = 0, IPV4_MAPPED | _U32.unpack(socket.inet_aton(ip.src))[0]
+        dst_hi, dst_lo = 0, IPV4_MAPPED | _U32.unpack(socket.inet_aton(ip.dst))[0]
+        version, proto, ttl = 4, ip.proto, ip.ttl
+        ip_len = ip.len if ip.len is not None else len(ip)
+        frag_offset = ip.frag
+    elif IPv6 in packet:
+        ip = packet[IPv6]
+        src_hi, src_lo = _U64X2.unpack(socket.inet_pton(socket.AF_INET6, ip.src))
+        dst_hi, dst_lo = _U64X2.unpack(socket.inet_pton(socket.AF_INET6, ip.dst))
+        version, proto, ttl = 6, ip.nh, ip.hlim
+        ip_len = len(ip)
+        frag_offset = 0
+    else:
+        return None
+
+    sport = dport = flags = window = 0
+    if TCP in ip:
+        sport, dport = ip[TCP].sport, ip[TCP].dport
+        flags, window = int(ip[TCP].flags), ip[TCP].window
+    elif UDP in ip:
+        sport, dport = ip[UDP].sport, ip[UDP].dport
+
+    return (ts, len(frame), version, proto, ttl, ip_len, src_hi, src_lo, dst_hi, dst_lo,
+            sport, dport, flags, window, frag_offset)
+
+
+def decode_frame(frame, ts=0.0, linktype=LINKTYPE_ETHERNET):
+    """Decode one raw frame into a header tuple in ``HEADER_DTYPE`` field order
+
+    Returns None for non-IP frames. Malformed or unusual frames (IPv6
+    extension headers, MPLS/PPPoE, truncated headers, other link types)
+    are handed to Scapy.
+    """
+    try:
+        return _decode_fast(frame, ts, linktype)
+    except (UnusualPacket, struct.error, IndexError):
+        return _decode_with_scapy(frame, ts, linktype)
+
+
+def snap_matrix(frames):
+    """Lay out the first ``SNAPLEN`` bytes of each frame as rows of a zero-padded byte matrix"""
+    return np.frombuffer(
+        b''.join(bytes(frame[:SNAPLEN]).ljust(SNAPLEN, b'\0') for frame in frames),
+        dtype=np.uint8
+    ).reshape(len(frames), SNAPLEN)
+
+
+def decode_frames(frames, timestamps=None, linktype=LINKTYPE_ETHERNET):
+    """Decode many raw frames at once into a ``HEADER_DTYPE`` array
+
+    The first ``SNAPLEN`` bytes of every frame are laid out as rows of a
+    fixed-stride byte matrix and all header fields are gathered column-wise
+    with NumPy. Frames the vectorized path cannot handle are decoded one by
+    one with ``decode_frame``.
+    """
+    n = len(frames)
+    lengths = np.fromiter(map(len, frames), dtype=np.int64, count=n)
+    if linktype != LINKTYPE_ETHERNET:
+        headers = np.zeros(n, dtype=HEADER_DTYPE)
+        if timestamps is not None:
+            headers['ts'] = timestamps
+        headers['size'] = lengths
+        for i, frame in enumerate(frames):
+            header = decode_frame(frame, headers['ts'][i], linktype)
+            if header is not None:
+                headers[i] = header
+        return headers
+    return decode_snaps(snap_matrix(frames), lengths, timestamps, frames)
+
+
+def decode_snaps(buf, lengths, timestamps=None, frames=None):
+    """Decode Ethernet frames laid out by ``snap_matrix``, given their wire lengths
+
+    Frames the vectorized path cannot handle are dissected with Scapy from
+    ``frames`` when given, otherwise from their first ``SNAPLEN`` bytes.
+    """
+    n = len(buf)
+    headers = np.zeros(n, dtype=HEADER_DTYPE)
+    if n == 0:
+        return headers
+    if timestamps is not None:
+        headers['ts'] = timestamps
+    lengths = np.asarray(lengths, dtype=np.int64)
+    headers['size'] = lengths
+
+    rows = np.arange(n)
+    caplen = np.minimum(lengths, SNAPLEN)
+
+    def u8(offset):
+        return buf[rows, np.minimum(offset, SNAPLEN - 1)].astype(np.uint32)
+
+    def u16(offset):
+        return (u8(offset) << 8) | u8(offset + 1)
+
+    def u32(offset):
+        return (u16(offset) << 16) | u16(offset + 2)
+
+    def u128(offset):
+        index = np.minimum(offset[:, None] + np.arange(16), SNAPLEN - 1)
+        halves = buf[rows[:, None], index].copy().view('>u8')
+        return halves[:, 0].astype(np.uint64), halves[:, 1].astype(np.uint64)
+
+    # Link layer, looking through up to two VLAN tags
+    off = np.full(n, 14, dtype=np.int64)
+    ethertype = u16(np.full(n, 12))
+    for _ in range(2):
+        tagged = np.isin(ethertype, VLAN_TPIDS)
+        ethertype = np.where(tagged, u16(off + 2), ethertype)
+        off = off + np.where(tagged, 4, 0)
+
+    version = u8(off) >> 4
+    is4 = (ethertype == ETHERTYPE_IPV4) & (version == 4)
+    is6 = (ethertype == ETHERTYPE_IPV6) & (version == 6)
+    unusual = (np.isin(ethertype, VLAN_TPIDS + SCAPY_ETHERTYPES)
+               | ((ethertype == ETHERTYPE_IPV4) & ~is4)
+               | ((ethertype == ETHERTYPE_IPV6) & ~is6))
+
+    # Network layer
+    ihl = (u8(off) & 0x0F) * 4
+    unusual |= is4 & (ihl < 20)
+    # Truncated network headers would otherwise decode from the zero padding
+    unusual |= is4 & (off + ihl > caplen)
+    unusual |= is6 & (off + 40 > caplen)
+    proto = np.where(is4, u8(off + 9), u8(off + 6))
+    unusual |= is6 & np.isin(proto, IPV6_EXTENSION_HEADERS)
+    frag_offset = np.where(is4, u16(off + 6) & 0x1FFF, 0)
+    first_fragment = frag_offset == 0
+
+    headers['ip_version'] = np.where(is4, 4, np.where(is6, 6, 0))
+    headers['protocol'] = np.where(is4 | is6, proto, 0)
+    headers['ttl'] = np.where(is4, u8(off + 8), np.where(is6, u8(off + 7), 0))
+    headers['ip_len'] = np.where(is4, u16(off + 2), np.where(is6, u16(off + 4) + 40, 0))
+
+    src6_hi, src6_lo = u128(off + 8)
+    dst6_hi, dst6_lo = u128(off + 24)
+    src4 = np.uint64(IPV4_MAPPED) | u32(off + 12).astype(np.uint64)
+    dst4 = np.uint64(IPV4_MAPPED) | u32(off + 16).astype(np.uint64)
+    zero = np.uint64(0)
+    headers['src_hi'] = np.where(is6, src6_hi, zero)
+    headers['src_lo'] = np.where(is4, src4, np.where(is6, src6_lo, zero))
+    headers['dst_hi'] = np.where(is6, dst6_hi, zero)
+    headers['dst_lo'] = np.where(is4, dst4, np.where(is6, dst6_lo, zero))
+
+    # Transport layer
+    l4 = np.where(is4, off + ihl, off + 40)
+    is_tcp = (is4 | is6) & first_fragment & (proto == PROTO_TCP)
+    is_udp = (is4 | is6) & first_fragment & (proto == PROTO_UDP)
+    unusual |= is_tcp & (l4 + 20 > caplen)
+    unusual |= is_udp & (l4 + 8 > caplen)
+    has_ports = is_tcp | is_udp
+    headers['sport'] = np.where(has_ports, u16(l4), 0)
+    headers['dport'] = np.where(has_ports, u16(l4 + 2), 0)
+    headers['tcp_flags'] = np.where(is_tcp, ((u8(l4 + 12) & 1) << 8) | u8(l4 + 13), 0)
+    headers['window'] = np.where(is_tcp, u16(l4 + 14), 0)
+    headers['frag_offset'] = frag_offset
+
+    for i in np.flatnonzero(unusual):
+        frame = frames[i] if frames is not None else buf[i, :caplen[i]].tobytes()
+        header = _decode_with_scapy(frame, headers['ts'][i], LINKTYPE_ETHERNET)
+        headers[i] = header if header is not None else (headers['ts'][i], lengths[i]) + (0,) * 13
+    if frames is None:
+        # Scapy only saw the truncated frame
+        headers['size'] = lengths
+
+    return headers
+
+
+def decode_packets(packets):
+    """Decode already-captured Scapy packets into a ``HEADER_DTYPE`` array"""
+    from scapy.all import conf
+
+    if not packets:
+        return np.zeros(0, dtype=HEADER_DTYPE)
+    linktype = conf.l2types.layer2num.get(type(packets[0]), LINKTYPE_ETHERNET)
+    return decode_frames([bytes(packet) for packet in packets],
+                         [float(packet.time) for packet in packets], linktype)
+
+
+def format_ip(hi, lo):
+    """Format a 128-bit address split into high/low halves"""
+    hi, lo = int(hi), int(lo)
+    if hi == 0 and lo >> 32 == 0xFFFF:
+        return socket.inet_ntoa(_U32.pack(lo & 0xFFFFFFFF))
+    return socket.inet_ntop(socket.AF_INET6, _U64X2.pack(hi, lo))
+
+
+def format_tcp_flags(flags):
+    """Format TCP flag bits the way Scapy prints them (e.g. 'SA')"""
+    return ''.join(name for bit, name in enumerate(TCP_FLAG_NAMES) if flags >> bit & 1)
+
+
+def packet_info(header):
+    """Build the Network Monitor ``packet_info`` dict from a decoded header"""
+    (ts, size, _, proto, _, _, src_hi, src_lo, dst_hi, dst_lo,
+     sport, dport, flags, _, _) = header
+    return {
+        'timestamp': datetime.fromtimestamp(ts) if ts else datetime.now(),
+        'source_ip': format_ip(src_hi, src_lo),
+        'dest_ip': format_ip(dst_hi, dst_lo),
+        'protocol': int(proto),
+        'size': int(size),
+        'source_port': int(sport),
+        'dest_port': int(dport),
+        'flags': format_tcp_flags(flags) if proto == PROTO_TCP else 'N/A'
+    }
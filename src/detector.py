@@ -0,0 +1,331 @@
+"""Live detection pipeline, usable in-process or as a headless daemon.
+
+Usage:
+    python -m src.detector --interface eth0 [--interface eth1 ...] [--filter "tcp or udp"] [--threshold 0.8]
+    python -m src.detector --replay capture.pcap [--speed 0] [--loop 10] [--seed 1]
+
+The daemon publishes its counters and packet/threat history to shared
+memory (see ``src.shared_state``); dashboard pages attach to it read-only.
+"""
+import argparse
+import signal
+import threading
+import time
+
+import numpy as np
+
+from src.capture import LiveSource, PcapReplaySource
+from src.capture_filter import CaptureFilterError, build_capture_filter, compile_capture_filter
+from src.capture_queue import DROP_NEWEST, OVERFLOW_POLICIES
+from src.cascade import CascadeScorer
+from src.decoder import decode_frames
+from src.flows import FlowTable
+from src.fused import RegistryScorer
+from src.metrics import (SCORE_BINS, packets_inspected, score_histogram, stage_histogram, start_exporter,
+                         threats_detected)
+from src.ring_buffer import PACKET_DTYPE, RingBuffer, packet_records
+from src.scoring import BatchScorer
+from src.shared_state import DEFAULT_SEGMENT, MAX_INTERFACES, SharedDetectorState
+from src.sharded import ShardedPipeline
+from src.utils import load_scalers, process_packets
+
+# Capture threads time one frame in this many
+CAPTURE_LATENCY_SAMPLE = 64
+
+
+class Detector:
+    """Capture, feature extraction and scoring for one or more interfaces.
+
+    ``interface`` is an interface name, a capture source such as
+    ``PcapReplaySource``, or a sequence of them. Each source gets its own
+    capture thread, which only enqueues raw frames into that source's
+    lane of the capture queue; lanes are
+    drained round-robin so one busy uplink cannot starve the others. The
+    scoring thread decodes each batch, updates the flow table, scores it
+    through the cascade and appends the results, tagged with the
+    interface index, to the packet and threat rings. ``threshold`` may
+    be changed while running. Pass ``packet_history``/``threat_history``
+    to write into rings the caller owns, e.g. in shared memory.
+
+    With ``workers`` > 1 the scoring thread only dispatches: decoding,
+    flow tracking and scoring run in a ``ShardedPipeline`` of that many
+    processes.
+    """
+
+    def __init__(self, interface, minmax_scaler, standard_scaler, threshold=0.8,
+                 capture_filter=None, overflow=DROP_NEWEST, queue_capacity=65536,
+                 second_stage_path=None, band=(0.5, 0.95), max_flows=262144,
+                 packet_history=None, threat_history=None, workers=1):
+        # One interface name or source, or a sequence of them
+        sources = [interface] if isinstance(interface, str) or hasattr(interface, 'run') else list(interface)
+        if not 0 < len(sources) <= MAX_INTERFACES:
+            raise ValueError(f"between 1 and {MAX_INTERFACES} interfaces are supported")
+        self.sources = [LiveSource(source) if isinstance(source, str) else source for source in sources]
+        self.interfaces = [source.name for source in self.sources]
+        self.interface = ", ".join(self.interfaces)
+        self.threshold = threshold
+        self.capture_filter = capture_filter
+        self.packet_history = packet_history if packet_history is not None else RingBuffer(PACKET_DTYPE, 65536)
+        self.threat_history = threat_history if threat_history is not None else RingBuffer(PACKET_DTYPE, 16384)
+
+        # Only the scoring thread touches the flow table
+        self.flow_table = FlowTable(max_flows=max_flows)
+        # Each stage follows the shared model registry so a replaced model file is picked up live
+        stages = [('meta model', RegistryScorer(minmax_scaler, standard_scaler))]
+        if second_stage_path:
+            stages.append(('second stage', RegistryScorer(minmax_scaler, standard_scaler, path=second_stage_path)))
+        self.score = CascadeScorer(stages, band=band)
+        self.shards = None
+        if workers > 1:
+            self.shards = ShardedPipeline(minmax_scaler, standard_scaler, workers=workers,
+                                          threshold=threshold, slot_size=1024, max_flows=max_flows,
+                                          second_stage_path=second_stage_path, band=band,
+                                          packet_history=self.packet_history,
+                                          threat_history=self.threat_history)
+        # Larger batches amortize the hand-off to worker processes
+        self.scorer = BatchScorer(self._inspect_batch, max_batch=1024 if self.shards else 256,
+                                  max_latency=0.02, max_pending=queue_capacity, overflow=overflow,
+                                  lanes=len(self.interfaces))
+
+        self.inspected = 0
+        self.threats = 0
+        # Scores of every inspected packet, for threat counts at other thresholds
+        self.score_counts = np.zeros(SCORE_BINS + 1, dtype=np.int64)
+        # Written only by each interface's capture thread
+        self.captured_bytes = [0] * len(self.interfaces)
+        self.capture_errors = [None] * len(self.interfaces)
+        self.started_at = None
+        self._capture_latency = stage_histogram('capture')
+        self._decode_latency = stage_histogram('decode')
+        self._feature_latency = stage_histogram('features')
+        self._inspected_total = packets_inspected()
+        self._threats_total = threats_detected()
+        self._stop = threading.Event()
+        self._capture_threads = []
+
+    @property
+    def capture_error(self):
+        errors = [f"{name}: {error}" for name, error in zip(self.interfaces, self.capture_errors) if error]
+        return "; ".join(errors) or None
+
+    @property
+    def running(self):
+        """Whether any interface is still capturing"""
+        return any(thread.is_alive() for thread in self._capture_threads)
+
+    def start(self):
+        """Start scoring and capture; raises ``CaptureFilterError`` for a bad filter"""
+        if self._capture_threads:
+            return self
+        if self.capture_filter:
+            compile_capture_filter(self.capture_filter)
+        self._stop.clear()
+        if self.shards is not None:
+            self.shards.start()
+        self.scorer.start()
+        self.started_at = time.time()
+        for index, name in enumerate(self.interfaces):
+            thread = threading.Thread(target=self._capture, args=(index,), name=f"capture-{name}", daemon=True)
+            thread.start()
+            self._capture_threads.append(thread)
+        return self
+
+    def stop(self, timeout=1.0):
+        """Stop capture, then drain and stop the scoring thread"""
+        self._stop.set()
+        for thread in self._capture_threads:
+            thread.join(timeout)
+        self._capture_threads = []
+        self.scorer.stop(timeout)
+        if self.shards is not None:
+            self.shards.stop()
+
+    def _capture(self, index):
+        submit = self.scorer.submit
+        captured_bytes = self.captured_bytes
+        # Kernel timestamp to enqueue, sampled so timing stays off the per-frame cost;
+        # replayed frames carry recorded timestamps, which say nothing about capture delay
+        capture_latency = self._capture_latency if isinstance(self.sources[index], LiveSource) else None
+        frames = 0
+
+        def frame_callback(frame, ts, linktype):
+            nonlocal frames
+            # Only enqueue here; the bounded queue decides what is dropped if analysis falls behind
+            captured_bytes[index] += len(frame)
+            submit((frame, ts, linktype, index), index)
+            frames += 1
+            if capture_latency is not None and not frames % CAPTURE_LATENCY_SAMPLE:
+                capture_latency.record(max(0.0, time.time() - ts))
+
+        try:
+            self.sources[index].run(frame_callback, self._stop, self.capture_filter)
+        except Exception as e:
+            self.capture_errors[index] = str(e)
+
+    def _inspect_batch(self, items):
+        # Interfaces can differ in link type; decode each link type separately
+        for linktype in {item[2] for item in items}:
+            group = [item for item in items if item[2] == linktype]
+            frames = [frame for frame, _, _, _ in group]
+            timestamps = [ts for _, ts, _, _ in group]
+            ifaces = np.fromiter((index for _, _, _, index in group), dtype=np.uint8, count=len(group))
+            if self.shards is not None:
+                # Blocks while every worker slot is busy, so the capture queue's overflow policy applies
+                self.shards.threshold = self.threshold
+                self.shards.submit(frames, timestamps, linktype, ifaces=ifaces)
+                continue
+
+            # Decode the whole batch at once instead of dissecting each frame with Scapy
+            with self._decode_latency.time():
+                headers = decode_frames(frames, timestamps, linktype)
+            ip = headers['ip_version'] != 0
+            headers = headers[ip]
+            if not len(headers):
+                continue
+            with self._feature_latency.time():
+                features = process_packets(headers, flow_table=self.flow_table)
+            scores = self.score(features)
+
+            records = packet_records(headers, scores, ifaces[ip])
+            self.packet_history.extend(records)
+            self.score_counts += score_histogram(records['score'])
+            threats = records[records['score'] > self.threshold]
+            self.threat_history.extend(threats)
+            self.threats += len(threats)
+            self.inspected += len(headers)
+            self._threats_total.inc(len(threats))
+            self._inspected_total.inc(len(headers))
+        return np.zeros(0, dtype=np.float32)
+
+    def interface_stats(self, queue_stats=None):
+        """Per-interface capture counters: frames and bytes captured and frames not inspected"""
+        queue_stats = queue_stats or self.scorer.queue.stats()
+        lanes = queue_stats.get('lanes', [queue_stats])
+        return [{
+            'name': name,
+            'packets': lane['offered'],
+            'bytes': self.captured_bytes[index],
+            'dropped': lane['not_inspected'],
+            'depth': lane['depth'],
+            'error': self.capture_errors[index],
+        } for index, (name, lane) in enumerate(zip(self.interfaces, lanes))]
+
+    def stats(self):
+        """Return queue, scoring, cascade and per-interface counters in one flat dict"""
+        stats = self.scorer.stats()
+        cascade = self.score.stats()
+        inspected, threats, score_counts = self.inspected, self.threats, self.score_counts
+        if self.shards is not None:
+            shards = stats['shards'] = self.shards.stats()
+            inspected, threats = shards['inspected'], shards['threats']
+            score_counts = self.shards.score_counts
+            stats['last_error'] = stats['last_error'] or shards['last_error']
+        stats.update(
+            interface=self.interface,
+            interfaces=self.interface_stats(stats),
+            running=self.running,
+            started_at=self.started_at,
+            threshold=self.threshold,
+            capture_filter=self.capture_filter,
+            captured=stats['offered'],
+            inspected=inspected,
+            threats=threats,
+            # For threat counts at thresholds other than this one (see metrics.count_above)
+            score_counts=score_counts.copy(),
+            escalation_fraction=cascade['escalation_fraction'],
+            stages=cascade['stages'],
+            last_error=self.capture_error or stats['last_error'] or cascade['last_error'],
+        )
+        return stats
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the NIDS detector headless and publish to shared memory")
+    parser.add_argument('--interface', '-i', action='append', default=[],
+                        help="Interface to capture on (repeatable)")
+    parser.add_argument('--replay', action='append', default=[], metavar='PCAP',
+                        help="Replay a pcap/pcapng file through the pipeline instead of capturing (repeatable)")
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help="Replay speed: 1 keeps the recorded timing, 10 is ten times faster, 0 is as fast as possible")
+    parser.add_argument('--loop', type=int, default=1, help="Passes over each replayed file; 0 repeats until stopped")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for the addresses of repeated replay passes")
+    parser.add_argument('--threshold', type=float, default=0.8, help="Threat score threshold")
+    parser.add_argument('--filter', default=None, help="BPF expression attached to the capture socket")
+    parser.add_argument('--exclude-port', type=int, action='append', default=[],
+                        help="TCP port to drop in the kernel, e.g. the dashboard's 8501 (repeatable)")
+    parser.add_argument('--sample', type=float, default=1.0, help="Fraction of IPv4 flows to keep")
+    parser.add_argument('--overflow', choices=OVERFLOW_POLICIES, default=DROP_NEWEST, help="Capture queue overflow policy")
+    parser.add_argument('--queue-capacity', type=int, default=65536, help="Capture queue capacity in packets")
+    parser.add_argument('--second-stage', default=None, help="Heavier model for uncertain packets")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Analysis processes; more than 1 shards flows across processes")
+    parser.add_argument('--band', type=float, nargs=2, default=(0.5, 0.95), metavar=('LOW', 'HIGH'),
+                        help="Meta-model score range escalated to the second stage")
+    parser.add_argument('--packet-history', type=int, default=262144, help="Packets kept in shared history")
+    parser.add_argument('--threat-history', type=int, default=65536, help="Threats kept in shared history")
+    parser.add_argument('--name', default=None, help="Shared memory segment name")
+    parser.add_argument('--publish-interval', type=float, default=0.5, help="Seconds between counter updates")
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help="Serve Prometheus metrics on this local port")
+    args = parser.parse_args(argv)
+    if not args.interface and not args.replay:
+        parser.error("at least one --interface or --replay is required")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    capture_filter = build_capture_filter(args.filter, args.exclude_port, args.sample)
+    try:
+        state = SharedDetectorState.create(args.name or DEFAULT_SEGMENT, args.packet_history, args.threat_history)
+    except FileExistsError:
+        print(f"A detector is already publishing to '{args.name or DEFAULT_SEGMENT}'")
+        return 1
+    minmax_scaler, standard_scaler = load_scalers()
+    sources = args.interface + [PcapReplaySource(path, args.speed, args.loop, args.seed) for path in args.replay]
+    detector = Detector(sources, minmax_scaler, standard_scaler, threshold=args.threshold,
+                        capture_filter=capture_filter, overflow=args.overflow,
+                        queue_capacity=args.queue_capacity, second_stage_path=args.second_stage,
+                        band=tuple(args.band), packet_history=state.packet_history,
+                        threat_history=state.threat_history, workers=args.workers)
+
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop.set())
+
+    try:
+        try:
+            detector.start()
+        except CaptureFilterError as e:
+            print(f"Invalid capture filter: {str(e)}")
+            return 1
+        print(f"Detector running on {detector.interface}, publishing to shared memory '{state.name}'")
+        if args.metrics_port:
+            try:
+                start_exporter(args.metrics_port)
+                print(f"Metrics at http://127.0.0.1:{args.metrics_port}/metrics")
+            except OSError as e:
+                print(f"Metrics endpoint unavailable: {str(e)}")
+        while not stop.wait(args.publish_interval):
+            state.publish(detector.stats())
+            if not detector.running:
+                if detector.capture_error or args.interface:
+                    print(f"Capture stopped: {detector.capture_error or 'unknown error'}")
+                    return 1
+                print("Replay finished")
+                break
+    finally:
+        detector.stop()
+        stats = detector.stats()
+        state.publish(stats)
+        state.close()
+        state.unlink()
+        elapsed = time.time() - (stats['started_at'] or time.time())
+        print(f"Captured {stats['captured']:,}, inspected {stats['inspected']:,}, "
+              f"not inspected {stats['not_inspected']:,}, threats {stats['threats']:,} "
+              f"in {elapsed:.1f}s ({stats['inspected'] / max(elapsed, 1e-9):,.0f} packets/s)")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
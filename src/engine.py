@@ -0,0 +1,253 @@
+"""Process-wide capture engine shared by every dashboard session.
+
+Sessions capturing the same traffic share one ``Detector``: the first
+``acquire`` starts it and later ones only add a reference. It stops when
+the last session releases it or stops renewing its lease, e.g. because
+the browser tab was closed. Viewers read ``snapshot``s, which are
+refreshed at most every ``snapshot_interval`` seconds however many
+sessions ask, so capture and scoring cost does not grow with viewers.
+"""
+import threading
+import time
+from collections import namedtuple
+
+from src.detector import Detector
+from src.metrics import count_above
+from src.ring_buffer import PACKET_DTYPE, RingBuffer
+
+# stats: Detector.stats() plus 'viewers'; packets/threats: copies of the newest history records
+EngineSnapshot = namedtuple('EngineSnapshot', ['stats', 'packets', 'threats', 'taken_at'])
+
+
+class _Pipeline:
+    """One running detector and the sessions subscribed to it
+
+    ``ready`` is set once the detector has started, or failed to with
+    ``error``; until then ``detector`` is None.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.detector = None
+        self.error = None
+        self.ready = threading.Event()
+        # session id -> that viewer's threat threshold
+        self.thresholds = {}
+        self.snapshot = None
+        self.lock = threading.Lock()
+
+    @property
+    def sessions(self):
+        return self.thresholds.keys()
+
+    def apply_threshold(self):
+        # The detector records threats at the lowest threshold any viewer asks for;
+        # each viewer's snapshot is filtered to its own
+        if self.detector is not None and self.thresholds:
+            self.detector.threshold = min(self.thresholds.values())
+
+
+class CaptureEngine:
+    """Reference-counted detectors keyed by what they capture.
+
+    Detectors are keyed by their sources and capture filter only, so
+    every viewer of the same traffic shares one capture. The threat
+    threshold is per viewer and can change without restarting anything.
+    Other settings (queue, workers, models, history sizes) are fixed when
+    a detector starts; a session that changes them restarts the detector
+    if it is its only viewer and otherwise joins it as it runs.
+
+    ``acquire`` is idempotent per session: calling it again on every
+    rerun only renews the session's lease, and calling it with other
+    sources or filter moves the session to the matching detector.
+    Sessions that do not call ``acquire`` or ``snapshot`` for ``lease``
+    seconds are released by a background reaper. Detectors are started
+    and stopped outside the engine lock, so one session starting a
+    capture does not stall every other session's reads.
+    """
+
+    def __init__(self, lease=30.0, snapshot_interval=0.25, packet_window=16384, threat_window=50):
+        self.lease = lease
+        self.snapshot_interval = snapshot_interval
+        self.packet_window = packet_window
+        self.threat_window = threat_window
+
+        self._pipelines = {}
+        # session id -> (pipeline key, last seen)
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._reaper = None
+
+    def acquire(self, session_id, interface, minmax_scaler, standard_scaler,
+                packet_capacity=65536, threat_capacity=16384, threshold=0.8, capture_filter=None, **settings):
+        """Subscribe ``session_id`` to the detector capturing ``interface``, starting it if needed
+
+        ``interface`` is an interface name or capture source, or a tuple of them.
+
+        ``settings`` are passed on to ``Detector``. Returns True if this
+        call started the capture. Errors from ``Detector.start`` propagate
+        and leave nothing registered.
+        """
+        sources = interface if isinstance(interface, tuple) else (interface,)
+        # Sources compare by what they capture, so equal replays share one detector
+        key = (tuple(getattr(source, 'spec', source) for source in sources), capture_filter)
+        config = (packet_capacity, threat_capacity, tuple(sorted(settings.items())))
+        now = time.monotonic()
+        stopping = []
+        with self._lock:
+            stopping += self._reap(now)
+            held = self._sessions.get(session_id)
+            pipeline = self._pipelines.get(held[0]) if held is not None else None
+            if held is not None and held[0] == key and (pipeline.config == config or len(pipeline.sessions) > 1):
+                self._sessions[session_id] = (key, now)
+                pipeline.thresholds[session_id] = threshold
+                pipeline.apply_threshold()
+                started = False
+            else:
+                if held is not None:
+                    stopping += self._release(session_id)
+                pipeline = self._pipelines.get(key)
+                started = pipeline is None
+                if started:
+                    pipeline = self._pipelines[key] = _Pipeline(config)
+                pipeline.thresholds[session_id] = threshold
+                pipeline.apply_threshold()
+                self._sessions[session_id] = (key, now)
+
+            if self._reaper is None:
+                self._reaper = threading.Thread(target=self._reap_loop, name="engine-reaper", daemon=True)
+                self._reaper.start()
+
+        self._stop(stopping)
+        if started:
+            self._start(key, pipeline, interface, minmax_scaler, standard_scaler, packet_capacity,
+                        threat_capacity, threshold, capture_filter, settings)
+        pipeline.ready.wait()
+        if pipeline.error is not None:
+            raise pipeline.error
+        return started
+
+    def _start(self, key, pipeline, interface, minmax_scaler, standard_scaler, packet_capacity,
+               threat_capacity, threshold, capture_filter, settings):
+        try:
+            detector = Detector(interface, minmax_scaler, standard_scaler,
+                                packet_history=RingBuffer(PACKET_DTYPE, packet_capacity),
+                                threat_history=RingBuffer(PACKET_DTYPE, threat_capacity),
+                                threshold=threshold, capture_filter=capture_filter, **settings)
+            detector.start()
+        except Exception as e:
+            with self._lock:
+                if self._pipelines.get(key) is pipeline:
+                    del self._pipelines[key]
+                for session_id in list(pipeline.sessions):
+                    self._sessions.pop(session_id, None)
+                pipeline.thresholds.clear()
+            pipeline.error = e
+            pipeline.ready.set()
+            raise
+        with self._lock:
+            pipeline.detector = detector
+            pipeline.apply_threshold()
+        pipeline.ready.set()
+
+    def release(self, session_id):
+        """Unsubscribe ``session_id``; its detector stops when no sessions remain"""
+        with self._lock:
+            stopping = self._release(session_id)
+        self._stop(stopping)
+
+    def snapshot(self, session_id):
+        """Return the latest ``EngineSnapshot`` of the session's detector, or None if it holds none
+
+        Threats, both the newest ``threat_window`` records and the count in
+        ``stats``, are those above this session's threshold.
+        """
+        with self._lock:
+            held = self._sessions.get(session_id)
+            if held is None:
+                return None
+            key = held[0]
+            self._sessions[session_id] = (key, time.monotonic())
+            pipeline = self._pipelines[key]
+            threshold = pipeline.thresholds[session_id]
+        pipeline.ready.wait()
+        if pipeline.detector is None:
+            return None
+
+        snapshot = pipeline.snapshot
+        if snapshot is None or time.monotonic() - snapshot.taken_at >= self.snapshot_interval:
+            with pipeline.lock:
+                # Another session may have refreshed it while we waited
+                snapshot = pipeline.snapshot
+                if snapshot is None or time.monotonic() - snapshot.taken_at >= self.snapshot_interval:
+                    detector = pipeline.detector
+                    stats = detector.stats()
+                    stats['viewers'] = len(pipeline.sessions)
+                    snapshot = pipeline.snapshot = EngineSnapshot(
+                        stats,
+                        detector.packet_history.snapshot(self.packet_window),
+                        detector.threat_history.snapshot(),
+                        time.monotonic(),
+                    )
+        # The shared snapshot holds every retained threat at the lowest viewer
+        # threshold; filter to this session's before cutting to the window
+        threats = snapshot.threats[snapshot.threats['score'] > threshold]
+        return snapshot._replace(
+            stats={**snapshot.stats, 'threshold': threshold,
+                   'threats': count_above(snapshot.stats['score_counts'], threshold)},
+            threats=threats[-self.threat_window:],
+        )
+
+    def pipelines(self):
+        """Return a summary of each running detector"""
+        with self._lock:
+            return [{'interface': pipeline.detector.interface,
+                     'running': pipeline.detector.running,
+                     'viewers': len(pipeline.sessions)}
+                    for pipeline in self._pipelines.values() if pipeline.detector is not None]
+
+    def _release(self, session_id):
+        """Unsubscribe under the lock; returns the pipelines left without viewers, for ``_stop``"""
+        held = self._sessions.pop(session_id, None)
+        if held is None:
+            return []
+        pipeline = self._pipelines[held[0]]
+        pipeline.thresholds.pop(session_id, None)
+        if pipeline.sessions:
+            pipeline.apply_threshold()
+            return []
+        del self._pipelines[held[0]]
+        return [pipeline]
+
+    def _stop(self, pipelines):
+        # Outside the lock: stopping joins capture threads and worker processes
+        for pipeline in pipelines:
+            pipeline.ready.wait()
+            if pipeline.detector is not None:
+                pipeline.detector.stop()
+
+    def _reap(self, now):
+        expired = [session_id for session_id, (_, seen) in self._sessions.items() if now - seen > self.lease]
+        stopping = []
+        for session_id in expired:
+            stopping += self._release(session_id)
+        return stopping
+
+    def _reap_loop(self):
+        while True:
+            time.sleep(self.lease / 2)
+            with self._lock:
+                stopping = self._reap(time.monotonic())
+                done = not self._pipelines
+                if done:
+                    self._reaper = None
+            self._stop(stopping)
+            if done:
+                return
+
+
+_engine = CaptureEngine()
+
+def get_engine():
+    """Return the process-wide capture engine"""
+    return _engine
@@ -0,0 +1,310 @@
+import numpy as np
+
+# Features the flow table can supply in place of per-packet placeholders
+FLOW_FEATURES = (
+    'sbytes', 'dbytes', 'spkts', 'dpkts', 'rate',
+    'sload', 'dload', 'duration', 'sttl', 'dttl'
+)
+
+
+MASK64 = (1 << 64) - 1
+
+
+def _key_words(key):
+    """Pack a canonical flow key into the five uint64 words the table stores"""
+    proto, low, low_port, high, high_port = key
+    return [low >> 64, low & MASK64, high >> 64, high & MASK64,
+            proto << 32 | low_port << 16 | high_port]
+
+
+class FlowTable:
+    """Bidirectional flow table keyed by the 5-tuple.
+
+    Both directions of a conversation share one record. The initiator (the
+    source of the first packet seen) is the "s" side and the responder the
+    "d" side, matching the UNSW-NB15 feature naming. Records, keys and
+    the index all live in preallocated NumPy arrays indexed by slot, so
+    memory is fixed by ``max_flows`` (see ``nbytes``): keys are stored as
+    uint64 words and found through an open-addressing hash table with
+    linear probing, free slots are a stack, and a doubly linked list
+    through the slots keeps flows in least-recently-active order, which
+    makes idle expiry and eviction O(1) per packet.
+
+    Flows released while packets are being scored are reported through
+    ``on_expire`` only once ``record_scores`` has folded in the scores of
+    the packets accounted before their release, so a record's
+    ``max_score`` covers all of its packets even when its slot was freed
+    and reused within the same batch.
+    """
+
+    def __init__(self, max_flows=1_000_000, idle_timeout=60.0, active_timeout=300.0,
+                 on_expire=None):
+        self.max_flows = max_flows
+        self.idle_timeout = idle_timeout
+        self.active_timeout = active_timeout
+        self.on_expire = on_expire
+
+        # Key words per slot: high and low halves of the lower endpoint's
+        # address, the same for the higher endpoint, then proto << 32 | ports
+        self._keys = np.zeros((max_flows, 5), dtype=np.uint64)
+        # Open-addressing table of slots (-1 when empty), at most half full
+        self._buckets = np.full(1 << max(2 * max_flows - 1, 1).bit_length(), -1, dtype=np.int32)
+        self._mask = len(self._buckets) - 1
+        # Bucket each slot's key hashes to
+        self._home = np.zeros(max_flows, dtype=np.int32)
+        # Links from least to most recently active; -1 ends the list
+        self._older = np.full(max_flows, -1, dtype=np.int32)
+        self._newer = np.full(max_flows, -1, dtype=np.int32)
+        self._oldest = self._newest = -1
+        self._free = np.arange(max_flows - 1, -1, -1, dtype=np.int32)
+        self._free_count = max_flows
+        self._count = 0
+        # Number of update() calls so far, and flows released since the last record_scores()
+        self._updates = 0
+        self._retired = []
+
+        self.first_seen = np.zeros(max_flows, dtype=np.float64)
+        self.last_seen = np.zeros(max_flows, dtype=np.float64)
+        self.sbytes = np.zeros(max_flows, dtype=np.uint64)
+        self.dbytes = np.zeros(max_flows, dtype=np.uint64)
+        self.spkts = np.zeros(max_flows, dtype=np.uint32)
+        self.dpkts = np.zeros(max_flows, dtype=np.uint32)
+        self.sttl = np.zeros(max_flows, dtype=np.uint8)
+        self.dttl = np.zeros(max_flows, dtype=np.uint8)
+        # Whether the initiator is the lower endpoint of the canonical key
+        self.initiator_low = np.zeros(max_flows, dtype=bool)
+        # Highest threat score seen on any packet of the flow
+        self.max_score = np.zeros(max_flows, dtype=np.float32)
+        # Update count from which packets on the slot belong to its current flow, if any
+        self.allocated = np.zeros(max_flows, dtype=np.int64)
+
+        self.created = 0
+        self.expired_idle = 0
+        self.expired_active = 0
+        self.evicted = 0
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def nbytes(self):
+        """Bytes held by the preallocated records and index"""
+        return sum(getattr(self, name).nbytes for name in (
+            'first_seen', 'last_seen', 'sbytes', 'dbytes', 'spkts',
+            'dpkts', 'sttl', 'dttl', 'initiator_low', 'max_score', 'allocated',
+            '_keys', '_buckets', '_home', '_older', '_newer', '_free'))
+
+    def update(self, proto, src, sport, dst, dport, ts, size, ttl):
+        """Account one packet to its flow and return the flow's slot"""
+        src_low = (src, sport) <= (dst, dport)
+        if src_low:
+            key = (proto, src, sport, dst, dport)
+        else:
+            key = (proto, dst, dport, src, sport)
+
+        self.expire(ts)
+
+        words = _key_words(key)
+        home = hash(key) & self._mask
+        slot = self._find(words, home)
+        if slot >= 0 and ts - self.first_seen[slot] > self.active_timeout:
+            self._release(slot)
+            self.expired_active += 1
+            slot = -1
+
+        if slot < 0:
+            slot = self._allocate(words, home, ts, src_low)
+        elif slot != self._newest:
+            self._unlink(slot)
+            self._link_newest(slot)
+
+        self.last_seen[slot] = ts
+        if src_low == self.initiator_low[slot]:
+            self.sbytes[slot] += size
+            self.spkts[slot] += 1
+            self.sttl[slot] = ttl
+        else:
+            self.dbytes[slot] += size
+            self.dpkts[slot] += 1
+            self.dttl[slot] = ttl
+        self._updates += 1
+        return slot
+
+    def _find(self, words, home):
+        """Slot holding the key ``words``, or -1"""
+        buckets, keys, mask = self._buckets, self._keys, self._mask
+        bucket = home
+        while True:
+            slot = buckets.item(bucket)
+            if slot < 0 or keys[slot].tolist() == words:
+                return slot
+            bucket = (bucket + 1) & mask
+
+    def _allocate(self, words, home, ts, src_low):
+        if not self._free_count:
+            # Table is full: evict the least recently active flow
+            self._release(self._oldest)
+            self.evicted += 1
+
+        self._free_count -= 1
+        slot = self._free.item(self._free_count)
+        buckets, mask = self._buckets, self._mask
+        bucket = home
+        while buckets.item(bucket) >= 0:
+            bucket = (bucket + 1) & mask
+        buckets[bucket] = slot
+        self._keys[slot] = words
+        self._home[slot] = home
+        self._link_newest(slot)
+        self._count += 1
+        self.first_seen[slot] = ts
+        self.last_seen[slot] = ts
+        self.sbytes[slot] = 0
+        self.dbytes[slot] = 0
+        self.spkts[slot] = 0
+        self.dpkts[slot] = 0
+        self.sttl[slot] = 0
+        self.dttl[slot] = 0
+        self.initiator_low[slot] = src_low
+        self.max_score[slot] = 0
+        self.allocated[slot] = self._updates
+        self.created += 1
+        return slot
+
+    def _link_newest(self, slot):
+        self._older[slot] = self._newest
+        self._newer[slot] = -1
+        if self._newest >= 0:
+            self._newer[self._newest] = slot
+        else:
+            self._oldest = slot
+        self._newest = slot
+
+    def _unlink(self, slot):
+        older, newer = self._older.item(slot), self._newer.item(slot)
+        if older >= 0:
+            self._newer[older] = newer
+        else:
+            self._oldest = newer
+        if newer >= 0:
+            self._older[newer] = older
+        else:
+            self._newest = older
+
+    def _unindex(self, slot):
+        """Remove a slot from the hash table, shifting its probe chain back over the gap"""
+        buckets, home, mask = self._buckets, self._home, self._mask
+        hole = home.item(slot)
+        while buckets.item(hole) != slot:
+            hole = (hole + 1) & mask
+        bucket = hole
+        while True:
+            bucket = (bucket + 1) & mask
+            other = buckets.item(bucket)
+            if other < 0:
+                break
+            # Move entries whose probe from their home bucket passes the hole
+            if (bucket - home.item(other)) & mask >= (bucket - hole) & mask:
+                buckets[hole] = other
+                hole = bucket
+        buckets[hole] = -1
+
+    def key(self, slot):
+        """Return the canonical ``(proto, src, sport, dst, dport)`` key of a slot's flow"""
+        low_hi, low_lo, high_hi, high_lo, rest = self._keys[slot].tolist()
+        return (rest >> 32, low_hi << 64 | low_lo, (rest >> 16) & 0xFFFF,
+                high_hi << 64 | high_lo, rest & 0xFFFF)
+
+    def _release(self, slot):
+        self._unindex(slot)
+        self._unlink(slot)
+        self._count -= 1
+        self.allocated[slot] = self._updates
+        if self.on_expire is not None:
+            # Reported by record_scores() or flush(), once this batch's scores are in
+            self._retired.append((self.key(slot), slot, self._updates, self.record(slot)))
+        self._free[self._free_count] = slot
+        self._free_count += 1
+
+    def record_scores(self, slots, scores):
+        """Fold per-packet threat scores into their flows and report released flows
+
+        ``slots`` are those ``update`` returned for the most recent packets,
+        in order, with -1 for rows that were not accounted.
+        """
+        slots = np.asarray(slots, dtype=np.int64)
+        scores = np.asarray(scores, dtype=np.float32)
+        valid = slots >= 0
+        slots, scores = slots[valid], scores[valid]
+        rows = np.arange(self._updates - len(slots), self._updates)
+        # Rows older than their slot's current flow belong to a flow released since
+        live = rows >= self.allocated[slots]
+        np.maximum.at(self.max_score, slots[live], scores[live])
+        self._report_retired(slots[~live], rows[~live], scores[~live])
+
+    def _report_retired(self, slots=None, rows=None, scores=None):
+        retired, self._retired = self._retired, []
+        if not retired:
+            return
+        maxima = np.zeros(len(retired), dtype=np.float32)
+        if slots is not None and len(slots):
+            # Flows retired from one slot cover disjoint, consecutive row ranges, so
+            # a row belongs to the first flow of its slot released after it
+            span = self._updates + 1
+            ends = np.array([slot * span + end for _, slot, end, _ in retired], dtype=np.int64)
+            order = np.argsort(ends)
+            owner = order[np.searchsorted(ends[order], slots * span + rows, side='right')]
+            np.maximum.at(maxima, owner, scores)
+        for (key, _, _, record), score in zip(retired, maxima.tolist()):
+            record['max_score'] = max(record['max_score'], score)
+            self.on_expire(key, record)
+
+    def expire(self, now):
+        """Drop flows idle for longer than ``idle_timeout``; returns how many"""
+        count = 0
+        while self._oldest >= 0 and now - self.last_seen[self._oldest] > self.idle_timeout:
+            self._release(self._oldest)
+            count += 1
+        self.expired_idle += count
+        return count
+
+    def flush(self):
+        """Release every flow, reporting each through ``on_expire``"""
+        while self._oldest >= 0:
+            self._release(self._oldest)
+        self._report_retired()
+
+    def feature(self, slot, name):
+        """Return the current value of one flow feature for a slot"""
+        if name == 'duration':
+            return self.last_seen[slot] - self.first_seen[slot]
+        if name in ('rate', 'sload', 'dload'):
+            duration = self.last_seen[slot] - self.first_seen[slot]
+            if duration <= 0:
+                return 0.0
+            if name == 'rate':
+                return (int(self.spkts[slot]) + int(self.dpkts[slot])) / duration
+            if name == 'sload':
+                return int(self.sbytes[slot]) * 8 / duration
+            return int(self.dbytes[slot]) * 8 / duration
+        return getattr(self, name)[slot]
+
+    def record(self, slot):
+        """Return a flow's features as a dict"""
+        record = {name: self.feature(slot, name) for name in FLOW_FEATURES}
+        record['first_seen'] = float(self.first_seen[slot])
+        record['last_seen'] = float(self.last_seen[slot])
+        record['initiator_low'] = bool(self.initiator_low[slot])
+        record['max_score'] = float(self.max_score[slot])
+        return record
+
+    def stats(self):
+        """Return occupancy and expiry counters"""
+        return {
+            'active_flows': self._count,
+            'max_flows': self.max_flows,
+            'created': self.created,
+            'expired_idle': self.expired_idle,
+            'expired_active': self.expired_active,
+            'evicted': self.evicted,
+        }
@@ -0,0 +1,147 @@
+import numpy as np
+import torch
+
+from src.metrics import stage_histogram
+from src.model_loader import DEFAULT_MODEL_PATH, get_model_entry, predict_scores
+from src.torch_backend import TorchScorer
+from src.utils import preprocess_data
+
+# Clamp logits so exp() stays finite in float32
+MAX_LOGIT = 80.0
+
+
+class FusedLinearScorer:
+    """Binary logistic model with its MinMax scaling folded into the weights.
+
+    ``scores(X)`` computes ``sigmoid(X @ w + b)`` on a contiguous float32
+    array in one pass, replacing ``minmax_scaler.transform`` followed by
+    ``predict_proba`` and their per-call validation overhead.
+    """
+
+    def __init__(self, weights, bias, logit_scale=1.0):
+        self.weights = np.ascontiguousarray(weights, dtype=np.float32)
+        self.bias = np.float32(bias)
+        self.logit_scale = np.float32(logit_scale)
+
+    def decision_function(self, X):
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        z = X @ self.weights
+        z += self.bias
+        return z
+
+    def scores(self, X):
+        """Return the probability of the positive class for each row"""
+        z = self.decision_function(X)
+        if self.logit_scale != 1:
+            z *= self.logit_scale
+        np.clip(z, -MAX_LOGIT, MAX_LOGIT, out=z)
+        np.negative(z, out=z)
+        np.exp(z, out=z)
+        z += 1
+        np.reciprocal(z, out=z)
+        return z
+
+    def predict(self, X):
+        return (self.decision_function(X) > 0).astype(np.int64)
+
+
+def compile_linear_model(model, minmax_scaler, probe=None, atol=1e-5):
+    """Fold a fitted MinMaxScaler into a binary logistic model
+
+    Returns a ``FusedLinearScorer``, or None when the model is not a binary
+    linear classifier with probabilities or the scaler clips its output.
+    The result is checked against sklearn on ``probe`` rows (random rows
+    in the scaler's fitted range by default) before it is returned.
+    """
+    coef = getattr(model, 'coef_', None)
+    intercept = getattr(model, 'intercept_', None)
+    if coef is None or intercept is None or not hasattr(model, 'predict_proba'):
+        return None
+    if coef.shape[0] != 1 or len(getattr(model, 'classes_', ())) != 2:
+        return None
+    if getattr(minmax_scaler, 'clip', False) or not hasattr(minmax_scaler, 'scale_'):
+        return None
+
+    coef = coef[0].astype(np.float64)
+    scale = np.asarray(minmax_scaler.scale_, dtype=np.float64)
+    offset = np.asarray(minmax_scaler.min_, dtype=np.float64)
+    if scale.shape != coef.shape:
+        return None
+
+    # (X * scale + offset) @ coef + intercept == X @ (scale * coef) + (offset @ coef + intercept)
+    weights = scale * coef
+    bias = float(offset @ coef + intercept[0])
+
+    if probe is None:
+        low = np.asarray(minmax_scaler.data_min_, dtype=np.float64)
+        high = np.asarray(minmax_scaler.data_max_, dtype=np.float64)
+        span = np.where(high > low, high - low, 1.0)
+        probe = low + np.random.default_rng(0).uniform(-0.5, 1.5, (256, len(coef))) * span
+    probe = np.asarray(probe, dtype=np.float32)
+    expected = model.predict_proba(minmax_scaler.transform(probe))[:, 1]
+
+    # Some sklearn versions score binary multinomial models as softmax([-z, z]) = sigmoid(2z)
+    for logit_scale in (1.0, 2.0):
+        scorer = FusedLinearScorer(weights, bias, logit_scale)
+        if np.allclose(scorer.scores(probe), expected, atol=atol):
+            return scorer
+    return None
+
+
+def build_scorer(model, minmax_scaler, standard_scaler, torch_options=None):
+    """Return a function mapping raw feature matrices to threat scores
+
+    Uses the fused kernel when the model compiles, a batched ``TorchScorer``
+    (configured by ``torch_options``) for torch modules, otherwise the
+    sklearn ``preprocess_data`` + ``predict_scores`` path. Models loaded
+    from an artifact bring their own MinMax scaler, which takes precedence.
+    Each call is timed into the ``scale`` and ``inference`` stage
+    histograms; the fused kernel scales inside ``inference``.
+    """
+    minmax_scaler = getattr(model, 'minmax_scaler', None) or minmax_scaler
+    scale_latency = stage_histogram('scale')
+    inference_latency = stage_histogram('inference')
+    fused = compile_linear_model(model, minmax_scaler)
+    if fused is not None:
+        def score_fused(features):
+            with inference_latency.time():
+                return fused.scores(features)
+        return score_fused
+
+    if isinstance(model, torch.nn.Module):
+        predict = TorchScorer(model, **(torch_options or {})).scores
+    else:
+        def predict(X):
+            return predict_scores(model, X)
+
+    def score(features):
+        with scale_latency.time():
+            X = preprocess_data(features, minmax_scaler, standard_scaler)
+        with inference_latency.time():
+            return predict(X)
+    return score
+
+
+class RegistryScorer:
+    """Scoring function that follows the shared model registry.
+
+    Each call looks up the current model entry (a cheap check between
+    registry polls) and recompiles the scorer when the model version
+    changes, so a whole batch is always scored by one model.
+    """
+
+    def __init__(self, minmax_scaler, standard_scaler, path=DEFAULT_MODEL_PATH, torch_options=None):
+        self.minmax_scaler = minmax_scaler
+        self.standard_scaler = standard_scaler
+        self.path = path
+        self.torch_options = torch_options
+        self.version = None
+        self._score = None
+
+    def __call__(self, features):
+        entry = get_model_entry(self.path)
+        if entry.version != self.version:
+            self._score = build_scorer(entry.model, self.minmax_scaler, self.standard_scaler,
+                                        self.torch_options)
+            self.version = entry.version
+        return self._score(features)
@@ -0,0 +1,369 @@
+"""Low-overhead in-process metrics: counters, latency histograms and a Prometheus endpoint.
+
+Hot paths write without taking a lock: every thread updates its own
+cell of a metric, and readers sum the cells. Histograms use HDR-style
+log-linear buckets (``SUB_BUCKETS`` per power of two, about 1.5%
+relative error) from 1 µs to ~134 s, so recording is an index
+computation and one increment, and percentiles never need the raw
+samples. ``start_exporter`` serves everything in the Prometheus text
+format on a local HTTP port.
+"""
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+SUB_BUCKETS = 64
+# Powers of two of microseconds covered; 2**27 µs is about 134 s
+OCTAVES = 27
+BUCKETS = SUB_BUCKETS * OCTAVES
+# Upper edge of each bucket, in seconds
+BUCKET_EDGES = np.array([(0.5 + (i % SUB_BUCKETS + 1) / (2 * SUB_BUCKETS)) * 2.0 ** (i // SUB_BUCKETS + 1) * 1e-6
+                         for i in range(BUCKETS)])
+# ``le`` bounds exported to Prometheus, in seconds
+PROMETHEUS_BUCKETS = (1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3,
+                      0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DEFAULT_EXPORTER_PORT = 9464
+# Threat scores are counted in bins of 1/SCORE_BINS; see score_histogram
+SCORE_BINS = 1000
+
+
+def _bucket(seconds):
+    micros = seconds * 1e6
+    if micros < 1:
+        return 0
+    mantissa, exponent = math.frexp(micros)
+    return min(BUCKETS - 1, (exponent - 1) * SUB_BUCKETS + int((mantissa - 0.5) * 2 * SUB_BUCKETS))
+
+
+def _buckets(seconds):
+    mantissa, exponent = np.frexp(np.maximum(np.asarray(seconds, dtype=np.float64) * 1e6, 1.0))
+    index = (exponent - 1) * SUB_BUCKETS + ((mantissa - 0.5) * 2 * SUB_BUCKETS).astype(np.int64)
+    return np.minimum(index, BUCKETS - 1)
+
+
+class _PerThread:
+    """Per-thread cells of one metric; cells of finished threads are folded into one.
+
+    Only the owning thread writes its cell, so updates need no lock.
+    Creating a cell, folding and reading take the metric's lock.
+    """
+
+    def __init__(self, new_cell, fold, new_total=None):
+        self._new_cell = new_cell
+        self._fold = fold
+        self.local = threading.local()
+        self._cells = []
+        self._retired = (new_total or new_cell)()
+        self._lock = threading.Lock()
+
+    def cell(self):
+        try:
+            return self.local.cell
+        except AttributeError:
+            pass
+        cell = self.local.cell = self._new_cell()
+        with self._lock:
+            # Streamlit runs every rerun on a new thread; keep their cells from piling up
+            live = []
+            for thread, old in self._cells:
+                if thread.is_alive():
+                    live.append((thread, old))
+                else:
+                    self._fold(self._retired, old)
+            live.append((threading.current_thread(), cell))
+            self._cells = live
+        return cell
+
+    def collect(self, total):
+        """Fold every cell into ``total`` and return it"""
+        with self._lock:
+            self._fold(total, self._retired)
+            for _, cell in self._cells:
+                self._fold(total, cell)
+        return total
+
+
+def _fold_counter(total, cell):
+    total[0] += cell[0]
+
+
+class Counter:
+    """Monotonic counter, exported as ``<name>_total``"""
+
+    def __init__(self, name, help, labels=None):
+        self.name = name
+        self.help = help
+        self.labels = dict(labels or {})
+        self._cells = _PerThread(lambda: [0], _fold_counter)
+
+    def inc(self, amount=1):
+        """Add ``amount``; safe to call from any thread without locking"""
+        self._cells.cell()[0] += amount
+
+    @property
+    def value(self):
+        return self._cells.collect([0])[0]
+
+
+def _new_histogram_cell():
+    # Bucket counts as a plain list (cheaper to increment than an array element), then [sum, max]
+    return [[0] * BUCKETS, [0.0, 0.0]]
+
+
+def _new_histogram_total():
+    return [np.zeros(BUCKETS, dtype=np.int64), [0.0, 0.0]]
+
+
+def _fold_histogram(total, cell):
+    total[0] += np.array(cell[0], dtype=np.int64)
+    total[1][0] += cell[1][0]
+    total[1][1] = max(total[1][1], cell[1][1])
+
+
+class Histogram:
+    """Latency histogram in seconds with log-linear buckets"""
+
+    def __init__(self, name, help, labels=None):
+        self.name = name
+        self.help = help
+        self.labels = dict(labels or {})
+        self._cells = _PerThread(_new_histogram_cell, _fold_histogram, _new_histogram_total)
+        self._local = self._cells.local
+
+    def record(self, seconds):
+        """Record one duration"""
+        try:
+            counts, totals = self._local.cell
+        except AttributeError:
+            counts, totals = self._cells.cell()
+        counts[_bucket(seconds)] += 1
+        totals[0] += seconds
+        if seconds > totals[1]:
+            totals[1] = seconds
+
+    def record_many(self, seconds):
+        """Record an array of durations at once, e.g. the per-packet waits of a batch"""
+        seconds = np.asarray(seconds, dtype=np.float64)
+        if not seconds.size:
+            return
+        counts, totals = self._cells.cell()
+        buckets = np.bincount(_buckets(seconds), minlength=BUCKETS)
+        for index in np.flatnonzero(buckets).tolist():
+            counts[index] += int(buckets[index])
+        totals[0] += float(seconds.sum())
+        totals[1] = max(totals[1], float(seconds.max()))
+
+    def time(self):
+        """Context manager recording the duration of its block"""
+        return _Timer(self)
+
+    def snapshot(self):
+        """Return ``HistogramSnapshot`` of all threads' recordings so far"""
+        counts, (total, maximum) = self._cells.collect(_new_histogram_total())
+        return HistogramSnapshot(counts, total, maximum)
+
+
+class _Timer:
+    __slots__ = ('histogram', 'started')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.record(time.perf_counter() - self.started)
+
+
+class HistogramSnapshot:
+    """Merged bucket counts of a ``Histogram`` with percentile queries"""
+
+    def __init__(self, counts, total, maximum):
+        self.counts = counts
+        self.count = int(counts.sum())
+        self.sum = total
+        self.max = maximum
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else 0.0
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the ``q``-th percentile, in seconds"""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(q / 100 * self.count))
+        index = int(np.searchsorted(np.cumsum(self.counts), rank))
+        return min(float(BUCKET_EDGES[index]), self.max)
+
+    def cumulative(self, bounds=PROMETHEUS_BUCKETS):
+        """Counts of recordings at or below each bound"""
+        cumulative = np.cumsum(self.counts)
+        return [int(cumulative[index - 1]) if index else 0
+                for index in np.searchsorted(BUCKET_EDGES, bounds, side='right')]
+
+
+class MetricsRegistry:
+    """Named metrics of this process, created on first use"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, kind, name, help, labels):
+        key = (name, tuple(sorted((labels or {}).items())))
+        metric = self._metrics.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(key)
+                if metric is None:
+                    metric = self._metrics[key] = kind(name, help, labels)
+        if not isinstance(metric, kind):
+            raise TypeError(f"metric {name} is a {type(metric).__name__}, not a {kind.__name__}")
+        return metric
+
+    def counter(self, name, help="", labels=None):
+        return self._get(Counter, name, help, labels)
+
+    def histogram(self, name, help="", labels=None):
+        return self._get(Histogram, name, help, labels)
+
+    def metrics(self):
+        """Return every metric, sorted by name and labels"""
+        with self._lock:
+            return [self._metrics[key] for key in sorted(self._metrics)]
+
+    def prometheus_text(self):
+        """Render every metric in the Prometheus text exposition format"""
+        lines = []
+        described = set()
+        for metric in self.metrics():
+            counter = isinstance(metric, Counter)
+            family = metric.name + ('_total' if counter else '')
+            if family not in described:
+                described.add(family)
+                lines.append(f"# HELP {family} {metric.help}")
+                lines.append(f"# TYPE {family} {'counter' if counter else 'histogram'}")
+            if counter:
+                lines.append(f"{family}{_labels(metric.labels)} {metric.value}")
+                continue
+            snapshot = metric.snapshot()
+            for bound, count in zip(PROMETHEUS_BUCKETS, snapshot.cumulative()):
+                lines.append(f"{family}_bucket{_labels(metric.labels, le=repr(bound))} {count}")
+            lines.append(f"{family}_bucket{_labels(metric.labels, le='+Inf')} {snapshot.count}")
+            lines.append(f"{family}_sum{_labels(metric.labels)} {snapshot.sum!r}")
+            lines.append(f"{family}_count{_labels(metric.labels)} {snapshot.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels, **extra):
+    labels = {**labels, **extra}
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+_metrics = MetricsRegistry()
+
+def get_metrics():
+    """Return the process-wide metrics registry"""
+    return _metrics
+
+def counter(name, help="", labels=None):
+    """Return the process-wide counter ``name``, creating it on first use"""
+    return _metrics.counter(name, help, labels)
+
+def histogram(name, help="", labels=None):
+    """Return the process-wide histogram ``name``, creating it on first use"""
+    return _metrics.histogram(name, help, labels)
+
+def stage_histogram(stage):
+    """Return the latency histogram of one pipeline stage"""
+    return _metrics.histogram('nids_stage_latency_seconds',
+                              "Time spent per call in each pipeline stage", {'stage': stage})
+
+def score_histogram(scores):
+    """Count ``scores`` into ``SCORE_BINS + 1`` bins: bin 0 holds scores <= 0, bin k those in ((k-1)/B, k/B]
+
+    Kept per detector, the counts answer how many packets scored above
+    any threshold (see ``count_above``) without rescoring or keeping
+    the scores. Bins are computed in float32, as the scores are stored.
+    """
+    scores = np.asarray(scores, dtype=np.float32)
+    bins = np.clip(np.ceil(scores * np.float32(SCORE_BINS)), 0, SCORE_BINS).astype(np.int64)
+    return np.bincount(bins, minlength=SCORE_BINS + 1)
+
+def count_above(histogram, threshold):
+    """Packets of a ``score_histogram`` that scored above ``threshold``, rounded to 1/SCORE_BINS"""
+    return int(histogram[min(max(int(round(threshold * SCORE_BINS)), -1), SCORE_BINS) + 1:].sum())
+
+def packets_inspected():
+    return _metrics.counter('nids_packets_inspected', "IP packets decoded and scored")
+
+def threats_detected():
+    return _metrics.counter('nids_threats', "Packets scored above the detection threshold")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = self.server.registry.prometheus_text().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_exporter = None
+_exporter_lock = threading.Lock()
+
+def start_exporter(port=DEFAULT_EXPORTER_PORT, host='127.0.0.1'):
+    """Serve ``/metrics`` on ``host:port`` from a background thread; returns the server
+
+    Calling it again with the same address returns the running server;
+    a different address replaces it. Raises ``OSError`` if the port is taken.
+    """
+    global _exporter
+    with _exporter_lock:
+        if _exporter is not None:
+            if _exporter.server_address == (host, port):
+                return _exporter
+            _stop_exporter()
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        server.daemon_threads = True
+        server.registry = _metrics
+        threading.Thread(target=server.serve_forever, name="metrics-exporter", daemon=True).start()
+        _exporter = server
+        return server
+
+def stop_exporter():
+    """Stop the metrics endpoint if it is running"""
+    with _exporter_lock:
+        _stop_exporter()
+
+def _stop_exporter():
+    global _exporter
+    if _exporter is not None:
+        _exporter.shutdown()
+        _exporter.server_close()
+        _exporter = None
+
+def exporter_address():
+    """Return ``(host, port)`` of the running endpoint, or None"""
+    server = _exporter
+    return server.server_address if server is not None else None
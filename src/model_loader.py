@@ -1,9 +1,16 @@
+import hashlib
+import os
+import threading
+import time
 import joblib
 import torch
 import warnings
+from collections import namedtuple
 from sklearn.linear_model import LogisticRegression
 import numpy as np
 
+from src.artifact import is_artifact, load_artifact, metadata_path
+
 def create_default_model():
     """Create a new LogisticRegression model with default parameters"""
     model = LogisticRegression(random_state=42)
@@ -13,34 +20,184 @@ def create_default_model():
     model.fit(X, y)
     return model
 
-def load_model(path='models/logistic_regression_meta_model.pkl'):
-    """Load the model, handling version mismatches"""
+class ModelVersionMismatch(Exception):
+    """Raised when an artifact was saved by an incompatible library version"""
+
+def read_model(path):
+    """Load a model artifact, raising on errors or version mismatches"""
+    if is_artifact(path):
+        return load_artifact(path)
+    if path.endswith(('.pt', '.pth')):
+        # Whole modules saved with torch.save
+        model = torch.load(path, map_location='cpu', weights_only=False)
+        model.eval()
+        return model
+
+    with warnings.catch_warnings(record=True) as w:
+        warnings.simplefilter("always")
+        model = joblib.load(path)
+        
+        # Check if there were any version mismatch warnings
+        if any("version" in str(warning.message) for warning in w):
+            raise ModelVersionMismatch(f"{path} was saved with a different library version")
+    
+    if isinstance(model, torch.nn.Module):
+        model.eval()
+    
+    return model
+
+def load_model(path='models/logistic_regression_meta_model.pkl', persist=True):
+    """Load the model, handling version mismatches
+
+    When the artifact cannot be used a default model is created; it is only
+    written back to ``path`` if ``persist`` is set and ``path`` is a pickle.
+    """
+    persist = persist and not os.path.isdir(path)
     try:
-        with warnings.catch_warnings(record=True) as w:
-            warnings.simplefilter("always")
-            model = joblib.load(path)
-            
-            # Check if there were any version mismatch warnings
-            version_mismatch = any("version" in str(warning.message) for warning in w)
-            
-            if version_mismatch:
-                # If there's a version mismatch, create and return a new model
-                model = create_default_model()
-                # Save the new model
-                joblib.dump(model, path)
-                print("Created new model due to version mismatch")
+        model = read_model(path)
+    except ModelVersionMismatch:
+        # If there's a version mismatch, create and return a new model
+        model = create_default_model()
+        # Save the new model
+        if persist:
+            joblib.dump(model, path)
+        print("Created new model due to version mismatch")
     except Exception as e:
         print(f"Error loading model: {str(e)}")
         model = create_default_model()
         # Save the new model
-        joblib.dump(model, path)
+        if persist:
+            joblib.dump(model, path)
         print("Created new model due to loading error")
     
-    if isinstance(model, torch.nn.Module):
-        model.eval()
-    
     return model
 
+MODELS_DIR = 'models'
+MODEL_EXTENSIONS = ('.pkl', '.joblib', '.pt', '.pth')
+
+def available_models(directory=MODELS_DIR):
+    """Return the model files and artifact directories directly under ``directory``
+
+    Loading a model unpickles it, which can run arbitrary code, so the
+    dashboard only offers models from this directory instead of taking a
+    path from the viewer.
+    """
+    if not os.path.isdir(directory):
+        return []
+    models = []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if is_artifact(path) or (os.path.isfile(path) and name.endswith(MODEL_EXTENSIONS)):
+            models.append(path)
+    return models
+
+DEFAULT_ARTIFACT_PATH = 'models/logistic_regression_meta_model'
+
+# Prefer the memory-mapped artifact over the pickle once it has been generated with
+# ``python -m src.artifact convert`` (see src/artifact.py); it is not committed
+DEFAULT_MODEL_PATH = (DEFAULT_ARTIFACT_PATH if is_artifact(DEFAULT_ARTIFACT_PATH)
+                      else 'models/logistic_regression_meta_model.pkl')
+
 def load_meta_model():
     """Load meta model with version mismatch handling"""
-    return load_model('models/logistic_regression_meta_model.pkl')
+    return load_model(DEFAULT_MODEL_PATH)
+
+# An immutable snapshot of a loaded artifact; swapped as a whole on reload
+ModelEntry = namedtuple('ModelEntry', ['model', 'version', 'digest', 'mtime', 'size', 'loaded_at'])
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class ModelRegistry:
+    """Process-wide cache of loaded models shared by every session and thread.
+
+    Each artifact is loaded once. At most every ``check_interval`` seconds a
+    lookup stats the file; if its mtime or size changed and the content
+    hash differs, the new model is loaded and swapped in as a fresh
+    ``ModelEntry``. Callers holding the previous entry keep a consistent
+    model until they ask again. The registry never writes model files.
+    """
+
+    def __init__(self, check_interval=2.0):
+        self.check_interval = check_interval
+        self._entries = {}
+        self._checked = {}
+        self._lock = threading.Lock()
+
+    def entry(self, path=DEFAULT_MODEL_PATH):
+        """Return the current ``ModelEntry`` for ``path``, reloading it if the file changed"""
+        entry = self._entries.get(path)
+        if entry is not None and time.monotonic() - self._checked[path] < self.check_interval:
+            return entry
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and time.monotonic() - self._checked[path] < self.check_interval:
+                return entry
+            try:
+                entry = self._refresh(path, entry)
+            except OSError as e:
+                if entry is None:
+                    raise
+                print(f"Keeping loaded model; cannot check {path}: {str(e)}")
+            self._entries[path] = entry
+            self._checked[path] = time.monotonic()
+            return entry
+
+    def get(self, path=DEFAULT_MODEL_PATH):
+        """Return the current model for ``path``"""
+        return self.entry(path).model
+
+    def _refresh(self, path, entry):
+        # An artifact directory changes version when its metadata file is replaced
+        watched = metadata_path(path) if os.path.isdir(path) else path
+        stat = os.stat(watched)
+        if entry is not None and (stat.st_mtime, stat.st_size) == (entry.mtime, entry.size):
+            return entry
+
+        digest = _file_digest(watched)
+        if entry is not None and digest == entry.digest:
+            return entry._replace(mtime=stat.st_mtime, size=stat.st_size)
+
+        if entry is None:
+            model = load_model(path, persist=False)
+            return ModelEntry(model, 1, digest, stat.st_mtime, stat.st_size, time.time())
+
+        try:
+            model = read_model(path)
+        except Exception as e:
+            # Possibly caught mid-write; keep serving the old model and retry next check
+            print(f"Keeping model version {entry.version}; cannot reload {path}: {str(e)}")
+            return entry
+        print(f"Reloaded model {path} (version {entry.version + 1})")
+        return ModelEntry(model, entry.version + 1, digest, stat.st_mtime, stat.st_size, time.time())
+
+_registry = ModelRegistry()
+
+def get_model(path=DEFAULT_MODEL_PATH):
+    """Return the shared model for ``path`` from the process-wide registry"""
+    return _registry.get(path)
+
+def get_model_entry(path=DEFAULT_MODEL_PATH):
+    """Return the shared ``ModelEntry`` for ``path``, including its version"""
+    return _registry.entry(path)
+
+def predict_scores(model, X):
+    """Return threat scores in [0, 1] for a batch of preprocessed rows
+
+    Torch modules are expected to return logits: one per row (sigmoid) or
+    two per row (softmax, positive class second).
+    """
+    if isinstance(model, torch.nn.Module):
+        with torch.inference_mode():
+            logits = model(torch.as_tensor(np.asarray(X, dtype=np.float32))).float()
+        if logits.ndim == 2 and logits.shape[1] == 2:
+            return torch.softmax(logits, dim=1)[:, 1].numpy()
+        return torch.sigmoid(logits.reshape(-1)).numpy()
+    if hasattr(model, 'predict_proba'):
+        return model.predict_proba(X)[:, 1]
+    return np.asarray(model.predict(X), dtype=np.float32).ravel()
@@ -0,0 +1,293 @@
+import os
+import struct
+
+from src.decoder import LINKTYPE_ETHERNET, SCAPY_ETHERTYPES, VLAN_TPIDS
+
+PCAP_MAGIC_USEC = 0xA1B2C3D4
+PCAP_MAGIC_NSEC = 0xA1B23C4D
+PCAPNG_BLOCK_SHB = 0x0A0D0D0A
+PCAPNG_BYTE_ORDER_MAGIC = 0x1A2B3C4D
+PCAPNG_BLOCK_IDB = 0x00000001
+PCAPNG_BLOCK_SPB = 0x00000003
+PCAPNG_BLOCK_EPB = 0x00000006
+PCAPNG_OPTION_TSRESOL = 9
+
+PCAP_HEADER_SIZE = 24
+PCAP_RECORD_SIZE = 16
+
+# EtherTypes accepted when checking a candidate record during resync
+KNOWN_ETHERTYPES = (0x0800, 0x86DD, 0x0806, 0x8035, 0x88CC, 0x888E) + VLAN_TPIDS + SCAPY_ETHERTYPES
+
+# Upper bound on a single record; anything larger means a corrupt file
+MAX_RECORD_SIZE = 262144
+
+
+# The dashboard only reads server-side captures from under this directory
+CAPTURES_DIR = 'captures'
+
+
+class PcapFormatError(ValueError):
+    """Raised when a capture file is not a readable pcap/pcapng stream"""
+
+
+def resolve_capture(path, directory=CAPTURES_DIR):
+    """Return the real path of ``path``, which must lie under ``directory``
+
+    Symlinks and ``..`` are resolved before the check, so a path typed
+    into the dashboard cannot reach files elsewhere on the server. Raises
+    ``PermissionError`` for anything outside the directory.
+    """
+    resolved = os.path.realpath(path)
+    root = os.path.realpath(directory)
+    if os.path.commonpath([resolved, root]) != root:
+        raise PermissionError(f"{path} is outside the captures directory {directory}/")
+    return resolved
+
+
+def _read_exact(stream, size):
+    data = stream.read(size)
+    if len(data) < size:
+        return None
+    return data
+
+
+def _is_pcap_magic(magic_bytes):
+    magics = (PCAP_MAGIC_USEC, PCAP_MAGIC_NSEC)
+    return struct.unpack('<I', magic_bytes)[0] in magics or struct.unpack('>I', magic_bytes)[0] in magics
+
+
+def _pcap_format(magic_bytes):
+    """Return ``(endian, resolution)`` for a classic pcap magic number"""
+    magic = struct.unpack('<I', magic_bytes)[0]
+    if magic in (PCAP_MAGIC_USEC, PCAP_MAGIC_NSEC):
+        endian = '<'
+    else:
+        endian = '>'
+        magic = struct.unpack('>I', magic_bytes)[0]
+    return endian, 1e-9 if magic == PCAP_MAGIC_NSEC else 1e-6
+
+
+def _iter_pcap_records(stream, endian, resolution, linktype, position=None, end=None):
+    record = struct.Struct(endian + 'IIII')
+    while end is None or position < end:
+        data = _read_exact(stream, record.size)
+        if data is None:
+            return
+        sec, frac, caplen, _ = record.unpack(data)
+        if caplen > MAX_RECORD_SIZE:
+            raise PcapFormatError(f'record length {caplen} exceeds {MAX_RECORD_SIZE}')
+        frame = _read_exact(stream, caplen)
+        if frame is None:
+            return
+        if position is not None:
+            position += record.size + caplen
+        yield frame, sec + frac * resolution, linktype
+
+
+def _iter_pcap(stream, header):
+    endian, resolution = _pcap_format(header[:4])
+    rest = _read_exact(stream, 20)
+    if rest is None:
+        raise PcapFormatError('truncated pcap header')
+    linktype = struct.unpack(endian + 'I', rest[16:20])[0] & 0x0FFFFFFF
+    yield from _iter_pcap_records(stream, endian, resolution, linktype)
+
+
+def read_pcap_header(stream):
+    """Read a classic pcap global header; returns ``(endian, resolution, linktype)``
+
+    Raises ``PcapFormatError`` for pcapng or anything else, since only
+    classic pcap can be entered at an arbitrary byte offset.
+    """
+    header = _read_exact(stream, PCAP_HEADER_SIZE)
+    if header is None:
+        raise PcapFormatError('file is too short to be a capture')
+    magic = header[:4]
+    if not _is_pcap_magic(magic):
+        raise PcapFormatError('not a classic pcap file')
+    endian, resolution = _pcap_format(magic)
+    linktype = struct.unpack(endian + 'I', header[20:24])[0] & 0x0FFFFFFF
+    return endian, resolution, linktype
+
+
+def _plausible_record(data, offset, endian, resolution, linktype, earliest):
+    """Parse a pcap record header at ``offset`` in ``data`` if it looks genuine
+
+    Returns ``(ts_seconds, next_offset)`` or None.
+    """
+    if offset + PCAP_RECORD_SIZE > len(data):
+        return None
+    sec, frac, caplen, origlen = struct.unpack_from(endian + 'IIII', data, offset)
+    if frac * resolution >= 1 or caplen == 0 or caplen > origlen \
+            or origlen > MAX_RECORD_SIZE or sec < earliest:
+        return None
+    frame = offset + PCAP_RECORD_SIZE
+    if linktype == LINKTYPE_ETHERNET and caplen >= 14 and frame + 14 <= len(data):
+        ethertype = struct.unpack_from('!H', data, frame + 12)[0]
+        if ethertype > 1500 and ethertype not in KNOWN_ETHERTYPES:
+            return None
+    return sec, frame + caplen
+
+
+def find_record_boundary(stream, offset, endian, resolution, linktype, earliest=0,
+                         window=4 * MAX_RECORD_SIZE, chain=8, max_gap=3600):
+    """Return the first offset at or after ``offset`` where a pcap record starts
+
+    Classic pcap has no sync markers, so a candidate is accepted only when
+    ``chain`` consecutive plausible record headers follow it: timestamps no
+    earlier than ``earliest`` and within ``max_gap`` seconds of each other,
+    and for Ethernet a known EtherType. Returns None if no boundary is
+    found within ``window`` bytes.
+    """
+    stream.seek(offset)
+    data = stream.read(window + chain * (PCAP_RECORD_SIZE + MAX_RECORD_SIZE))
+    for candidate in range(min(window, len(data))):
+        position, previous, matched = candidate, None, 0
+        while matched < chain and position < len(data):
+            parsed = _plausible_record(data, position, endian, resolution, linktype, earliest)
+            if parsed is None or (previous is not None and abs(parsed[0] - previous) > max_gap):
+                break
+            previous, position = parsed
+            matched += 1
+        # Fewer than ``chain`` records ending exactly at EOF still count as a match
+        if matched == chain or (matched and position == len(data)):
+            return offset + candidate
+    return None
+
+
+def iter_pcap_range(stream, start, end):
+    """Yield ``(frame, ts, linktype)`` for classic pcap records starting in ``[start, end)``
+
+    Lets several workers split one large capture by byte range: each one
+    resynchronizes to the first record boundary at or after ``start`` and
+    stops after the last record that begins before ``end``.
+    """
+    stream.seek(0)
+    endian, resolution, linktype = read_pcap_header(stream)
+    start = max(start, PCAP_HEADER_SIZE)
+    if start != PCAP_HEADER_SIZE:
+        # The capture's first timestamp anchors the search against misaligned matches
+        first = _read_exact(stream, 4)
+        earliest = struct.unpack(endian + 'I', first)[0] if first else 0
+        start = find_record_boundary(stream, start, endian, resolution, linktype, earliest)
+        if start is None or start >= end:
+            return
+    stream.seek(start)
+    yield from _iter_pcap_records(stream, endian, resolution, linktype, start, end)
+
+
+def _tsresol(options, endian):
+    """Return the timestamp resolution from an IDB's options, in seconds"""
+    offset = 0
+    while offset + 4 <= len(options):
+        code, length = struct.unpack_from(endian + 'HH', options, offset)
+        if code == 0:
+            break
+        if code == PCAPNG_OPTION_TSRESOL and length >= 1:
+            value = options[offset + 4]
+            return 2.0 ** -(value & 0x7F) if value & 0x80 else 10.0 ** -value
+        offset += 4 + (length + 3) // 4 * 4
+    return 1e-6
+
+
+def _check_block_length(length):
+    if length < 12 or length > MAX_RECORD_SIZE or length % 4:
+        raise PcapFormatError(f'bad pcapng block length {length}')
+
+
+def _iter_pcapng(stream, head):
+    interfaces = []
+    endian = '<'
+
+    while head is not None:
+        # The SHB block type is a byte palindrome, so it reads the same in either order
+        block_type = struct.unpack(endian + 'I', head[:4])[0]
+        if block_type == PCAPNG_BLOCK_SHB:
+            bom = _read_exact(stream, 4)
+            if bom is None:
+                return
+            endian = '<' if struct.unpack('<I', bom)[0] == PCAPNG_BYTE_ORDER_MAGIC else '>'
+            if struct.unpack(endian + 'I', bom)[0] != PCAPNG_BYTE_ORDER_MAGIC:
+                raise PcapFormatError('bad pcapng byte-order magic')
+            length = struct.unpack(endian + 'I', head[4:8])[0]
+            _check_block_length(length)
+            if _read_exact(stream, length - 12) is None:
+                return
+            # Interface ids are scoped to their section
+            interfaces = []
+        else:
+            length = struct.unpack(endian + 'I', head[4:8])[0]
+            _check_block_length(length)
+            body = _read_exact(stream, length - 8)
+            if body is None:
+                return
+            body = body[:-4]
+
+            if block_type == PCAPNG_BLOCK_IDB:
+                linktype = struct.unpack_from(endian + 'H', body, 0)[0]
+                interfaces.append((linktype, _tsresol(body[8:], endian)))
+            elif block_type == PCAPNG_BLOCK_EPB:
+                iface, ts_hi, ts_lo, caplen, _ = struct.unpack_from(endian + 'IIIII', body, 0)
+                if iface >= len(interfaces):
+                    raise PcapFormatError(f'packet references unknown interface {iface}')
+                linktype, resolution = interfaces[iface]
+                yield body[20:20 + caplen], ((ts_hi << 32) | ts_lo) * resolution, linktype
+            elif block_type == PCAPNG_BLOCK_SPB:
+                linktype = interfaces[0][0] if interfaces else LINKTYPE_ETHERNET
+                orig_len = struct.unpack_from(endian + 'I', body, 0)[0]
+                yield body[4:4 + orig_len], 0.0, linktype
+
+        head = _read_exact(stream, 8)
+
+
+def iter_frames(stream):
+    """Yield ``(frame, ts, linktype)`` for each packet in a pcap or pcapng stream
+
+    Records are read one at a time from the file object, so memory use
+    does not depend on the size of the capture.
+    """
+    header = _read_exact(stream, 8)
+    if header is None:
+        raise PcapFormatError('file is too short to be a capture')
+    magic = struct.unpack('<I', header[:4])[0]
+    if magic == PCAPNG_BLOCK_SHB:
+        yield from _iter_pcapng(stream, header)
+    elif _is_pcap_magic(header[:4]):
+        # The classic header is 24 bytes; 8 are already consumed
+        yield from _iter_pcap(_Prepend(header[4:], stream), header[:4])
+    else:
+        raise PcapFormatError('not a pcap or pcapng file')
+
+
+def iter_chunks(stream, chunk_size=4096):
+    """Yield ``(frames, timestamps, linktype)`` lists of at most ``chunk_size`` packets
+
+    A chunk never mixes link types, so each can be decoded in one call to
+    ``src.decoder.decode_frames``.
+    """
+    frames, timestamps, current = [], [], None
+    for frame, ts, linktype in iter_frames(stream):
+        if frames and (linktype != current or len(frames) >= chunk_size):
+            yield frames, timestamps, current
+            frames, timestamps = [], []
+        current = linktype
+        frames.append(frame)
+        timestamps.append(ts)
+    if frames:
+        yield frames, timestamps, current
+
+
+class _Prepend:
+    """File-like wrapper that replays already-consumed bytes before the stream"""
+
+    def __init__(self, prefix, stream):
+        self._prefix = prefix
+        self._stream = stream
+
+    def read(self, size):
+        if self._prefix:
+            data, self._prefix = self._prefix[:size], self._prefix[size:]
+            if len(data) < size:
+                data += self._stream.read(size - len(data))
+            return data
+        return self._stream.read(size)
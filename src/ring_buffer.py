@@ -0,0 +1,177 @@
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from src.decoder import PROTO_TCP, format_ip, format_tcp_flags
+
+# One captured packet as kept in the monitoring history
+PACKET_DTYPE = np.dtype([
+    ('ts_ns', '<i8'),       # epoch nanoseconds
+    ('src_hi', '<u8'),
+    ('src_lo', '<u8'),      # IPv4 stored IPv4-mapped, as in HEADER_DTYPE
+    ('dst_hi', '<u8'),
+    ('dst_lo', '<u8'),
+    ('size', '<u4'),
+    ('score', '<f4'),
+    ('sport', '<u2'),
+    ('dport', '<u2'),
+    ('protocol', 'u1'),
+    ('flags', 'u1'),
+    ('ip_version', 'u1'),
+    ('iface', 'u1'),        # index into the capturing detector's interface list
+])
+
+
+class RingBuffer:
+    """Fixed-capacity ring of structured records with zero-copy windows.
+
+    Every record is stored twice, at ``i`` and ``i + capacity``, so the
+    most recent ``n`` records always form one contiguous slice and
+    ``latest(n)`` returns a view instead of a copy. Memory is fixed at
+    ``2 * capacity * dtype.itemsize`` bytes; ``append`` is O(1) and
+    ``extend`` O(batch). Meant for a single writer thread: a reader's view
+    can be overwritten once the writer wraps past it, so use ``snapshot``
+    for a window that has to stay stable.
+
+    ``buffer`` places the ring (its head and total counters included) in
+    existing memory of ``buffer_size(dtype, capacity)`` bytes, such as a
+    shared memory segment, so another process can read it in place.
+    """
+
+    def __init__(self, dtype, capacity, buffer=None):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.dtype = np.dtype(dtype)
+        self.capacity = capacity
+        if buffer is None:
+            buffer = bytearray(self.buffer_size(self.dtype, capacity))
+        # head, total (records ever appended, including those since overwritten)
+        self._state = np.ndarray(2, dtype='<u8', buffer=buffer)
+        self._data = np.ndarray(2 * capacity, dtype=self.dtype, buffer=buffer, offset=self._state.nbytes)
+
+    @staticmethod
+    def buffer_size(dtype, capacity):
+        """Bytes of memory a ring of ``capacity`` records occupies"""
+        return 16 + 2 * capacity * np.dtype(dtype).itemsize
+
+    @property
+    def _head(self):
+        return int(self._state[0])
+
+    @property
+    def total(self):
+        return int(self._state[1])
+
+    @classmethod
+    def with_memory_limit(cls, dtype, max_bytes):
+        """Create the largest ring whose storage fits in ``max_bytes``"""
+        return cls(dtype, max(1, int(max_bytes) // (2 * np.dtype(dtype).itemsize)))
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    @property
+    def nbytes(self):
+        return self._data.nbytes
+
+    def append(self, record):
+        """Add one record, overwriting the oldest when full"""
+        head = self._head
+        self._data[head] = record
+        self._data[head + self.capacity] = record
+        self._state[0] = (head + 1) % self.capacity
+        self._state[1] += 1
+
+    def extend(self, records):
+        """Add an array of records in order, keeping only the newest ``capacity``"""
+        count = len(records)
+        records = records[-self.capacity:]
+        n = len(records)
+        head, capacity = self._head, self.capacity
+        first = min(n, capacity - head)
+        self._data[head:head + first] = records[:first]
+        self._data[head + capacity:head + capacity + first] = records[:first]
+        rest = n - first
+        if rest:
+            self._data[:rest] = records[first:]
+            self._data[capacity:capacity + rest] = records[first:]
+        self._state[0] = (head + n) % capacity
+        self._state[1] += count
+
+    def latest(self, n=None):
+        """Return a view of the last ``n`` records (all by default), oldest first"""
+        head, total = self._state
+        size = min(int(total), self.capacity)
+        n = size if n is None else min(n, size)
+        end = int(head) + self.capacity
+        return self._data[end - n:end]
+
+    def snapshot(self, n=None, retries=5):
+        """Return a copy of the last ``n`` records that no concurrent append has torn
+
+        Retries while the writer may have overwritten part of the copy;
+        after ``retries`` attempts the newest copy is returned regardless.
+        """
+        for _ in range(retries):
+            before = self.total
+            window = self.latest(n).copy()
+            # Records survive until capacity - len(window) more are appended
+            if self.total - before <= self.capacity - len(window):
+                break
+        return window
+
+    def clear(self):
+        self._state[:] = 0
+
+    def resized(self, capacity):
+        """Return a new ring of ``capacity`` holding the most recent records of this one"""
+        ring = RingBuffer(self.dtype, capacity)
+        ring.extend(self.latest())
+        ring._state[1] = self.total
+        return ring
+
+
+def packet_records(headers, scores=None, iface=None):
+    """Convert ``HEADER_DTYPE`` rows (and optional scores and interface indexes) into ``PACKET_DTYPE`` records"""
+    records = np.zeros(len(headers), dtype=PACKET_DTYPE)
+    ts_ns = (headers['ts'] * 1e9).astype(np.int64)
+    records['ts_ns'] = np.where(ts_ns > 0, ts_ns, time.time_ns())
+    for name in ('src_hi', 'src_lo', 'dst_hi', 'dst_lo', 'size', 'sport', 'dport',
+                 'protocol', 'ip_version'):
+        records[name] = headers[name]
+    records['flags'] = headers['tcp_flags'] & 0xFF
+    if scores is not None:
+        records['score'] = scores
+    if iface is not None:
+        records['iface'] = iface
+    return records
+
+
+def local_times(ts_ns):
+    """Convert epoch-ns timestamps to naive local-time datetimes for display"""
+    local_zone = datetime.now().astimezone().tzinfo
+    return pd.to_datetime(ts_ns, unit='ns', utc=True).tz_convert(local_zone).tz_localize(None)
+
+
+def records_frame(records, interfaces=None):
+    """Build a display DataFrame (the old ``packet_info`` columns) from a small window
+
+    With ``interfaces``, the capture interface names, an ``interface`` column is added.
+    """
+    frame = pd.DataFrame({
+        'timestamp': local_times(records['ts_ns']),
+        'source_ip': [format_ip(hi, lo) for hi, lo in zip(records['src_hi'], records['src_lo'])],
+        'dest_ip': [format_ip(hi, lo) for hi, lo in zip(records['dst_hi'], records['dst_lo'])],
+        'protocol': records['protocol'].astype(int),
+        'size': records['size'].astype(int),
+        'source_port': records['sport'].astype(int),
+        'dest_port': records['dport'].astype(int),
+        'flags': [format_tcp_flags(flags) if proto == PROTO_TCP else 'N/A'
+                  for flags, proto in zip(records['flags'], records['protocol'])],
+        'threat_score': records['score'].astype(float),
+    })
+    if interfaces:
+        frame.insert(1, 'interface', [interfaces[i] if i < len(interfaces) else '?' for i in records['iface']])
+    return frame
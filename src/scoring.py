@@ -0,0 +1,149 @@
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from src.capture_queue import CaptureQueue, DROP_NEWEST, FairCaptureQueue
+from src.metrics import stage_histogram
+
+
+class BatchScorer:
+    """Score packets in micro-batches on a background thread.
+
+    Packets are handed over with ``submit`` and grouped until either
+    ``max_batch`` packets are pending or the oldest one has waited
+    ``max_latency`` seconds. Each batch is scored with a single call to
+    ``score_fn`` so the capture thread never waits on the model. At most
+    ``max_pending`` packets wait in a ``CaptureQueue``; ``overflow`` picks
+    its policy when scoring falls behind. With ``lanes`` > 1 each producer
+    submits to its own lane of a ``FairCaptureQueue``.
+    """
+
+    def __init__(self, score_fn, on_batch=None, max_batch=256, max_latency=0.02,
+                 max_pending=65536, stats_window=1024, overflow=DROP_NEWEST, lanes=1):
+        self.score_fn = score_fn
+        self.on_batch = on_batch
+        self.max_batch = max_batch
+        self.max_latency = max_latency
+        self.max_pending = max_pending
+
+        if lanes > 1:
+            self.queue = FairCaptureQueue(lanes, max_pending, overflow)
+            self._lanes = self.queue.lanes
+        else:
+            self.queue = CaptureQueue(max_pending, overflow)
+            self._lanes = [self.queue]
+        self._wakeup = threading.Event()
+        self._running = False
+        self._thread = None
+
+        self.scored = 0
+        self.batches = 0
+        self.errors = 0
+        # Packets in batches score_fn or on_batch raised on, which were never inspected
+        self.failed = 0
+        self.last_error = None
+        self._batch_sizes = deque(maxlen=stats_window)
+        self._latencies = deque(maxlen=stats_window)
+        self._score_times = deque(maxlen=stats_window)
+        self._queue_latency = stage_histogram('queue')
+
+    def start(self):
+        """Start the scoring thread"""
+        if self._running:
+            return self
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="batch-scorer", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=1.0):
+        """Stop the scoring thread after flushing pending packets"""
+        self._running = False
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, item, lane=0):
+        """Queue an item for scoring without blocking; returns False if it was dropped or sampled out"""
+        if not self._lanes[lane].put((time.perf_counter(), item)):
+            return False
+        pending = len(self.queue)
+        if pending == 1 or pending >= self.max_batch:
+            self._wakeup.set()
+        return True
+
+    def _next_batch(self):
+        """Wait until a batch is full or its deadline passes, then take it"""
+        pending = self.queue
+        while self._running and not len(pending):
+            self._wakeup.wait(self.max_latency)
+            self._wakeup.clear()
+        oldest = pending.peek()
+        if oldest is None:
+            return []
+
+        deadline = oldest[0] + self.max_latency
+        while self._running and len(pending) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            self._wakeup.wait(remaining)
+            self._wakeup.clear()
+
+        return pending.get_batch(self.max_batch)
+
+    def _run(self):
+        while self._running or len(self.queue):
+            batch = self._next_batch()
+            if batch:
+                self._score(batch)
+
+    def _score(self, batch):
+        items = [item for _, item in batch]
+        started = time.perf_counter()
+        self._queue_latency.record_many(started - np.fromiter((queued for queued, _ in batch), dtype=np.float64,
+                                                              count=len(batch)))
+        try:
+            predictions = np.asarray(self.score_fn(items)).ravel()
+            if self.on_batch is not None:
+                self.on_batch(items, predictions)
+        except Exception as e:
+            self.errors += 1
+            self.failed += len(items)
+            self.last_error = str(e)
+            return
+        finished = time.perf_counter()
+
+        self.batches += 1
+        self.scored += len(items)
+        self._batch_sizes.append(len(items))
+        self._score_times.append(finished - started)
+        # Oldest packet in the batch waited the longest
+        self._latencies.append(finished - batch[0][0])
+
+    def stats(self):
+        """Return queue counters and batch-size and latency statistics for the recent batches"""
+        sizes = np.array(self._batch_sizes, dtype=float)
+        latencies = np.array(self._latencies, dtype=float) * 1000
+        score_times = np.array(self._score_times, dtype=float) * 1000
+        queue = self.queue.stats()
+        return {
+            **queue,
+            'submitted': queue['offered'],
+            'scored': self.scored,
+            'dropped': queue['dropped_newest'] + queue['dropped_oldest'],
+            'pending': queue['depth'],
+            'batches': self.batches,
+            'errors': self.errors,
+            'failed': self.failed,
+            'not_inspected': queue['not_inspected'] + self.failed,
+            'last_error': self.last_error,
+            'mean_batch_size': float(sizes.mean()) if sizes.size else 0.0,
+            'max_batch_size': int(sizes.max()) if sizes.size else 0,
+            'latency_p50_ms': float(np.percentile(latencies, 50)) if latencies.size else 0.0,
+            'latency_p99_ms': float(np.percentile(latencies, 99)) if latencies.size else 0.0,
+            'score_time_ms': float(score_times.mean()) if score_times.size else 0.0,
+        }
@@ -0,0 +1,401 @@
+"""Flow-sharded analysis across worker processes.
+
+A dispatcher hashes each frame's symmetric 5-tuple to one of N worker
+processes, so both directions of a flow always reach the same worker and
+each worker's ``FlowTable`` owns a disjoint share of the flows. Frames
+travel through per-worker shared memory slots as ``SNAPLEN``-byte rows;
+only ``(slot, count, linktype)`` descriptors go through the task queues.
+Workers decode, extract features and score each slot, write
+``PACKET_DTYPE`` records back into it, and a collector thread merges the
+records of all workers into one packet history and one alert stream.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from src.cascade import CascadeScorer
+from src.decoder import (ETHERTYPE_IPV4, ETHERTYPE_IPV6, LINKTYPE_ETHERNET, LINKTYPE_LINUX_SLL,
+                         LINKTYPE_RAW, PROTO_TCP, PROTO_UDP, SNAPLEN, VLAN_TPIDS,
+                         decode_frames, decode_snaps, snap_matrix)
+from src.flows import FlowTable
+from src.fused import RegistryScorer
+from src.metrics import SCORE_BINS, packets_inspected, score_histogram, stage_histogram, threats_detected
+from src.ring_buffer import PACKET_DTYPE, RingBuffer, packet_records
+from src.utils import process_packets
+
+# Independent of the flow sampling hash, so sampled flows still spread over all shards
+SHARD_MULTIPLIER = 0x85EBCA6B
+_MASK32 = 0xFFFFFFFF
+
+
+def flow_shards(buf, linktype, shards):
+    """Map each row of a ``snap_matrix`` to a shard by its symmetric 5-tuple
+
+    Addresses and ports are combined with XOR, so both directions of a
+    flow get the same shard. Fragments and packets whose ports cannot be
+    read hash by address only; non-IP frames all go to shard 0.
+    """
+    n = len(buf)
+    rows = np.arange(n)
+
+    def u8(offset):
+        return buf[rows, np.minimum(offset, SNAPLEN - 1)].astype(np.uint32)
+
+    def u16(offset):
+        return (u8(offset) << 8) | u8(offset + 1)
+
+    def u32(offset):
+        return (u16(offset) << 16) | u16(offset + 2)
+
+    if linktype == LINKTYPE_ETHERNET:
+        off = np.full(n, 14, dtype=np.int64)
+        ethertype = u16(np.full(n, 12))
+        for _ in range(2):
+            tagged = np.isin(ethertype, VLAN_TPIDS)
+            ethertype = np.where(tagged, u16(off + 2), ethertype)
+            off = off + np.where(tagged, 4, 0)
+    elif linktype == LINKTYPE_LINUX_SLL:
+        off = np.full(n, 16, dtype=np.int64)
+        ethertype = u16(np.full(n, 14))
+    elif linktype == LINKTYPE_RAW:
+        off = np.zeros(n, dtype=np.int64)
+        ethertype = np.where(u8(off) >> 4 == 6, ETHERTYPE_IPV6, ETHERTYPE_IPV4)
+    else:
+        return np.zeros(n, dtype=np.int64)
+
+    version = u8(off) >> 4
+    is4 = (ethertype == ETHERTYPE_IPV4) & (version == 4)
+    is6 = (ethertype == ETHERTYPE_IPV6) & (version == 6)
+    addresses = np.where(is4, u32(off + 12) ^ u32(off + 16), 0)
+    for word in range(4):
+        addresses ^= np.where(is6, u32(off + 8 + 4 * word) ^ u32(off + 24 + 4 * word), 0)
+
+    proto = np.where(is4, u8(off + 9), u8(off + 6))
+    l4 = np.where(is4, off + (u8(off) & 0x0F) * 4, off + 40)
+    first_fragment = ~is4 | ((u16(off + 6) & 0x1FFF) == 0)
+    ports = (is4 | is6) & first_fragment & np.isin(proto, (PROTO_TCP, PROTO_UDP))
+    key = addresses ^ np.where(ports, (u16(l4) ^ u16(l4 + 2)) | (proto << 16), 0)
+
+    bucket = ((key.astype(np.uint64) * np.uint64(SHARD_MULTIPLIER)) & np.uint64(_MASK32)) >> np.uint64(16)
+    return (bucket % np.uint64(shards)).astype(np.int64)
+
+
+def _slot_arrays(buf, slots, slot_size):
+    """Views of one worker's segment: per slot, frame rows in and packet records out"""
+    layout = [
+        ('frames', np.uint8, (slots, slot_size, SNAPLEN)),
+        ('lengths', np.uint32, (slots, slot_size)),
+        ('ts', np.float64, (slots, slot_size)),
+        ('iface', np.uint8, (slots, slot_size)),
+        ('records', PACKET_DTYPE, (slots, slot_size)),
+    ]
+    arrays, offset = {}, 0
+    for name, dtype, shape in layout:
+        arrays[name] = np.ndarray(shape, dtype=dtype, buffer=buf, offset=offset)
+        offset += arrays[name].nbytes
+    return arrays
+
+
+def _segment_size(slots, slot_size):
+    return slots * slot_size * (SNAPLEN + 4 + 8 + 1 + PACKET_DTYPE.itemsize)
+
+
+def _run_shard(index, generation, segment, slots, slot_size, tasks, done, minmax_scaler, standard_scaler,
+               options):
+    """Worker process: score the slots named on ``tasks`` until it receives None
+
+    ``generation`` counts restarts of shard ``index`` and tags every
+    result, so results from a worker that has been replaced are ignored.
+    """
+    # Spawned workers share the parent's resource tracker, which already holds the segment
+    shm = shared_memory.SharedMemory(name=segment)
+    arrays = _slot_arrays(shm.buf, slots, slot_size)
+    flow_table = FlowTable(max_flows=options['max_flows'])
+    # Each worker follows the model registry on its own, so a replaced model file is picked up live
+    stages = [('meta model', RegistryScorer(minmax_scaler, standard_scaler))]
+    if options['second_stage_path']:
+        stages.append(('second stage', RegistryScorer(minmax_scaler, standard_scaler,
+                                                      path=options['second_stage_path'])))
+    score = CascadeScorer(stages, band=options['band'])
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        slot, count, linktype = task
+        started = time.perf_counter()
+        try:
+            lengths = arrays['lengths'][slot, :count]
+            timestamps = arrays['ts'][slot, :count]
+            if linktype == LINKTYPE_ETHERNET:
+                headers = decode_snaps(arrays['frames'][slot, :count], lengths, timestamps)
+            else:
+                frames = [row[:length].tobytes()
+                          for row, length in zip(arrays['frames'][slot, :count], np.minimum(lengths, SNAPLEN))]
+                headers = decode_frames(frames, timestamps, linktype)
+                headers['size'] = lengths
+            ip = headers['ip_version'] != 0
+            headers = headers[ip]
+            if len(headers):
+                scores = score(process_packets(headers, flow_table=flow_table))
+                arrays['records'][slot, :len(headers)] = packet_records(
+                    headers, scores, arrays['iface'][slot, :count][ip])
+            done.put((index, generation, slot, len(headers), time.perf_counter() - started, None))
+        except Exception as e:
+            done.put((index, generation, slot, 0, time.perf_counter() - started, str(e)))
+
+    del arrays
+    shm.close()
+
+
+class ShardedPipeline:
+    """Decode, flow tracking and scoring spread over worker processes.
+
+    ``submit`` splits a batch of raw frames by ``flow_shards`` and copies
+    each share into a free slot of its worker's shared memory segment;
+    with ``block`` it waits for a slot, otherwise the frames are counted
+    as dropped. Scored packets are appended to ``packet_history`` and
+    those above ``threshold`` to ``threat_history`` and passed to
+    ``on_alerts``, in the order workers finish their slots. A worker that
+    dies is restarted the next time its slots are waited on, and the
+    slots it held are reclaimed; the frames in them are lost.
+    """
+
+    def __init__(self, minmax_scaler, standard_scaler, workers=None, threshold=0.8,
+                 slots=8, slot_size=4096, max_flows=262144, second_stage_path=None,
+                 band=(0.5, 0.95), packet_history=None, threat_history=None, on_alerts=None):
+        self.workers = workers or os.cpu_count()
+        self.threshold = threshold
+        self.slots = slots
+        self.slot_size = slot_size
+        self.packet_history = packet_history if packet_history is not None else RingBuffer(PACKET_DTYPE, 65536)
+        self.threat_history = threat_history if threat_history is not None else RingBuffer(PACKET_DTYPE, 16384)
+        self.on_alerts = on_alerts
+        self._init_args = (minmax_scaler, standard_scaler, {
+            'max_flows': max_flows,
+            'second_stage_path': second_stage_path,
+            'band': band,
+        })
+
+        self._segments = []
+        self._arrays = []
+        self._tasks = []
+        self._processes = []
+        self._generations = [0] * self.workers
+        self._context = None
+        self._free = []
+        self._slot_free = threading.Condition()
+        self._done = None
+        self._collector = None
+        self._running = False
+
+        self.dispatched = 0
+        self.dropped = 0
+        self.inspected = 0
+        self.threats = 0
+        self.score_counts = np.zeros(SCORE_BINS + 1, dtype=np.int64)
+        self._worker_latency = stage_histogram('worker')
+        self._inspected_total = packets_inspected()
+        self._threats_total = threats_detected()
+        self.errors = 0
+        self.last_error = None
+        self._per_worker = [{'pid': None, 'packets': 0, 'batches': 0, 'busy_seconds': 0.0, 'restarts': 0}
+                            for _ in range(self.workers)]
+
+    def start(self):
+        """Create the shared memory segments and start the workers and collector"""
+        if self._running:
+            return self
+        # Spawn rather than fork: the dashboard and daemon run threads that must not be copied mid-flight
+        self._context = multiprocessing.get_context('spawn')
+        self._done = self._context.SimpleQueue()
+        size = _segment_size(self.slots, self.slot_size)
+        for index in range(self.workers):
+            shm = shared_memory.SharedMemory(create=True, size=size)
+            self._segments.append(shm)
+            self._arrays.append(_slot_arrays(shm.buf, self.slots, self.slot_size))
+            self._tasks.append(self._context.SimpleQueue())
+            self._processes.append(self._start_worker(index))
+            self._free.append(deque(range(self.slots)))
+        self._running = True
+        self._collector = threading.Thread(target=self._collect, name="shard-collector", daemon=True)
+        self._collector.start()
+        return self
+
+    def _start_worker(self, index):
+        process = self._context.Process(
+            target=_run_shard, name=f"nids-shard-{index}", daemon=True,
+            args=(index, self._generations[index], self._segments[index].name, self.slots, self.slot_size,
+                  self._tasks[index], self._done) + self._init_args
+        )
+        process.start()
+        self._per_worker[index]['pid'] = process.pid
+        return process
+
+    def _restart_dead_workers(self):
+        """Restart workers that exited and reclaim their slots; call with ``_slot_free`` held"""
+        for index, process in enumerate(self._processes):
+            if not self._running or process.is_alive():
+                continue
+            free = self._free[index]
+            self.errors += 1
+            self.last_error = (f"shard {index} (pid {process.pid}) exited with code {process.exitcode}; "
+                               f"restarted, frames in {self.slots - len(free)} slot(s) lost")
+            # Tasks still queued for the dead worker name slots that are reclaimed below
+            self._generations[index] += 1
+            self._tasks[index] = self._context.SimpleQueue()
+            self._processes[index] = self._start_worker(index)
+            self._per_worker[index]['restarts'] += 1
+            free.clear()
+            free.extend(range(self.slots))
+            self._slot_free.notify_all()
+
+    def submit(self, frames, timestamps, linktype=LINKTYPE_ETHERNET, block=True, ifaces=None):
+        """Dispatch raw frames to the workers; returns how many were dispatched
+
+        ``ifaces`` tags each frame with the index of its capture interface.
+        """
+        n = len(frames)
+        if not n or not self._running:
+            return 0
+        buf = snap_matrix(frames)
+        lengths = np.fromiter(map(len, frames), dtype=np.int64, count=n)
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        ifaces = np.zeros(n, dtype=np.uint8) if ifaces is None else np.asarray(ifaces, dtype=np.uint8)
+        shards = flow_shards(buf, linktype, self.workers)
+        order = np.argsort(shards, kind='stable')
+        bounds = np.searchsorted(shards[order], np.arange(self.workers + 1))
+
+        dispatched = 0
+        for index in range(self.workers):
+            rows = order[bounds[index]:bounds[index + 1]]
+            for start in range(0, len(rows), self.slot_size):
+                chunk = rows[start:start + self.slot_size]
+                slot = self._take_slot(index, block)
+                if slot is None:
+                    self.dropped += len(chunk)
+                    continue
+                arrays = self._arrays[index]
+                count = len(chunk)
+                arrays['frames'][slot, :count] = buf[chunk]
+                arrays['lengths'][slot, :count] = lengths[chunk]
+                arrays['ts'][slot, :count] = timestamps[chunk]
+                arrays['iface'][slot, :count] = ifaces[chunk]
+                self._tasks[index].put((slot, count, linktype))
+                dispatched += count
+        self.dispatched += dispatched
+        return dispatched
+
+    def _take_slot(self, index, block):
+        with self._slot_free:
+            free = self._free[index]
+            while not free:
+                if not self._running:
+                    return None
+                # A dead worker never hands its slots back
+                self._restart_dead_workers()
+                if free:
+                    break
+                if not block:
+                    return None
+                self._slot_free.wait(0.1)
+            return free.popleft()
+
+    def _collect(self):
+        while True:
+            message = self._done.get()
+            if message is None:
+                return
+            index, generation, slot, count, seconds, error = message
+            if generation != self._generations[index]:
+                # From a worker that has been replaced; its slots were reclaimed
+                continue
+            if error is not None:
+                self.errors += 1
+                self.last_error = error
+            elif count:
+                # Both copy out of the slot before it is handed back
+                records = self._arrays[index]['records'][slot, :count]
+                self.packet_history.extend(records)
+                self.score_counts += score_histogram(records['score'])
+                threats = records[records['score'] > self.threshold]
+                if len(threats):
+                    self.threat_history.extend(threats)
+                    self.threats += len(threats)
+                    self._threats_total.inc(len(threats))
+                    if self.on_alerts is not None:
+                        self.on_alerts(threats)
+            self.inspected += count
+            self._inspected_total.inc(count)
+            worker = self._per_worker[index]
+            worker['packets'] += count
+            worker['batches'] += 1
+            worker['busy_seconds'] += seconds
+            self._worker_latency.record(seconds)
+            with self._slot_free:
+                if generation == self._generations[index]:
+                    self._free[index].append(slot)
+                self._slot_free.notify_all()
+
+    def in_flight(self):
+        """Slots handed to workers and not yet collected"""
+        with self._slot_free:
+            return sum(self.slots - len(free) for free in self._free)
+
+    def flush(self, timeout=None):
+        """Wait until every dispatched slot has been scored and collected; returns False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._slot_free:
+            while any(len(free) < self.slots for free in self._free):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._slot_free.wait(min(remaining, 0.1) if remaining is not None else 0.1)
+                self._restart_dead_workers()
+        return True
+
+    def stop(self, timeout=5.0):
+        """Finish in-flight slots, stop the workers and release the shared memory"""
+        if not self._running:
+            return
+        self.flush(timeout)
+        self._running = False
+        for tasks in self._tasks:
+            tasks.put(None)
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self._done.put(None)
+        self._collector.join(timeout)
+
+        self._arrays.clear()
+        for shm in self._segments:
+            shm.close()
+            shm.unlink()
+        self._segments.clear()
+        self._tasks.clear()
+        self._processes.clear()
+        self._free.clear()
+
+    def stats(self):
+        """Return dispatch, scoring and per-worker counters"""
+        return {
+            'workers': self.workers,
+            'dispatched': self.dispatched,
+            'dropped': self.dropped,
+            'inspected': self.inspected,
+            'threats': self.threats,
+            'in_flight': self.in_flight(),
+            'errors': self.errors,
+            'last_error': self.last_error,
+            'per_worker': [
+                dict(worker, packets_per_sec=worker['packets'] / max(worker['busy_seconds'], 1e-9))
+                for worker in self._per_worker
+            ],
+        }
@@ -0,0 +1,232 @@
+"""Shared memory segment through which the detector daemon publishes to viewers.
+
+Layout: a fixed ``STATUS_DTYPE`` header padded to 64 bytes, then the
+packet ring and the threat ring exactly as ``RingBuffer`` lays them out.
+"""
+import os
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+import psutil
+
+from src.ring_buffer import PACKET_DTYPE, RingBuffer
+
+DEFAULT_SEGMENT = 'nids_detector'
+MAGIC = 0x4E49445344455431  # "NIDSDET1"
+LAYOUT_VERSION = 2
+MAX_STAGES = 4
+MAX_INTERFACES = 8
+
+# Counters published by the detector daemon, followed in the segment by the packet and threat rings
+STATUS_DTYPE = np.dtype([
+    ('magic', '<u8'),
+    ('version', '<u4'),
+    ('pid', '<u4'),
+    ('packet_capacity', '<u8'),
+    ('threat_capacity', '<u8'),
+    ('started_ns', '<i8'),
+    ('heartbeat_ns', '<i8'),
+    ('running', 'u1'),
+    ('captured', '<u8'),
+    ('inspected', '<u8'),
+    ('threats', '<u8'),
+    ('depth', '<u8'),
+    ('capacity', '<u8'),
+    ('dropped_newest', '<u8'),
+    ('dropped_oldest', '<u8'),
+    ('sampled_out', '<u8'),
+    ('sample_rate', '<u4'),
+    ('batches', '<u8'),
+    ('errors', '<u8'),
+    ('failed', '<u8'),
+    ('mean_batch_size', '<f8'),
+    ('latency_p50_ms', '<f8'),
+    ('latency_p99_ms', '<f8'),
+    ('escalation_fraction', '<f8'),
+    ('threshold', '<f8'),
+    ('stage_count', 'u1'),
+    ('stage_name', 'S32', (MAX_STAGES,)),
+    ('stage_p50_ms', '<f8', (MAX_STAGES,)),
+    ('stage_p99_ms', '<f8', (MAX_STAGES,)),
+    ('interface', 'S256'),
+    ('iface_count', 'u1'),
+    ('iface_name', 'S32', (MAX_INTERFACES,)),
+    ('iface_packets', '<u8', (MAX_INTERFACES,)),
+    ('iface_bytes', '<u8', (MAX_INTERFACES,)),
+    ('iface_dropped', '<u8', (MAX_INTERFACES,)),
+    ('capture_filter', 'S512'),
+    ('last_error', 'S256'),
+])
+# Start the rings on a cache line boundary
+STATUS_SIZE = -(-STATUS_DTYPE.itemsize // 64) * 64
+
+COUNTERS = ('captured', 'inspected', 'threats', 'depth', 'capacity', 'dropped_newest',
+            'dropped_oldest', 'sampled_out', 'sample_rate', 'batches', 'errors', 'failed', 'mean_batch_size',
+            'latency_p50_ms', 'latency_p99_ms', 'escalation_fraction', 'threshold')
+
+
+class DetectorUnavailable(Exception):
+    """Raised when no live detector daemon publishes under the requested name"""
+
+
+def open_segment(name):
+    """Open an existing segment without letting this process's resource tracker unlink it on exit"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 registers attached segments too
+        shm = shared_memory.SharedMemory(name=name)
+        if os.name == 'posix':
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+class SharedDetectorState:
+    """Detector status and history rings in one named shared memory segment.
+
+    The daemon creates the segment and is its only writer: the rings are
+    written in place by its scoring thread and the counters are refreshed
+    by ``publish``. Viewers ``attach`` and read the same memory, so a
+    dashboard refresh copies only the rows it displays.
+    """
+
+    def __init__(self, shm, owner):
+        self._shm = shm
+        self.owner = owner
+        self.name = shm.name
+        self._status = np.ndarray(1, dtype=STATUS_DTYPE, buffer=shm.buf)
+        status = self._status[0]
+        if status['magic'] != MAGIC or status['version'] != LAYOUT_VERSION:
+            raise DetectorUnavailable(f"shared memory '{shm.name}' is not a detector segment")
+
+        packet_capacity = int(status['packet_capacity'])
+        threat_capacity = int(status['threat_capacity'])
+        packet_size = RingBuffer.buffer_size(PACKET_DTYPE, packet_capacity)
+        threat_size = RingBuffer.buffer_size(PACKET_DTYPE, threat_capacity)
+        self.packet_history = RingBuffer(PACKET_DTYPE, packet_capacity,
+                                         buffer=shm.buf[STATUS_SIZE:STATUS_SIZE + packet_size])
+        self.threat_history = RingBuffer(PACKET_DTYPE, threat_capacity,
+                                         buffer=shm.buf[STATUS_SIZE + packet_size:
+                                                        STATUS_SIZE + packet_size + threat_size])
+
+    @staticmethod
+    def segment_size(packet_capacity, threat_capacity):
+        return (STATUS_SIZE + RingBuffer.buffer_size(PACKET_DTYPE, packet_capacity)
+                + RingBuffer.buffer_size(PACKET_DTYPE, threat_capacity))
+
+    @classmethod
+    def create(cls, name=DEFAULT_SEGMENT, packet_capacity=262144, threat_capacity=65536):
+        """Create the segment for a new daemon, replacing one left behind by a dead daemon"""
+        size = cls.segment_size(packet_capacity, threat_capacity)
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            try:
+                existing = cls.attach(name)
+            except DetectorUnavailable:
+                existing = None
+            if existing is not None:
+                alive = existing.alive()
+                existing.close()
+                if alive:
+                    raise
+            stale = open_segment(name)
+            stale.close()
+            stale.unlink()
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+        status = np.ndarray(1, dtype=STATUS_DTYPE, buffer=shm.buf)
+        status[0] = np.zeros((), dtype=STATUS_DTYPE)
+        status['packet_capacity'] = packet_capacity
+        status['threat_capacity'] = threat_capacity
+        status['pid'] = os.getpid()
+        status['started_ns'] = status['heartbeat_ns'] = time.time_ns()
+        status['version'] = LAYOUT_VERSION
+        status['magic'] = MAGIC
+        del status
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name=DEFAULT_SEGMENT):
+        """Attach to a running daemon's segment read-only"""
+        try:
+            shm = open_segment(name)
+        except FileNotFoundError:
+            raise DetectorUnavailable(f"no detector is publishing to '{name}'")
+        try:
+            return cls(shm, owner=False)
+        except Exception:
+            shm.close()
+            raise
+
+    def publish(self, stats):
+        """Write the detector's latest ``Detector.stats()`` into the segment"""
+        status = self._status
+        for name in COUNTERS:
+            status[name] = stats[name] or 0
+        stages = stats['stages'][:MAX_STAGES]
+        status['stage_count'] = len(stages)
+        for i, stage in enumerate(stages):
+            status['stage_name'][0, i] = stage['name'].encode()[:32]
+            status['stage_p50_ms'][0, i] = stage['latency_p50_ms']
+            status['stage_p99_ms'][0, i] = stage['latency_p99_ms']
+        interfaces = stats['interfaces'][:MAX_INTERFACES]
+        status['iface_count'] = len(interfaces)
+        for i, interface in enumerate(interfaces):
+            status['iface_name'][0, i] = interface['name'].encode()[:32]
+            status['iface_packets'][0, i] = interface['packets']
+            status['iface_bytes'][0, i] = interface['bytes']
+            status['iface_dropped'][0, i] = interface['dropped']
+        status['interface'] = (stats['interface'] or '').encode()[:256]
+        status['capture_filter'] = (stats['capture_filter'] or '').encode()[:512]
+        status['last_error'] = (stats['last_error'] or '').encode()[:256]
+        status['running'] = bool(stats['running'])
+        status['heartbeat_ns'] = time.time_ns()
+
+    def read_status(self):
+        """Return the published counters in the same shape as ``Detector.stats()``"""
+        status = self._status[0].copy()
+        stats = {name: status[name].item() for name in COUNTERS}
+        stats['not_inspected'] = (stats['dropped_newest'] + stats['dropped_oldest'] + stats['sampled_out']
+                                  + stats['failed'])
+        stats['stages'] = [
+            {'name': status['stage_name'][i].decode(),
+             'latency_p50_ms': float(status['stage_p50_ms'][i]),
+             'latency_p99_ms': float(status['stage_p99_ms'][i])}
+            for i in range(status['stage_count'])
+        ]
+        stats['interfaces'] = [
+            {'name': status['iface_name'][i].decode(),
+             'packets': int(status['iface_packets'][i]),
+             'bytes': int(status['iface_bytes'][i]),
+             'dropped': int(status['iface_dropped'][i])}
+            for i in range(status['iface_count'])
+        ]
+        stats.update(
+            pid=int(status['pid']),
+            running=bool(status['running']),
+            started_at=status['started_ns'] / 1e9,
+            heartbeat_age=(time.time_ns() - int(status['heartbeat_ns'])) / 1e9,
+            interface=status['interface'].decode(),
+            capture_filter=status['capture_filter'].decode() or None,
+            last_error=status['last_error'].decode() or None,
+        )
+        return stats
+
+    def alive(self, max_age=5.0):
+        """Whether the publishing daemon still exists and has published recently"""
+        status = self._status[0]
+        age = (time.time_ns() - int(status['heartbeat_ns'])) / 1e9
+        return age <= max_age and psutil.pid_exists(int(status['pid']))
+
+    def close(self):
+        # Drop our views first; the segment cannot be closed while they are alive
+        self._status = None
+        self.packet_history = self.threat_history = None
+        self._shm.close()
+
+    def unlink(self):
+        """Remove the segment; only the creating daemon should call this"""
+        if self.owner:
+            self._shm.unlink()
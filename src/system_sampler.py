@@ -0,0 +1,225 @@
+"""Background sampling of host and process resource usage at a fixed interval.
+
+A single daemon thread per process records host CPU, memory and disk
+usage, per-NIC counters and the NIDS process's own CPU, RSS and
+per-thread CPU time into fixed-size ``RingBuffer``s, so pages read
+evenly spaced history instantly instead of calling psutil on every
+render. Counters are stored cumulative; ``counter_rates`` turns a window
+of them into per-second rates.
+"""
+import threading
+import time
+
+import numpy as np
+import psutil
+
+from src.metrics import packets_inspected
+from src.ring_buffer import RingBuffer
+from src.shared_state import DetectorUnavailable, SharedDetectorState
+
+HOST_DTYPE = np.dtype([
+    ('ts', 'f8'),
+    ('cpu_percent', 'f4'),
+    ('memory_percent', 'f4'),
+    ('memory_used', 'u8'),
+    ('disk_percent', 'f4'),
+    ('disk_read_bytes', 'u8'),
+    ('disk_write_bytes', 'u8'),
+    # This process; CPU percent is of one core, as psutil reports it
+    ('process_cpu_percent', 'f4'),
+    ('process_rss', 'u8'),
+    ('process_threads', 'u2'),
+    # Cumulative packets inspected by detectors in this process and by the detector daemon
+    ('inspected', 'u8'),
+    ('daemon_inspected', 'u8'),
+])
+
+NIC_DTYPE = np.dtype([
+    ('ts', 'f8'),
+    ('bytes_recv', 'u8'),
+    ('bytes_sent', 'u8'),
+    ('packets_recv', 'u8'),
+    ('packets_sent', 'u8'),
+    ('dropin', 'u8'),
+    ('dropout', 'u8'),
+    ('errin', 'u8'),
+    ('errout', 'u8'),
+])
+
+# Seconds between attempts to attach to a detector daemon that is not running
+DAEMON_RETRY = 10.0
+
+
+def counter_rates(records, fields):
+    """Per-second rates of cumulative ``fields`` between consecutive records
+
+    Returns ``(timestamps, {field: rates})`` with one entry fewer than
+    ``records``; counter resets give a rate of 0 rather than a negative one.
+    """
+    if len(records) < 2:
+        return np.zeros(0), {field: np.zeros(0) for field in fields}
+    dt = np.diff(records['ts'])
+    dt[dt <= 0] = np.nan
+    rates = {}
+    for field in fields:
+        delta = np.diff(records[field].astype(np.float64))
+        rates[field] = np.nan_to_num(np.maximum(delta, 0) / dt)
+    return records['ts'][1:], rates
+
+
+class SystemSampler:
+    """Samples resource usage every ``interval`` seconds into rings of ``capacity`` samples.
+
+    ``host`` holds host and process samples and ``nics`` one ring per
+    network interface. ``threads`` is the latest per-thread CPU usage of
+    this process, as a list of dicts sorted by CPU. Only the sampling
+    thread writes; readers use ``RingBuffer.snapshot``.
+    """
+
+    def __init__(self, interval=1.0, capacity=3600, disk_path='/'):
+        self.interval = interval
+        self.capacity = capacity
+        self.disk_path = disk_path
+        self.host = RingBuffer(HOST_DTYPE, capacity)
+        self.nics = {}
+        self.threads = []
+        self.errors = 0
+        self.last_error = None
+
+        self._process = psutil.Process()
+        self._thread_times = {}
+        self._last_sample = None
+        self._inspected = packets_inspected()
+        self._daemon = None
+        self._daemon_retry_at = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start the sampling thread if it is not running"""
+        with self._lock:
+            if self.running:
+                return self
+            # The first cpu_percent calls only set the reference point
+            psutil.cpu_percent(interval=None)
+            self._process.cpu_percent(interval=None)
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="system-sampler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._daemon is not None:
+            self._daemon.close()
+            self._daemon = None
+
+    def _run(self):
+        next_at = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                self.sample()
+            except Exception as e:
+                self.errors += 1
+                self.last_error = str(e)
+            # Fixed spacing: schedule from the previous deadline, not from when sampling finished
+            next_at += self.interval
+            delay = next_at - time.monotonic()
+            if delay < 0:
+                next_at = time.monotonic()
+                delay = 0
+            self._stop.wait(delay)
+
+    def sample(self):
+        """Take one sample of every source"""
+        now = time.time()
+        memory = psutil.virtual_memory()
+        disk_io = psutil.disk_io_counters()
+        with self._process.oneshot():
+            process_cpu = self._process.cpu_percent(interval=None)
+            rss = self._process.memory_info().rss
+            threads = self._process.threads()
+
+        record = np.zeros((), dtype=HOST_DTYPE)
+        record['ts'] = now
+        record['cpu_percent'] = psutil.cpu_percent(interval=None)
+        record['memory_percent'] = memory.percent
+        record['memory_used'] = memory.used
+        record['disk_percent'] = psutil.disk_usage(self.disk_path).percent
+        if disk_io is not None:
+            record['disk_read_bytes'] = disk_io.read_bytes
+            record['disk_write_bytes'] = disk_io.write_bytes
+        record['process_cpu_percent'] = process_cpu
+        record['process_rss'] = rss
+        record['process_threads'] = len(threads)
+        record['inspected'] = self._inspected.value
+        record['daemon_inspected'] = self._daemon_inspected(now)
+        self.host.append(record)
+
+        for name, counters in psutil.net_io_counters(pernic=True).items():
+            ring = self.nics.get(name)
+            if ring is None:
+                ring = self.nics[name] = RingBuffer(NIC_DTYPE, self.capacity)
+            ring.append((now,) + tuple(getattr(counters, field) for field in NIC_DTYPE.names[1:]))
+
+        self._sample_threads(now, threads)
+        self._last_sample = now
+
+    def _sample_threads(self, now, threads):
+        names = {thread.native_id: thread.name for thread in threading.enumerate()}
+        elapsed = now - self._last_sample if self._last_sample else None
+        times = {}
+        usage = []
+        for thread in threads:
+            cpu = thread.user_time + thread.system_time
+            times[thread.id] = cpu
+            previous = self._thread_times.get(thread.id)
+            usage.append({
+                'name': names.get(thread.id, f"native {thread.id}"),
+                'id': thread.id,
+                'cpu_percent': (cpu - previous) / elapsed * 100 if elapsed and previous is not None else 0.0,
+                'cpu_seconds': cpu,
+            })
+        self._thread_times = times
+        self.threads = sorted(usage, key=lambda thread: thread['cpu_percent'], reverse=True)
+
+    def _daemon_inspected(self, now):
+        """Packets inspected by the detector daemon, or 0 when none is running"""
+        if self._daemon is None:
+            if now < self._daemon_retry_at:
+                return 0
+            try:
+                self._daemon = SharedDetectorState.attach()
+            except DetectorUnavailable:
+                self._daemon_retry_at = now + DAEMON_RETRY
+                return 0
+        if not self._daemon.alive():
+            self._daemon.close()
+            self._daemon = None
+            self._daemon_retry_at = now + DAEMON_RETRY
+            return 0
+        return self._daemon.read_status()['inspected']
+
+    def history(self, n=None):
+        """Copy of the last ``n`` host samples, oldest first"""
+        return self.host.snapshot(n)
+
+    def nic_history(self, name, n=None):
+        """Copy of the last ``n`` samples of one interface, oldest first"""
+        ring = self.nics.get(name)
+        return ring.snapshot(n) if ring is not None else np.zeros(0, dtype=NIC_DTYPE)
+
+
+_sampler = SystemSampler()
+
+def get_sampler():
+    """Return the process-wide sampler, starting it on first use"""
+    return _sampler.start()
@@ -0,0 +1,87 @@
+import threading
+
+import numpy as np
+import torch
+
+JIT_MODES = (None, 'trace', 'script')
+
+
+def quantize_linear(model):
+    """Return a copy of ``model`` with its Linear layers dynamically quantized to int8"""
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+class TorchScorer:
+    """Batched CPU inference for a torch model that outputs logits.
+
+    Rows are copied into a preallocated float32 input tensor and run
+    under ``torch.inference_mode`` in chunks of at most ``max_batch``, so
+    steady-state scoring allocates no input tensors. The model can be
+    dynamically quantized (``quantize=True``, int8 Linear layers) and
+    compiled with TorchScript (``jit='trace'`` or ``'script'``). Buffers
+    and the compiled graph are set up on the first call, once the feature
+    count is known. Scores follow ``predict_scores``: one logit per row
+    goes through a sigmoid, two go through a softmax.
+
+    ``num_threads`` sets torch's intra-op thread count, which is
+    process-wide; leave it None to keep the current setting.
+    """
+
+    def __init__(self, model, max_batch=4096, num_threads=None, jit=None, quantize=False):
+        if jit not in JIT_MODES:
+            raise ValueError(f"jit must be one of {JIT_MODES}")
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        model.eval()
+        self.model = quantize_linear(model) if quantize else model
+        self.max_batch = max_batch
+        self.jit = jit
+        self.quantized = quantize
+
+        self._input = None
+        self._output = np.empty(0, dtype=np.float32)
+        self._lock = threading.Lock()
+
+    def _prepare(self, n_features):
+        self._input = torch.empty((self.max_batch, n_features), dtype=torch.float32)
+        if self.jit is None:
+            return
+        try:
+            with torch.inference_mode():
+                if self.jit == 'trace':
+                    compiled = torch.jit.trace(self.model, self._input[:1].zero_())
+                else:
+                    compiled = torch.jit.script(self.model)
+                self.model = torch.jit.freeze(compiled.eval())
+        except Exception as e:
+            # Data-dependent control flow and similar cannot be compiled; stay in eager mode
+            print(f"Cannot {self.jit} model, using eager mode: {str(e)}")
+            self.jit = None
+
+    def _forward(self, rows):
+        logits = self.model(rows).float()
+        if logits.ndim == 2 and logits.shape[1] == 2:
+            return torch.softmax(logits, dim=1)[:, 1]
+        return torch.sigmoid(logits.reshape(-1))
+
+    def scores(self, X):
+        """Return the positive-class probability for each row of ``X``"""
+        X = np.asarray(X)
+        n = len(X)
+        with self._lock:
+            if self._input is None or self._input.shape[1] != X.shape[1]:
+                self._prepare(X.shape[1])
+            if len(self._output) < n:
+                self._output = np.empty(n, dtype=np.float32)
+            output = torch.from_numpy(self._output)
+
+            with torch.inference_mode():
+                for start in range(0, n, self.max_batch):
+                    stop = min(start + self.max_batch, n)
+                    rows = self._input[:stop - start]
+                    rows.copy_(torch.from_numpy(X[start:stop]))
+                    output[start:stop] = self._forward(rows)
+            return self._output[:n].copy()
+
+    def __call__(self, X):
+        return self.scores(X)
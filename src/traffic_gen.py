@@ -0,0 +1,281 @@
+"""Vectorized synthetic traffic with labelled attack profiles.
+
+``TrafficGenerator.batch(n)`` returns ``n`` decoded packet headers (see
+``src.decoder.HEADER_DTYPE``) and a label per packet in one call, so the
+output feeds ``process_packets``, the flow table and the scorers exactly
+like captured traffic. Labels index ``LABELS``: 0 is benign, the rest
+name the attack profile that produced the packet. ``encode_frames``
+turns headers back into raw Ethernet frames for the capture pipeline,
+and ``write_pcap`` saves them as a capture file for replay.
+"""
+import struct
+
+import numpy as np
+
+from src.decoder import HEADER_DTYPE, IPV4_MAPPED, LINKTYPE_ETHERNET, PROTO_ICMP, PROTO_TCP, PROTO_UDP
+from src.pcap_reader import PCAP_MAGIC_USEC
+
+BENIGN = 'benign'
+SYN_FLOOD = 'syn_flood'
+PORT_SCAN = 'port_scan'
+UDP_AMPLIFICATION = 'udp_amplification'
+SLOW_EXFILTRATION = 'slow_exfiltration'
+ATTACK_PROFILES = (SYN_FLOOD, PORT_SCAN, UDP_AMPLIFICATION, SLOW_EXFILTRATION)
+LABELS = (BENIGN,) + ATTACK_PROFILES
+
+TCP_SYN = 0x02
+TCP_ACK = 0x10
+TCP_PSH_ACK = 0x18
+
+# Benign traffic: protocol mix, server ports with their weights and IP packet sizes
+BENIGN_MIX = {
+    'protocols': {PROTO_TCP: 0.8, PROTO_UDP: 0.18, PROTO_ICMP: 0.02},
+    'tcp_ports': {443: 0.6, 80: 0.2, 22: 0.05, 993: 0.05, 8080: 0.1},
+    'udp_ports': {53: 0.7, 123: 0.1, 443: 0.2},
+    # Log-normal IP length, clipped to 40..1500
+    'size_median': 400,
+    'size_sigma': 1.2,
+    'clients': 4096,
+    'servers': 254,
+    # Concurrent conversations and their mean length in packets
+    'conversations': 2048,
+    'conversation_packets': 40,
+}
+
+# Relative share of each attack within the attack fraction; slow exfiltration
+# is slow by nature, so it contributes few packets
+ATTACK_WEIGHTS = {SYN_FLOOD: 0.45, PORT_SCAN: 0.25, UDP_AMPLIFICATION: 0.25, SLOW_EXFILTRATION: 0.05}
+
+_CLIENT_NET = 0x0A000000   # 10.0.0.0/16
+_SERVER_NET = 0xC6336400   # 198.51.100.0/24
+_VICTIM = 0x0A00FF0A       # 10.0.255.10
+_SCANNER = 0xCB00710D      # 203.0.113.13
+_EXFIL_HOST = 0x0A000042   # 10.0.0.66
+_EXFIL_SINK = 0xCB007163   # 203.0.113.99
+_REFLECTOR_PORTS = np.array([53, 123, 1900, 11211], dtype=np.uint16)
+
+# A benign conversation between a client's ephemeral port and a server's service port
+_CONVERSATION_DTYPE = np.dtype([
+    ('client', 'u8'),
+    ('server', 'u8'),
+    ('ephemeral', 'u2'),
+    ('port', 'u2'),
+    ('protocol', 'u1'),
+    ('ttl', 'u1'),
+])
+
+
+class TrafficGenerator:
+    """Endless labelled packet stream at a nominal ``rate`` in packets per second.
+
+    A fraction ``attack_fraction`` of every batch comes from the
+    ``attacks`` profiles, split by ``ATTACK_WEIGHTS``; the rest follows
+    ``benign``. Timestamps advance by ``n / rate`` per batch and rows are
+    in time order. The same ``seed`` gives the same stream.
+    """
+
+    def __init__(self, rate=10000.0, attack_fraction=0.05, attacks=ATTACK_PROFILES,
+                 benign=None, seed=None, start=0.0):
+        unknown = set(attacks) - set(ATTACK_PROFILES)
+        if unknown:
+            raise ValueError(f"unknown attack profiles: {sorted(unknown)}")
+        self.rate = rate
+        self.attack_fraction = attack_fraction if attacks else 0.0
+        self.attacks = tuple(attacks)
+        self.benign = {**BENIGN_MIX, **(benign or {})}
+        self.clock = start
+        self.generated = 0
+        self._rng = np.random.default_rng(seed)
+        # Port scans walk the port range across batches
+        self._next_scan_port = 1
+        # Benign packets belong to a pool of open conversations that persists across batches
+        self._conversations = self._new_conversations(self.benign['conversations'])
+
+        weights = np.array([ATTACK_WEIGHTS[name] for name in self.attacks], dtype=float)
+        self._attack_weights = weights / weights.sum() if len(weights) else weights
+
+    def batch(self, n):
+        """Return ``(headers, labels)`` for the next ``n`` packets"""
+        rng = self._rng
+        headers = np.zeros(n, dtype=HEADER_DTYPE)
+        labels = np.zeros(n, dtype=np.uint8)
+
+        attack_rows = rng.random(n) < self.attack_fraction
+        benign_rows = np.flatnonzero(~attack_rows)
+        self._benign(headers, benign_rows)
+        if attack_rows.any():
+            choice = rng.choice(len(self.attacks), size=int(attack_rows.sum()), p=self._attack_weights)
+            attack_rows = np.flatnonzero(attack_rows)
+            for index, name in enumerate(self.attacks):
+                rows = attack_rows[choice == index]
+                if len(rows):
+                    getattr(self, f'_{name}')(headers, rows)
+                    labels[rows] = LABELS.index(name)
+
+        span = n / self.rate
+        headers['ts'] = self.clock + np.sort(rng.random(n)) * span
+        self.clock += span
+        headers['ip_version'] = 4
+        headers['src_lo'] |= IPV4_MAPPED
+        headers['dst_lo'] |= IPV4_MAPPED
+        headers['size'] = headers['ip_len'] + 14
+        self.generated += n
+        return headers, labels
+
+    def _new_conversations(self, count):
+        rng, mix = self._rng, self.benign
+        conversations = np.zeros(count, dtype=_CONVERSATION_DTYPE)
+        protocols = _weighted(rng, mix['protocols'], count, np.uint8)
+        tcp = protocols == PROTO_TCP
+        udp = protocols == PROTO_UDP
+        conversations['protocol'] = protocols
+        conversations['port'][tcp] = _weighted(rng, mix['tcp_ports'], int(tcp.sum()), np.uint16)
+        conversations['port'][udp] = _weighted(rng, mix['udp_ports'], int(udp.sum()), np.uint16)
+        conversations['ephemeral'] = np.where(tcp | udp, rng.integers(32768, 61000, count, dtype=np.uint16), 0)
+        conversations['client'] = _CLIENT_NET + rng.integers(1, mix['clients'] + 1, count, dtype=np.uint64)
+        conversations['server'] = _SERVER_NET + rng.integers(1, mix['servers'] + 1, count, dtype=np.uint64)
+        conversations['ttl'] = rng.choice(np.array([64, 128], dtype=np.uint8), count)
+        return conversations
+
+    def _benign(self, headers, rows):
+        rng, mix = self._rng, self.benign
+        n = len(rows)
+        pool = self._conversations
+        # Conversations close after conversation_packets packets on average and new ones open
+        closed = rng.random(len(pool)) < min(1.0, n / len(pool) / mix['conversation_packets'])
+        pool[closed] = self._new_conversations(int(closed.sum()))
+
+        conversations = pool[rng.integers(0, len(pool), n)]
+        tcp = conversations['protocol'] == PROTO_TCP
+        sizes = rng.lognormal(np.log(mix['size_median']), mix['size_sigma'], n)
+        # Half the packets are replies, so flows see both directions
+        reply = rng.random(n) < 0.5
+        block = headers[rows]
+        block['protocol'] = conversations['protocol']
+        block['ip_len'] = np.clip(sizes, 40, 1500)
+        block['ttl'] = np.where(reply, 52, conversations['ttl'])
+        block['src_lo'] = np.where(reply, conversations['server'], conversations['client'])
+        block['dst_lo'] = np.where(reply, conversations['client'], conversations['server'])
+        block['sport'] = np.where(reply, conversations['port'], conversations['ephemeral'])
+        block['dport'] = np.where(reply, conversations['ephemeral'], conversations['port'])
+        block['tcp_flags'] = np.where(tcp, np.where(rng.random(n) < 0.7, TCP_ACK, TCP_PSH_ACK), 0)
+        block['window'] = np.where(tcp, 64240, 0)
+        headers[rows] = block
+
+    def _syn_flood(self, headers, rows):
+        # Spoofed sources, one target, bare SYNs
+        rng = self._rng
+        n = len(rows)
+        block = headers[rows]
+        block['protocol'] = PROTO_TCP
+        block['ip_len'] = rng.choice(np.array([40, 44, 60], dtype=np.uint32), n)
+        block['ttl'] = rng.integers(32, 255, n, dtype=np.uint8)
+        block['src_lo'] = rng.integers(0x01000000, 0xDF000000, n, dtype=np.uint64)
+        block['dst_lo'] = _VICTIM
+        block['sport'] = rng.integers(1024, 65535, n, dtype=np.uint16)
+        block['dport'] = 80
+        block['tcp_flags'] = TCP_SYN
+        block['window'] = rng.choice(np.array([512, 1024, 2048], dtype=np.uint16), n)
+        headers[rows] = block
+
+    def _port_scan(self, headers, rows):
+        # One scanner probing consecutive ports of one host
+        n = len(rows)
+        ports = (self._next_scan_port + np.arange(n) - 1) % 65535 + 1
+        self._next_scan_port = int(ports[-1]) % 65535 + 1
+        block = headers[rows]
+        block['protocol'] = PROTO_TCP
+        block['ip_len'] = 44
+        block['ttl'] = 48
+        block['src_lo'] = _SCANNER
+        block['dst_lo'] = _VICTIM
+        block['sport'] = 40000 + np.arange(n) % 16
+        block['dport'] = ports
+        block['tcp_flags'] = TCP_SYN
+        block['window'] = 1024
+        headers[rows] = block
+
+    def _udp_amplification(self, headers, rows):
+        # Large responses from many reflectors' service ports to one victim
+        rng = self._rng
+        n = len(rows)
+        block = headers[rows]
+        block['protocol'] = PROTO_UDP
+        block['ip_len'] = rng.integers(1200, 1501, n, dtype=np.uint32)
+        block['ttl'] = rng.integers(40, 64, n, dtype=np.uint8)
+        block['src_lo'] = rng.integers(0x01000000, 0xDF000000, n, dtype=np.uint64)
+        block['dst_lo'] = _VICTIM
+        block['sport'] = rng.choice(_REFLECTOR_PORTS, n)
+        block['dport'] = rng.integers(1024, 65535, n, dtype=np.uint16)
+        headers[rows] = block
+
+    def _slow_exfiltration(self, headers, rows):
+        # One long-lived outbound flow of steady mid-sized writes
+        rng = self._rng
+        n = len(rows)
+        block = headers[rows]
+        block['protocol'] = PROTO_TCP
+        block['ip_len'] = rng.integers(600, 900, n, dtype=np.uint32)
+        block['ttl'] = 64
+        block['src_lo'] = _EXFIL_HOST
+        block['dst_lo'] = _EXFIL_SINK
+        block['sport'] = 51515
+        block['dport'] = 443
+        block['tcp_flags'] = TCP_PSH_ACK
+        block['window'] = 64240
+        headers[rows] = block
+
+
+def _weighted(rng, weights, n, dtype):
+    values = np.fromiter(weights, dtype=dtype)
+    p = np.fromiter(weights.values(), dtype=float)
+    return rng.choice(values, size=n, p=p / p.sum())
+
+
+def encode_frames(headers):
+    """Build minimal Ethernet/IPv4/TCP-or-UDP frames from IPv4 header rows
+
+    Frames carry headers only; the IP total length field keeps the
+    original size, as in a capture truncated by its snap length.
+    """
+    n = len(headers)
+    tcp = headers['protocol'] == PROTO_TCP
+    buf = np.zeros((n, 54), dtype=np.uint8)
+    buf[:, 12:14] = (0x08, 0x00)
+    buf[:, 14] = 0x45
+    _put(buf, 16, headers['ip_len'], 2)
+    buf[:, 22] = headers['ttl']
+    buf[:, 23] = headers['protocol']
+    _put(buf, 26, headers['src_lo'] & 0xFFFFFFFF, 4)
+    _put(buf, 30, headers['dst_lo'] & 0xFFFFFFFF, 4)
+    _put(buf, 34, headers['sport'], 2)
+    _put(buf, 36, headers['dport'], 2)
+    buf[tcp, 46] = 0x50
+    buf[tcp, 47] = headers['tcp_flags'][tcp]
+    _put(buf, 48, headers['window'], 2)
+    lengths = np.where(tcp, 54, 42)
+    return [row[:length].tobytes() for row, length in zip(buf, lengths.tolist())]
+
+
+def write_pcap(path, headers):
+    """Write IPv4 header rows as a classic microsecond pcap file of ``encode_frames`` frames
+
+    Each record's original length is the Ethernet frame the header row
+    describes, so replays see the generated sizes as from a capture
+    truncated by its snap length.
+    """
+    record = struct.Struct('<IIII')
+    usec = np.round(headers['ts'] * 1e6).astype(np.int64)
+    wire_lengths = (headers['ip_len'].astype(np.int64) + 14).tolist()
+    with open(path, 'wb') as stream:
+        stream.write(struct.pack('<IHHiIII', PCAP_MAGIC_USEC, 2, 4, 0, 0, 65535, LINKTYPE_ETHERNET))
+        for frame, ts, wire_length in zip(encode_frames(headers), usec.tolist(), wire_lengths):
+            stream.write(record.pack(ts // 1_000_000, ts % 1_000_000, len(frame), max(wire_length, len(frame))))
+            stream.write(frame)
+
+
+def _put(buf, offset, values, width):
+    """Write ``values`` big-endian into ``width`` columns of ``buf`` starting at ``offset``"""
+    values = values.astype(np.uint64)
+    for i in range(width):
+        buf[:, offset + i] = (values >> np.uint64(8 * (width - 1 - i))) & np.uint64(0xFF)
@@ -4,12 +4,16 @@ import pandas as pd
 import numpy as np
 from scapy.all import IP, TCP, UDP
 from collections import defaultdict
+from src.flows import FLOW_FEATURES
+from src.decoder import decode_packets
 
 # Define important features for NIDS
 IMPORTANT_FEATURES = [
     'protocol', 'sbytes', 'dbytes', 'rate'  # Most critical features for intrusion detection
 ]
 
+SYN_ACK = 0x12  # TCP SYN | ACK flag bits
+
 def load_scalers():
     """Load pre-trained scalers from models directory"""
     try:
@@ -53,8 +57,95 @@ def process_packet(packet):
     
     return pd.DataFrame([{f: features[f] for f in IMPORTANT_FEATURES}])
 
+def _constant(value):
+    def extract(headers):
+        return np.full(len(headers), value, dtype=np.float32)
+    return extract
+
+def _column(name):
+    def extract(headers):
+        return headers[name]
+    return extract
+
+# Per-feature extractors over decoded header columns (see src.decoder.HEADER_DTYPE),
+# mirroring process_packet
+FEATURE_EXTRACTORS = {
+    'protocol': _column('protocol'),
+    'sttl': _column('ttl'),
+    'dttl': _column('ttl'),
+    'sbytes': _column('ip_len'),
+    'dbytes': _column('ip_len'),
+    'sload': _column('ip_len'),
+    'dload': _column('ip_len'),
+    'service': _column('dport'),
+    'swin': _column('window'),
+    'dwin': _column('window'),
+    'tcprtt': _constant(0),
+    'synack': lambda headers: (headers['tcp_flags'] & SYN_ACK) == SYN_ACK,
+    'rate': _constant(1),
+    'spkts': _constant(1),
+    'dpkts': _constant(1),
+    'duration': _constant(0),
+}
+
+def _fill_flow_features(out, headers, flow_columns, flow_table, slots):
+    """Account each packet to its flow and copy the flow's features as of that packet"""
+    src = (headers['src_hi'].astype(object) << 64) | headers['src_lo'].astype(object)
+    dst = (headers['dst_hi'].astype(object) << 64) | headers['dst_lo'].astype(object)
+    rows = zip(headers['ip_version'].tolist(), headers['protocol'].tolist(),
+               src.tolist(), headers['sport'].tolist(), dst.tolist(),
+               headers['dport'].tolist(), headers['ts'].tolist(),
+               headers['ip_len'].tolist(), headers['ttl'].tolist())
+    for i, (version, proto, s, sport, d, dport, ts, size, ttl) in enumerate(rows):
+        if not version:
+            continue
+        slot = flow_table.update(proto, s, sport, d, dport, ts, size, ttl)
+        if slots is not None:
+            slots[i] = slot
+        for j, name in flow_columns:
+            out[i, j] = flow_table.feature(slot, name)
+
+def process_packets(batch, features=IMPORTANT_FEATURES, out=None, flow_table=None, slots=None):
+    """Extract features from a batch of packets into a float32 matrix
+
+    ``batch`` is either a ``src.decoder.HEADER_DTYPE`` array from the raw
+    decoder or a list of Scapy packets, which are decoded first. Columns
+    follow the order of ``features`` and only those features are computed.
+    Rows for non-IP packets are left as zeros. Pass ``out`` to reuse a
+    preallocated matrix. With a ``flow_table`` (see ``src.flows.FlowTable``),
+    byte, packet, rate, load, duration and TTL features come from the
+    packet's bidirectional flow as of that packet instead of per-packet
+    placeholders, and ``slots`` (an int array of the batch length) receives
+    each row's flow slot, or -1 for non-IP rows.
+    """
+    headers = batch if isinstance(batch, np.ndarray) else decode_packets(batch)
+    if out is None:
+        out = np.empty((len(headers), len(features)), dtype=np.float32)
+    else:
+        out = out[:len(headers)]
+    
+    if slots is not None:
+        slots[:len(headers)] = -1
+    
+    flow_columns = []
+    for j, feature in enumerate(features):
+        if flow_table is not None and feature in FLOW_FEATURES:
+            flow_columns.append((j, feature))
+        else:
+            out[:, j] = FEATURE_EXTRACTORS[feature](headers)
+    
+    out[headers['ip_version'] == 0] = 0
+    if flow_table is not None and (flow_columns or slots is not None):
+        _fill_flow_features(out, headers, flow_columns, flow_table, slots)
+    
+    return out
+
 def preprocess_data(data, minmax_scaler, standard_scaler):
     """Preprocess network data for model input"""
+    # Feature matrices from process_packets are already in IMPORTANT_FEATURES order
+    if isinstance(data, np.ndarray):
+        return minmax_scaler.transform(data)
+    
     # Ensure data has all required features
     for feature in IMPORTANT_FEATURES:
         if feature not in data.columns:
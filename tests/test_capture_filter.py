@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+from scapy.layers.inet import ICMP, IP, TCP, UDP, fragment
+from scapy.layers.inet6 import IPv6
+from scapy.layers.l2 import Ether
+
+from src.capture_filter import (BpfFilter, CaptureFilterError, build_capture_filter, compile_capture_filter,
+                                flow_sample_expression, flow_sample_mask)
+from src.decoder import decode_frames
+
+# Fixed addresses keep Scapy from resolving them on the network
+MACS = {'src': '02:00:00:00:00:01', 'dst': '02:00:00:00:00:02'}
+
+try:
+    compile_capture_filter('tcp')
+except CaptureFilterError as e:
+    pytest.skip(f"libpcap cannot compile filters here: {e}", allow_module_level=True)
+
+
+@pytest.fixture(scope='module')
+def frames():
+    """TCP, UDP and ICMP packets split into IPv4 fragments, plus IPv6 traffic"""
+    rng = np.random.default_rng(0)
+    frames = []
+    for i in range(300):
+        l4 = [TCP(sport=int(rng.integers(1024, 65535)), dport=80),
+              UDP(sport=int(rng.integers(1024, 65535)), dport=53), ICMP()][i % 3]
+        packet = IP(src=f"10.{i % 7}.{i % 5}.{i % 251}", dst=f"192.168.{i % 3}.{i % 200}") / l4 / (b"x" * int(rng.integers(20, 200)))
+        frames += [bytes(Ether(**MACS) / piece) for piece in fragment(packet, fragsize=32)]
+    frames += [bytes(Ether(**MACS) / IPv6(src=f"2001:db8::{i}", dst="2001:db8::ffff") / UDP(sport=i, dport=53))
+               for i in range(1, 20)]
+    return frames
+
+
+@pytest.mark.parametrize('fraction', [0.1, 0.3, 0.5, 0.9])
+def test_flow_sample_mask_matches_the_bpf_program(frames, fraction):
+    headers = decode_frames(frames, np.arange(len(frames), dtype=np.float64))
+    assert (headers['frag_offset'] != 0).any()
+    kernel = BpfFilter(flow_sample_expression(fraction)).mask(frames)
+    np.testing.assert_array_equal(flow_sample_mask(headers, fraction), kernel)
+
+
+def test_sampling_keeps_both_directions_of_a_flow():
+    forward = [bytes(Ether(**MACS) / IP(src=f"10.0.0.{i}", dst="10.0.1.1") / TCP(sport=1000 + i, dport=443))
+               for i in range(1, 200)]
+    reverse = [bytes(Ether(**MACS) / IP(src="10.0.1.1", dst=f"10.0.0.{i}") / TCP(sport=443, dport=1000 + i))
+               for i in range(1, 200)]
+    sampler = BpfFilter(flow_sample_expression(0.5))
+    kept = sampler.mask(forward)
+    np.testing.assert_array_equal(kept, sampler.mask(reverse))
+    assert 0 < kept.sum() < len(forward)
+
+
+def test_capture_filter_parts_combine():
+    assert build_capture_filter() is None
+    assert build_capture_filter(' ', sample_fraction=1.0) is None
+    expression = build_capture_filter('udp', exclude_ports=(8501,))
+    assert expression == "(udp) and not (tcp port 8501)"
+    web = bytes(Ether(**MACS) / IP() / TCP(dport=8501))
+    dns = bytes(Ether(**MACS) / IP() / UDP(dport=53))
+    assert BpfFilter(build_capture_filter(exclude_ports=(8501,))).mask([web, dns]).tolist() == [False, True]
+
+
+def test_invalid_expressions_raise():
+    with pytest.raises(CaptureFilterError):
+        BpfFilter('tcp and and')
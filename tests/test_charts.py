@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from src.components.charts import downsample, lttb_indices, minmax_indices
+
+
+@pytest.fixture(scope='module')
+def series():
+    y = np.sin(np.linspace(0, 20, 10_000)) + np.random.default_rng(0).normal(0, 0.1, 10_000)
+    y[4321] = 25.0
+    y[7654] = -25.0
+    return y
+
+
+def test_lttb_keeps_the_end_points_and_spikes(series):
+    indices = lttb_indices(None, series, 500)
+    assert len(indices) == 500 and indices[0] == 0 and indices[-1] == len(series) - 1
+    assert (np.diff(indices) > 0).all()
+    assert {4321, 7654} <= set(indices.tolist())
+
+
+def test_minmax_keeps_every_bucket_extreme(series):
+    indices = minmax_indices(series, 500)
+    assert len(indices) <= 500 and indices[0] == 0 and indices[-1] == len(series) - 1
+    assert (np.diff(indices) > 0).all()
+    assert {4321, 7654} <= set(indices.tolist())
+
+
+@pytest.mark.parametrize('downsampler', [lambda y, t: lttb_indices(None, y, t), minmax_indices])
+@pytest.mark.parametrize('threshold', range(0, 8))
+def test_small_limits_are_honoured(series, downsampler, threshold):
+    indices = downsampler(series, threshold)
+    assert len(indices) <= threshold
+    assert (np.diff(indices) > 0).all() and ((indices >= 0) & (indices < len(series))).all()
+
+
+@pytest.mark.parametrize('method', ['lttb', 'minmax'])
+def test_downsample_keeps_x_in_step(method):
+    x = np.arange('2024-01-01T00:00', '2024-01-01T01:00', dtype='datetime64[m]')
+    y = np.arange(len(x), dtype=np.float64)
+    assert downsample(x, y, max_points=100, method=method)[1] is y
+    sampled_x, sampled_y = downsample(x, y, max_points=10, method=method)
+    assert len(sampled_y) <= 10 and sampled_x.dtype == x.dtype
+    assert sampled_x[0] == x[0] and sampled_x[-1] == x[-1]
+
+
+def test_unknown_method_is_rejected(series):
+    with pytest.raises(ValueError):
+        downsample(None, series, method='average')
@@ -0,0 +1,58 @@
+import time
+
+import numpy as np
+import pytest
+
+from src.engine import CaptureEngine, _Pipeline
+from src.metrics import SCORE_BINS, count_above, score_histogram
+from src.ring_buffer import PACKET_DTYPE, RingBuffer
+
+
+@pytest.fixture(scope='module')
+def records():
+    records = np.zeros(5000, dtype=PACKET_DTYPE)
+    records['score'] = np.random.default_rng(0).random(len(records))
+    records['score'][:3] = (0.0, 0.5, 1.0)
+    return records
+
+
+@pytest.mark.parametrize('threshold', [0.0, 0.3, 0.5, 0.8, 0.999, 1.0])
+def test_score_histogram_counts_above_grid_thresholds(records, threshold):
+    histogram = score_histogram(records['score'])
+    assert len(histogram) == SCORE_BINS + 1 and histogram.sum() == len(records)
+    assert count_above(histogram, threshold) == int((records['score'] > threshold).sum())
+
+
+class _StubDetector:
+    """Stands in for a running Detector that has scored ``records`` at ``threshold``"""
+
+    running = True
+
+    def __init__(self, records, threshold):
+        self.threshold = threshold
+        self.records = records
+        self.packet_history = RingBuffer(PACKET_DTYPE, 1024)
+        self.threat_history = RingBuffer(PACKET_DTYPE, 16384)
+        self.threat_history.extend(records[records['score'] > threshold])
+
+    def stats(self):
+        return {'inspected': len(self.records), 'threats': len(self.threat_history),
+                'score_counts': score_histogram(self.records['score'])}
+
+
+def test_each_viewer_sees_its_own_threshold(records):
+    engine = CaptureEngine(threat_window=50)
+    pipeline = _Pipeline({})
+    pipeline.detector = _StubDetector(records, threshold=0.3)
+    pipeline.thresholds = {'low': 0.3, 'high': 0.9}
+    pipeline.ready.set()
+    engine._pipelines['stub'] = pipeline
+    engine._sessions = {session: ('stub', time.monotonic()) for session in pipeline.thresholds}
+
+    for session, threshold in pipeline.thresholds.items():
+        snapshot = engine.snapshot(session)
+        above = records[records['score'] > threshold]
+        assert snapshot.stats['threshold'] == threshold
+        assert snapshot.stats['threats'] == len(above)
+        # The window is cut after filtering, so a high threshold still fills it
+        np.testing.assert_array_equal(snapshot.threats, above[-50:])
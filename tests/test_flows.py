@@ -0,0 +1,91 @@
+from collections import OrderedDict
+
+import numpy as np
+
+from src.flows import FlowTable
+
+TCP = 6
+
+
+def test_both_directions_share_a_record():
+    table = FlowTable(max_flows=8)
+    first = table.update(TCP, 2, 40000, 1, 80, 0.0, 100, 64)
+    reply = table.update(TCP, 1, 80, 2, 40000, 0.5, 1500, 60)
+    assert first == reply and len(table) == 1
+    record = table.record(first)
+    assert (record['spkts'], record['sbytes'], record['sttl']) == (1, 100, 64)
+    assert (record['dpkts'], record['dbytes'], record['dttl']) == (1, 1500, 60)
+    assert record['duration'] == 0.5 and record['rate'] == 4.0
+    # The initiator is the higher endpoint, so it is not the low side of the key
+    assert not record['initiator_low']
+    assert table.key(first) == (TCP, 1, 80, 2, 40000)
+
+
+def test_idle_flows_expire_oldest_first():
+    expired = []
+    table = FlowTable(max_flows=8, idle_timeout=10.0,
+                      on_expire=lambda key, record: expired.append(key))
+    table.update(TCP, 1, 1000, 9, 80, 0.0, 60, 64)
+    table.update(TCP, 2, 1000, 9, 80, 5.0, 60, 64)
+    # Activity on the first flow makes the second the least recently active
+    table.update(TCP, 9, 80, 1, 1000, 6.0, 60, 64)
+    table.update(TCP, 3, 1000, 9, 80, 15.5, 60, 64)
+    table.flush()
+    assert expired[0] == (TCP, 2, 1000, 9, 80)
+    assert table.expired_idle == 1 and len(table) == 0
+
+
+def test_active_timeout_starts_a_new_flow():
+    expired = []
+    table = FlowTable(max_flows=8, idle_timeout=60.0, active_timeout=100.0,
+                      on_expire=lambda key, record: expired.append(record))
+    for ts in range(0, 160, 20):
+        table.update(TCP, 1, 1000, 2, 80, float(ts), 100, 64)
+    table.flush()
+    assert table.expired_active == 1
+    assert [record['spkts'] for record in expired] == [6, 2]
+
+
+def test_full_table_evicts_least_recently_active():
+    expired = []
+    table = FlowTable(max_flows=3, on_expire=lambda key, record: expired.append(key[1]))
+    for host in (1, 2, 3):
+        table.update(TCP, host, 1000, 100, 80, float(host), 60, 64)
+    table.update(TCP, 1, 1000, 100, 80, 4.0, 60, 64)
+    table.update(TCP, 4, 1000, 100, 80, 5.0, 60, 64)
+    table.record_scores(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32))
+    assert expired == [2] and table.evicted == 1 and len(table) == 3
+
+
+def test_scores_follow_flows_released_within_a_batch():
+    reported = {}
+    table = FlowTable(max_flows=1, on_expire=lambda key, record: reported.__setitem__(key[1], record['max_score']))
+    # With one slot, each new flow evicts the previous one and reuses its slot
+    slots = [table.update(TCP, host, 1000, 100, 80, float(index), 60, 64)
+             for index, host in enumerate((1, 1, 2, 3, 3))]
+    assert slots == [0] * 5
+    table.record_scores(slots, np.array([0.1, 0.7, 0.4, 0.2, 0.9], dtype=np.float32))
+    table.flush()
+    assert reported == {1: np.float32(0.7), 2: np.float32(0.4), 3: np.float32(0.9)}
+
+
+def test_index_matches_a_reference_lru_under_churn():
+    rng = np.random.default_rng(0)
+    capacity, idle = 64, 5.0
+    table = FlowTable(max_flows=capacity, idle_timeout=idle, active_timeout=1e9)
+    reference = OrderedDict()
+    for step in range(5000):
+        ts = step * 0.01
+        src = int(rng.integers(0, 150))
+        key = (TCP, src, 1000, 1 << 100, 443)
+        while reference and ts - next(iter(reference.values())) > idle:
+            reference.popitem(last=False)
+        if key not in reference and len(reference) == capacity:
+            reference.popitem(last=False)
+        reference.pop(key, None)
+        reference[key] = ts
+        table.update(TCP, src, 1000, 1 << 100, 443, ts, 60, 64)
+        assert len(table) == len(reference)
+    slots = [table.update(*key, ts, 60, 64) for key in reference]
+    assert sorted(table.key(slot) for slot in slots) == sorted(reference)
+    assert len(table) == len(reference)
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import MinMaxScaler, StandardScaler
+
+from src.fused import FusedLinearScorer, build_scorer, compile_linear_model
+
+
+@pytest.fixture(scope='module')
+def fitted():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(2000, 6)) * [1, 10, 100, 1000, 0.1, 5] + [0, 5, -50, 1e4, 0, 2]
+    y = (X @ [1, -0.1, 0.01, 0.001, 5, 0.3] + rng.normal(size=len(X)) > 10).astype(int)
+    scaler = MinMaxScaler().fit(X)
+    model = LogisticRegression(max_iter=1000).fit(scaler.transform(X), y)
+    rows = rng.normal(size=(500, 6)) * [2, 20, 200, 2000, 0.2, 10]
+    return model, scaler, rows
+
+
+def test_fused_scores_match_sklearn(fitted):
+    model, scaler, rows = fitted
+    scorer = compile_linear_model(model, scaler)
+    assert isinstance(scorer, FusedLinearScorer)
+    expected = model.predict_proba(scaler.transform(rows))[:, 1]
+    np.testing.assert_allclose(scorer.scores(rows), expected, atol=1e-5)
+    np.testing.assert_array_equal(scorer.predict(rows), model.predict(scaler.transform(rows)))
+
+
+def test_build_scorer_uses_the_fused_kernel(fitted):
+    model, scaler, rows = fitted
+    score = build_scorer(model, scaler, StandardScaler())
+    expected = model.predict_proba(scaler.transform(rows))[:, 1]
+    scores = score(rows.astype(np.float32))
+    assert scores.dtype == np.float32
+    np.testing.assert_allclose(scores, expected, atol=1e-5)
+
+
+def test_extreme_rows_stay_finite(fitted):
+    model, scaler, _ = fitted
+    scores = compile_linear_model(model, scaler).scores(np.full((2, 6), [[1e30], [-1e30]]))
+    assert np.isfinite(scores).all() and ((scores >= 0) & (scores <= 1)).all()
+
+
+def test_models_that_cannot_be_folded_are_rejected(fitted):
+    model, scaler, rows = fitted
+    clipping = MinMaxScaler(clip=True).fit(rows)
+    assert compile_linear_model(model, clipping) is None
+    labels = np.arange(len(rows)) % 3
+    multiclass = LogisticRegression(max_iter=1000).fit(scaler.transform(rows), labels)
+    assert compile_linear_model(multiclass, scaler) is None
@@ -0,0 +1,59 @@
+import io
+import struct
+
+import numpy as np
+import pytest
+
+from src.pcap_reader import (PCAP_HEADER_SIZE, PcapFormatError, find_record_boundary, iter_chunks,
+                             iter_frames, iter_pcap_range, read_pcap_header)
+
+
+def _capture(count=500, seed=0):
+    """Classic little-endian Ethernet pcap of IPv4 frames with random payloads"""
+    rng = np.random.default_rng(seed)
+    frames = [b'\x00' * 12 + b'\x08\x00' + rng.bytes(int(rng.integers(20, 1500))) for _ in range(count)]
+    timestamps = 1_700_000_000 + np.cumsum(rng.integers(0, 2000, count)) * 1e-6
+    data = bytearray(struct.pack('<IHHiIII', 0xA1B2C3D4, 2, 4, 0, 0, 65535, 1))
+    for frame, ts in zip(frames, timestamps):
+        sec = int(ts)
+        data += struct.pack('<IIII', sec, int(round((ts - sec) * 1e6)), len(frame), len(frame)) + frame
+    return bytes(data), frames
+
+
+@pytest.mark.parametrize('split', [997, 4099, 65536, 1 << 20])
+def test_byte_ranges_yield_every_record_once(split):
+    data, frames = _capture()
+    stream = io.BytesIO(data)
+    seen = [frame for start in range(0, len(data), split)
+            for frame, _, _ in iter_pcap_range(stream, start, min(start + split, len(data)))]
+    assert seen == frames
+
+
+def test_boundary_search_skips_to_the_next_record():
+    data, frames = _capture()
+    stream = io.BytesIO(data)
+    endian, resolution, linktype = read_pcap_header(stream)
+    second = PCAP_HEADER_SIZE + 16 + len(frames[0])
+    for offset in (PCAP_HEADER_SIZE + 1, PCAP_HEADER_SIZE + 16, second):
+        assert find_record_boundary(stream, offset, endian, resolution, linktype) == second
+
+
+def test_iter_frames_reads_the_whole_capture():
+    data, frames = _capture()
+    assert [frame for frame, _, _ in iter_frames(io.BytesIO(data))] == frames
+    chunks = list(iter_chunks(io.BytesIO(data), chunk_size=128))
+    assert [len(chunk[0]) for chunk in chunks] == [128, 128, 128, 116]
+
+
+def test_truncated_record_ends_the_capture():
+    data, frames = _capture(count=10)
+    read = [frame for frame, _, _ in iter_frames(io.BytesIO(data[:-5]))]
+    assert read == frames[:-1]
+
+
+@pytest.mark.parametrize('data', [b'', b'\x00' * 3, b'not a capture file at all'])
+def test_non_captures_are_rejected(data):
+    with pytest.raises(PcapFormatError):
+        list(iter_frames(io.BytesIO(data)))
+    with pytest.raises(PcapFormatError):
+        read_pcap_header(io.BytesIO(data))
@@ -0,0 +1,33 @@
+import numpy as np
+
+from src.system_sampler import NIC_DTYPE, counter_rates
+
+
+def _records(ts, **counters):
+    records = np.zeros(len(ts), dtype=NIC_DTYPE)
+    records['ts'] = ts
+    for field, values in counters.items():
+        records[field] = values
+    return records
+
+
+def test_rates_between_consecutive_samples():
+    records = _records([0.0, 1.0, 3.0, 3.5], bytes_recv=[0, 1000, 5000, 5000], packets_recv=[0, 10, 30, 31])
+    ts, rates = counter_rates(records, ['bytes_recv', 'packets_recv'])
+    np.testing.assert_array_equal(ts, [1.0, 3.0, 3.5])
+    np.testing.assert_allclose(rates['bytes_recv'], [1000, 2000, 0])
+    np.testing.assert_allclose(rates['packets_recv'], [10, 10, 2])
+
+
+def test_counter_resets_and_repeated_timestamps_give_zero():
+    # The counter restarts (e.g. the daemon was restarted) and one sample repeats a timestamp
+    records = _records([0.0, 1.0, 2.0, 2.0, 3.0], bytes_sent=[500, 900, 100, 200, 400])
+    _, rates = counter_rates(records, ['bytes_sent'])
+    np.testing.assert_allclose(rates['bytes_sent'], [400, 0, 0, 200])
+    assert np.isfinite(rates['bytes_sent']).all()
+
+
+def test_fewer_than_two_samples_give_no_rates():
+    for count in (0, 1):
+        ts, rates = counter_rates(_records([0.0] * count), ['bytes_recv'])
+        assert len(ts) == 0 and len(rates['bytes_recv']) == 0
@@ -0,0 +1,63 @@
+import struct
+
+import numpy as np
+
+from src.decoder import decode_frames
+from src.pcap_reader import PCAP_HEADER_SIZE, PCAP_RECORD_SIZE, iter_chunks
+from src.traffic_gen import BENIGN, LABELS, SYN_FLOOD, TrafficGenerator, write_pcap
+
+
+def test_benign_traffic_forms_two_way_conversations():
+    headers, _ = TrafficGenerator(attack_fraction=0.0, seed=0).batch(100_000)
+    # Benign clients and servers never share an address, so it orders the endpoints
+    forward = headers['src_lo'] < headers['dst_lo']
+    ends = [np.where(forward, headers[src], headers[dst]) for src, dst in
+            (('src_lo', 'dst_lo'), ('dst_lo', 'src_lo'), ('sport', 'dport'), ('dport', 'sport'))]
+    keys = np.column_stack([headers['protocol']] + ends).astype(np.uint64)
+    flows, flow = np.unique(keys, axis=0, return_inverse=True)
+    # Thousands of conversations of tens of packets, not one flow per packet
+    assert 1000 < len(flows) < 20_000
+    outbound, inbound = np.zeros(len(flows), dtype=bool), np.zeros(len(flows), dtype=bool)
+    outbound[flow[forward]] = True
+    inbound[flow[~forward]] = True
+    assert (outbound & inbound)[flow].mean() > 0.9
+
+
+def test_batches_are_labelled_in_time_order():
+    generator = TrafficGenerator(rate=1000.0, attack_fraction=0.2, seed=1, start=100.0)
+    headers, labels = generator.batch(5000)
+    assert generator.clock == 105.0
+    assert (np.diff(headers['ts']) >= 0).all() and headers['ts'][0] >= 100.0
+    assert 0.15 < (labels != LABELS.index(BENIGN)).mean() < 0.25
+    assert (labels == LABELS.index(SYN_FLOOD)).any()
+    assert (headers['ip_version'] == 4).all()
+
+
+def test_same_seed_gives_the_same_stream():
+    first, second = TrafficGenerator(seed=7), TrafficGenerator(seed=7)
+    for _ in range(3):
+        (a, labels_a), (b, labels_b) = first.batch(2000), second.batch(2000)
+        np.testing.assert_array_equal(a, b)
+        np.testing.assert_array_equal(labels_a, labels_b)
+
+
+def test_written_pcap_decodes_to_the_generated_headers(tmp_path):
+    headers, _ = TrafficGenerator(seed=2, start=1_700_000_000.0).batch(1000)
+    path = tmp_path / 'synthetic.pcap'
+    write_pcap(path, headers)
+    with open(path, 'rb') as stream:
+        frames, timestamps, linktype = next(iter_chunks(stream, len(headers)))
+    decoded = decode_frames(frames, timestamps, linktype)
+    for field in ('protocol', 'src_lo', 'dst_lo', 'sport', 'dport', 'ip_len', 'ttl'):
+        np.testing.assert_array_equal(decoded[field], headers[field])
+    np.testing.assert_allclose(decoded['ts'], headers['ts'], atol=1e-6)
+
+    # Original lengths record the generated wire size behind the header-only frames
+    data = path.read_bytes()
+    offset, wire_lengths = PCAP_HEADER_SIZE, []
+    while offset < len(data):
+        _, _, caplen, origlen = struct.unpack_from('<IIII', data, offset)
+        wire_lengths.append(origlen)
+        offset += PCAP_RECORD_SIZE + caplen
+    np.testing.assert_array_equal(wire_lengths, np.maximum(headers['ip_len'].astype(np.int64) + 14,
+                                                           [len(frame) for frame in frames]))